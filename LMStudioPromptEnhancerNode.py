@@ -1,12 +1,74 @@
+import importlib
+import json
 import random
 import re
 from pathlib import Path
 
-import requests
+try:
+    from .circuit_breaker import CircuitBreaker
+    from .content_filter import ContentFilter, describe_redaction
+    from .memory_diagnostics import MemoryProfiler, profile_memory
+    from .model_warmup import ModelWarmup
+    from .mood_lattice import mood_descriptors
+    from .option_catalog import OPTION_CATALOGS, get_catalog_registry
+    from .prompt_cache import SemanticPromptCache, canonicalize
+    from .prompt_dedupe import PromptDeduplicator
+    from .prompt_prefetch import (
+        PromptPrefetcher,
+        RiffSpeculator,
+        SpeculationCancelled,
+    )
+    from .prompt_sampling import CreativeSampler
+    from .prompt_tags import TAG_MODELS, build_tag_list, parse_emphasis, parse_tags
+    from .request_scheduler import RequestScheduler
+    from .response_decoder import (
+        PROMPT_BUNDLE_RESPONSE_FORMAT,
+        extract_completion,
+        parse_prompt_bundle,
+    )
+    from .state_store import MemoryStateStore, get_shared_state_store
+except ImportError:
+    from circuit_breaker import CircuitBreaker
+    from content_filter import ContentFilter, describe_redaction
+    from memory_diagnostics import MemoryProfiler, profile_memory
+    from model_warmup import ModelWarmup
+    from mood_lattice import mood_descriptors
+    from option_catalog import OPTION_CATALOGS, get_catalog_registry
+    from prompt_cache import SemanticPromptCache, canonicalize
+    from prompt_dedupe import PromptDeduplicator
+    from prompt_prefetch import PromptPrefetcher, RiffSpeculator, SpeculationCancelled
+    from prompt_sampling import CreativeSampler
+    from prompt_tags import TAG_MODELS, build_tag_list, parse_emphasis, parse_tags
+    from request_scheduler import RequestScheduler
+    from response_decoder import (
+        PROMPT_BUNDLE_RESPONSE_FORMAT,
+        extract_completion,
+        parse_prompt_bundle,
+    )
+    from state_store import MemoryStateStore, get_shared_state_store
+
+
+def _feature(name):
+    """Import the sibling module of an optional feature on first use.
+
+    Exports, provenance, the fallback and riff chains are loaded when they
+    are used rather than with the node, to keep ComfyUI startup cheap.
+    """
+    if __package__:
+        return importlib.import_module(f".{name}", __package__)
+    return importlib.import_module(name)
+
+
+# Models found by the last successful discovery. INPUT_TYPES reads this list
+# instead of probing LM Studio, so defining the node does no network IO.
+_discovered_models = ["No models found"]
 
 
 def get_lmstudio_models():
     """Fetches the list of available models from a local LM Studio server."""
+    # The HTTP stack is imported on first use to keep ComfyUI startup cheap.
+    import requests
+
     print(
         "[LMStudio] Attempting to fetch models from http://localhost:1234/api/v0/models"
     )
@@ -16,12 +78,79 @@ def get_lmstudio_models():
         models_data = response.json().get("data", [])
         model_ids = [model["id"] for model in models_data]
         print(f"[LMStudio] Found {len(model_ids)} model(s): {model_ids}")
+        if model_ids:
+            _discovered_models[:] = model_ids
         return model_ids if model_ids else ["No models found"]
     except requests.exceptions.RequestException as e:
         print(f"[LMStudio] Connection failed: {e}")
         return ["LM Studio not found at http://localhost:1234"]
 
 
+def apply_model_styling(
+    generated_prompt,
+    target_model,
+    style_preset,
+    tag_list_output=False,
+    tag_emphasis="",
+    tag_token_budget=0,
+    warnings=None,
+):
+    """Add the model-specific quality tags or style suffix to a prompt.
+
+    With `tag_list_output`, prompts for the tag-based models are rebuilt as a
+    clean tag list instead (see prompt_tags.build_tag_list), with the
+    `tag_emphasis` weights and `tag_token_budget` applied; dropped tags are
+    reported in `warnings`. Pure function of its inputs, so post-processing
+    pools can call it.
+    """
+    pony_tags = ""
+    if target_model == "Pony":
+        pony_tags = "score_9, score_8_up, score_7_up"
+        if style_preset == "Anime":
+            pony_tags += ", source_anime"
+
+    appended_style = ""
+    if target_model in ["Generic", "Flux", "SDXL"]:
+        photographic_style = (
+            "cinematic photo, 35mm film, professional, 4k, high resolution"
+        )
+        artistic_style = (
+            "masterpiece, best quality, absurdres, ultra-detailed, intricate details"
+        )
+        if style_preset in ["Photorealistic", "Cinematic"]:
+            appended_style = photographic_style
+        else:
+            appended_style = artistic_style
+
+    if tag_list_output and target_model in TAG_MODELS:
+        result = build_tag_list(
+            parse_tags(generated_prompt),
+            leading=parse_tags(pony_tags),
+            trailing=parse_tags(appended_style),
+            emphasis=parse_emphasis(tag_emphasis),
+            token_budget=tag_token_budget,
+        )
+        if result.dropped and warnings is not None:
+            warnings.append(
+                f"Tag budget of {tag_token_budget} tokens dropped "
+                f"{len(result.dropped)} tag(s): "
+                + ", ".join(tag.text for tag in result.dropped)
+            )
+        return result.text
+
+    if target_model == "Pony":
+        generated_prompt = f"{pony_tags} {generated_prompt}"
+
+    if target_model in ["Generic", "Flux", "SDXL"]:
+        generated_prompt = f"{generated_prompt} {appended_style}"
+
+    return generated_prompt
+
+
+# A __name__ token, resolved from wildcards/<name>.txt
+WILDCARD_TOKEN_RE = re.compile(r"__([A-Za-z0-9_-]+)__")
+
+
 class LMStudioPromptEnhancerNode:
     """
     A ComfyUI custom node that uses a local LM Studio instance to generate
@@ -32,65 +161,74 @@ class LMStudioPromptEnhancerNode:
 
     HISTORY_LIMIT = 20
 
-    WILDCARDS = {
-        "materials": [
-            "made of liquid metal",
-            "made of crystal",
-            "made of pure light",
-            "carved from wood",
-            "carved from stone",
-            "woven from fabric",
-            "mechanical and brass",
-            "holographic",
-            "ectoplasmic",
-            "made of swirling galaxies",
-        ],
-        "environments": [
-            "in a swirling vortex",
-            "on a chrome-plated surface",
-            "in a zero-gravity field",
-            "under a binary sunset",
-            "in a vaporwave dreamscape",
-            "on a microscopic level",
-            "in a post-apocalyptic wasteland",
-            "in a serene zen garden",
-            "inside a complex clockwork mechanism",
-            "in an alien jungle",
-        ],
-        "styles": [
-            "in the style of a 1980s Trapper Keeper",
-            "as a medieval tapestry",
-            "as a blueprint diagram",
-            "as a thermal camera image",
-            "as a stained glass window",
-            "in the style of ukiyo-e",
-            "as a child's crayon drawing",
-            "as a propaganda poster",
-            "in the style of art deco",
-            "as a pixel art sprite",
-        ],
-    }
+    # Files for the __name__ tokens in the themes
+    WILDCARD_DIR = Path(__file__).resolve().parent / "wildcards"
 
-    # Poses or options that are explicit/sexual in nature and should be blocked in SFW mode
-    EXPLICIT_POSES = {
-        "ass_on_heels",
-        "lifting_skirt",
-        "hand_on_inner_thigh",
-        "spread_kneeling",
-        "spread_kneeling (variant spelling: spread_kneeling)",
-        "sultry_gaze",
-        "flirty sitting against wall",
-        "sitting_with_legs_spread",
-        "thighs_together",
-    }
+    # Concurrent requests while expanding a riff chain
+    RIFF_CHAIN_WORKERS = 4
+
+    # Built on first use from the option catalogs; rebuilt when they reload
+    _sampler = None
+    _sampler_generation = None
+    _content_filter = None
+    _content_filter_generation = None
+
+    # Regeneration attempts when the SFW output filter finds blocked terms
+    FILTER_RETRIES = 2
+
+    # Shared by all instances: whether a model is loaded is LM Studio server state
+    model_warmup = ModelWarmup(load_timeout=300)
+
+    # Shared by all instances: every request queues here for an LM Studio slot
+    request_scheduler = RequestScheduler.from_env()
+
+    # Shared by all instances: after repeated connection failures prompts are
+    # synthesized locally (see _fallback_result) until LM Studio answers again
+    circuit_breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+
+    # Shared by all instances: tracemalloc is process-wide. Off unless
+    # LMSTUDIO_MEMORY_DIAGNOSTICS is set (see memory_diagnostics.py)
+    memory_profiler = MemoryProfiler.from_env()
+
+    @staticmethod
+    def get_catalog(name):
+        """Return the option catalog backing the `name` dropdown."""
+        return get_catalog_registry().option(name)
+
+    @classmethod
+    def get_sampler(cls):
+        """Return the shared seeded sampler over the current option catalogs."""
+        registry = get_catalog_registry()
+        generation = registry.refresh()
+        if cls._sampler is None or cls._sampler_generation != generation:
+            cls._sampler = CreativeSampler(
+                {
+                    name: catalog.values
+                    for name, catalog in registry.wildcards().items()
+                },
+                {name: registry.option(name) for name in OPTION_CATALOGS},
+            )
+            cls._sampler_generation = generation
+        return cls._sampler
+
+    @classmethod
+    def get_content_filter(cls):
+        """Return the SFW output filter built from the `blocklist` catalog."""
+        registry = get_catalog_registry()
+        generation = registry.refresh()
+        if cls._content_filter is None or cls._content_filter_generation != generation:
+            cls._content_filter = ContentFilter(registry.option("blocklist").values)
+            cls._content_filter_generation = generation
+        return cls._content_filter
 
     @classmethod
     def INPUT_TYPES(s):
-        # Try to fetch models at UI load time for dropdown population
-        try:
-            available_models = get_lmstudio_models()
-        except Exception:
-            available_models = ["No models found"]
+        # Populate the dropdown from the models discovered so far (refreshed via
+        # `refresh_models`); no network IO happens at node-definition time.
+        available_models = list(_discovered_models)
+
+        def option_choices(name):
+            return ["default", "random", *s.get_catalog(name).values]
 
         return {
             "required": {
@@ -142,181 +280,10 @@ class LMStudioPromptEnhancerNode:
                 "subject": (["Generic", "People"],),
                 "target_model": (["Generic", "Pony", "Flux", "SDXL"],),
                 "prompt_tone": (["SFW", "NSFW"],),
-                "action_pose": (
-                    [
-                        "default",
-                        "random",
-                        "adjusting glasses",
-                        "arms crossed",
-                        "ass_on_heels",
-                        "bent_knees",
-                        "bent_legs",
-                        "bent_over",
-                        "bedroom_eyes",
-                        "casual sit against wall, arms behind for support",
-                        "crossed_legs",
-                        "crouching",
-                        "dancing",
-                        "dogeza",
-                        "dreamy gaze while sitting against wall",
-                        "face_focus",
-                        "feet_together",
-                        "fighting stance",
-                        "flirty sitting against wall",
-                        "foot_focus",
-                        "foot_on_object",
-                        "grabbing_own_leg",
-                        "hair_falling_over_face",
-                        "hand_on_inner_thigh",
-                        "hands in pockets",
-                        "heel_lift",
-                        "heels_together",
-                        "heroic pose",
-                        "hip_out",
-                        "hips_forward",
-                        "hipshot_pose",
-                        "holding an object",
-                        "hugging knees while sitting against wall",
-                        "jumping",
-                        "kicking_leg_up",
-                        "kneeling",
-                        "knee_up",
-                        "leaning back while sitting against wall",
-                        "leaning against a wall",
-                        "leg_outstretched",
-                        "leg_up_pose",
-                        "legs_apart",
-                        "legs_crossed",
-                        "legs_up",
-                        "lifting_skirt",
-                        "looking_over_shoulder",
-                        "one_knee_up",
-                        "one_leg_forward",
-                        "one_leg_raised",
-                        "one_leg_up",
-                        "on_knees",
-                        "piloting a vehicle",
-                        "pointing",
-                        "reading a book",
-                        "reaching out",
-                        "running",
-                        "seiza",
-                        "shy sitting pose, hugging legs, back to wall",
-                        "side_hip_pose",
-                        "sitting",
-                        "sitting against wall",
-                        "sitting cross-legged against wall",
-                        "sitting on floor, back to wall, looking up",
-                        "sitting pose with soft lighting against wall",
-                        "sitting pose with wall shadow",
-                        "sitting pose, back arched slightly against wall",
-                        "sitting sideways against wall",
-                        "sitting with arms resting on knees against wall",
-                        "sitting with head leaning on wall",
-                        "sitting with head tilted, resting on wall",
-                        "sitting with knees up, back to wall",
-                        "sitting with one leg stretched, one bent, leaning on wall",
-                        "sitting, legs to side, shoulder touching wall",
-                        "sitting_with_legs_spread",
-                        "slouched sitting pose against wall",
-                        "smirking",
-                        "smug_expression",
-                        "spread_kneeling",
-                        "spread_kneeling (variant spelling: spread_kneeling)",
-                        "standing",
-                        "standing_on_one_leg",
-                        "standing_pose",
-                        "straddling",
-                        "sultry_gaze",
-                        "swaying_hips",
-                        "thighs_together",
-                        "tilting_head",
-                        "toes_pointed_inward",
-                        "torso_twist",
-                        "walking",
-                        "weight_shift",
-                        "wide_stance",
-                        "writing",
-                    ],
-                ),
-                "emotion_expression": (
-                    [
-                        "default",
-                        "random",
-                        "neutral",
-                        "happy",
-                        "sad",
-                        "angry",
-                        "surprised",
-                        "joyful",
-                        "somber",
-                        "determined",
-                        "serene",
-                        "curious",
-                        "mischievous",
-                        "thoughtful",
-                        "focused",
-                        "confused",
-                        "afraid",
-                        "bored",
-                        "smirking",
-                        "crying",
-                        "laughing",
-                        "awe",
-                    ],
-                ),
-                "lighting": (
-                    [
-                        "default",
-                        "random",
-                        "cinematic",
-                        "dramatic",
-                        "soft",
-                        "studio",
-                        "backlit",
-                        "rim lighting",
-                        "golden hour",
-                        "blue hour",
-                        "moonlight",
-                        "neon glow",
-                        "volumetric",
-                        "Rembrandt",
-                        "split lighting",
-                        "high-key",
-                        "low-key",
-                        "hard lighting",
-                        "candlelight",
-                        "firelight",
-                        "natural light",
-                        "moody",
-                    ],
-                ),
-                "framing": (
-                    [
-                        "default",
-                        "random",
-                        "close-up",
-                        "medium shot",
-                        "full body",
-                        "extreme close-up",
-                        "cowboy shot",
-                        "portrait",
-                        "wide shot",
-                        "establishing shot",
-                        "low-angle",
-                        "high-angle",
-                        "dutch angle",
-                        "profile shot",
-                        "over-the-shoulder shot",
-                        "point of view (POV)",
-                        "cinematic still",
-                        "selfie",
-                        "action shot",
-                        "panoramic",
-                        "macro shot",
-                        "fisheye lens",
-                    ],
-                ),
+                "action_pose": (option_choices("action_pose"),),
+                "emotion_expression": (option_choices("emotion_expression"),),
+                "lighting": (option_choices("lighting"),),
+                "framing": (option_choices("framing"),),
                 "chaos": (
                     "FLOAT",
                     {"default": 0.0, "min": 0.0, "max": 10.0, "step": 0.1},
@@ -333,23 +300,118 @@ class LMStudioPromptEnhancerNode:
                     "FLOAT",
                     {"default": 0.0, "min": -10.0, "max": 10.0, "step": 0.1},
                 ),
+                "dedupe_threshold": (
+                    "FLOAT",
+                    {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.01},
+                ),
+                "dedupe_retries": (
+                    "INT",
+                    {"default": 1, "min": 0, "max": 5},
+                ),
+                "prefetch_depth": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 16},
+                ),
+                "state_namespace": ("STRING", {"multiline": False, "default": ""}),
+                "semantic_cache_threshold": (
+                    "FLOAT",
+                    {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.01},
+                ),
+                "warm_up_model": ("BOOLEAN", {"default": False}),
+                "structured_output": ("BOOLEAN", {"default": False}),
+                "riff_depth": ("INT", {"default": 0, "min": 0, "max": 5}),
+                "riff_branching": ("INT", {"default": 1, "min": 1, "max": 4}),
+                "sfw_output_filter": (["redact", "regenerate", "off"],),
+                "tag_list_output": ("BOOLEAN", {"default": False}),
+                "tag_emphasis": ("STRING", {"multiline": False, "default": ""}),
+                "tag_token_budget": ("INT", {"default": 75, "min": 0, "max": 300}),
+                "scheduler_client": ("STRING", {"multiline": False, "default": ""}),
+                "scheduler_priority": (
+                    "FLOAT",
+                    {"default": 1.0, "min": 0.1, "max": 10.0, "step": 0.1},
+                ),
+                "speculative_riff": ("BOOLEAN", {"default": False}),
             },
         }
 
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING")
-    RETURN_NAMES = ("positive_prompt", "negative_prompt", "warnings", "gallery")
+    @classmethod
+    def VALIDATE_INPUTS(s, model_identifier):
+        # Models are discovered lazily, so a saved model_identifier may not be in
+        # the cached dropdown list yet. Accept it and let LM Studio decide.
+        return True
+
+    @classmethod
+    def IS_CHANGED(s, **inputs):
+        """Tell ComfyUI whether the node has to run again for these inputs.
+
+        Returns a hash of the inputs, the option catalog generation and the
+        size and modification time of each wildcard file the themes use.
+        Every random pick is drawn from the seed, so an unchanged hash means
+        an unchanged prompt and ComfyUI reuses the cached outputs. Returns NaN,
+        which never equals the previous value, when the output depends on more
+        than the inputs: riffing on the last output, refreshing the model list,
+        or a server that recently failed (so an error or fallback prompt is
+        not cached).
+        """
+        if inputs.get("riff_on_last_output") or inputs.get("refresh_models"):
+            return float("nan")
+        if not s.circuit_breaker.healthy(inputs.get("lmstudio_endpoint", "")):
+            return float("nan")
+        themes = f"{inputs.get('theme_a', '')} {inputs.get('theme_b', '')}"
+        wildcard_files = []
+        for name in sorted(set(WILDCARD_TOKEN_RE.findall(themes))):
+            try:
+                stat = (s.WILDCARD_DIR / f"{name}.txt").stat()
+                wildcard_files.append((name, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                wildcard_files.append((name, None, None))
+        key = json.dumps(
+            [
+                sorted(inputs.items()),
+                get_catalog_registry().refresh(force=True),
+                wildcard_files,
+            ],
+            default=str,
+        )
+        import hashlib
+
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = (
+        "positive_prompt",
+        "negative_prompt",
+        "warnings",
+        "gallery",
+        "provenance",
+    )
     FUNCTION = "generate_prompt"
     CATEGORY = "LMStudio"
 
     def __init__(self):
-        self.last_generated_prompt = None
+        # Riff state, last warnings and history live in a state store. An empty
+        # namespace keeps them private to this instance; a named namespace shares
+        # them through the process-wide store (see state_store.py).
+        self.state_namespace = ""
+        self._local_state = MemoryStateStore()
+        # Fair-queuing identity and weight of this node's requests
+        self.scheduler_client = "default"
+        self.scheduler_priority = 1.0
         # Cached list of models discovered at runtime. Kept to avoid network IO at import.
         self.available_models = ["No models found"]
-        # Last run warnings (list of strings)
-        self.last_warnings = []
-        self.wildcard_dir = Path(__file__).resolve().parent / "wildcards"
-        # In-memory prompt history for gallery/recall
-        self.history = []
+        self.wildcard_dir = self.WILDCARD_DIR
+        # Signatures of recent prompts for near-duplicate detection
+        self.deduplicator = PromptDeduplicator()
+        # Background buffer of pre-generated prompts (see prefetch_depth)
+        self.prefetcher = PromptPrefetcher()
+        # Riff of the last prompt requested ahead of time (see speculative_riff)
+        self.riff_speculator = RiffSpeculator()
+        # Completions reused for near-identical requests (see semantic_cache_threshold)
+        self.prompt_cache = SemanticPromptCache()
+        # Lineage of the last riff chain (see riff_depth)
+        self.last_riff_chain = []
+        # Outputs and settings of the last generation (see save_provenance)
+        self.last_provenance = None
 
     def _load_wildcard_values(self, name):
         """Load values for a single wildcard name from wildcards/<name>.txt."""
@@ -366,8 +428,11 @@ class LMStudioPromptEnhancerNode:
         except OSError:
             return None
 
-    def _resolve_wildcards(self, text, warnings):
-        """Resolve __name__ tokens using A1111-style wildcard files."""
+    def _resolve_wildcards(self, text, warnings, rng, picked=None):
+        """Resolve __name__ tokens using A1111-style wildcard files.
+
+        Chosen values are recorded in the `picked` dict, if given.
+        """
 
         def replace(match):
             name = match.group(1)
@@ -375,33 +440,121 @@ class LMStudioPromptEnhancerNode:
             if not values:
                 warnings.append(f"Wildcard __{name}__ not found or empty.")
                 return match.group(0)
-            return random.choice(values)
+            value = rng.choice(values)
+            if picked is not None:
+                picked[name] = value
+            return value
 
-        return re.sub(r"__([A-Za-z0-9_-]+)__", replace, text)
+        return WILDCARD_TOKEN_RE.sub(replace, text)
 
-    def _record_history(self, positive, negative, warnings_text):
-        """Keep a bounded history of recent prompts for gallery use."""
+    def _state(self):
+        """Return the (store, namespace) pair backing this node's state."""
+        if self.state_namespace:
+            return get_shared_state_store(), self.state_namespace
+        return self._local_state, "default"
+
+    @property
+    def last_generated_prompt(self):
+        store, namespace = self._state()
+        return store.get_last_prompt(namespace)
+
+    @last_generated_prompt.setter
+    def last_generated_prompt(self, prompt):
+        store, namespace = self._state()
+        store.set_last_prompt(namespace, prompt)
+
+    @property
+    def last_warnings(self):
+        """Last run warnings (list of strings)."""
+        store, namespace = self._state()
+        return list(store.get_warnings(namespace))
+
+    @last_warnings.setter
+    def last_warnings(self, warnings):
+        store, namespace = self._state()
+        store.set_warnings(namespace, warnings)
+
+    @property
+    def history(self):
+        """Prompt history for gallery/recall, oldest first."""
+        store, namespace = self._state()
+        return list(store.get_history(namespace))
+
+    def _record_history(
+        self,
+        positive,
+        negative,
+        warnings_text,
+        tags=(),
+        entry_id=None,
+        parent_id=None,
+    ):
+        """Keep a bounded history of recent prompts for gallery use.
+
+        Every entry gets an `id`; riffs record the id of the prompt they
+        varied as `parent_id`. Returns the entry id.
+        """
         entry = {
+            "id": entry_id or _feature("riff_chain").new_entry_id(),
+            "parent_id": parent_id,
             "positive": positive,
             "negative": negative,
             "warnings": warnings_text,
+            "tags": list(tags),
         }
-        self.history.append(entry)
-        if len(self.history) > self.HISTORY_LIMIT:
-            self.history = self.history[-self.HISTORY_LIMIT :]
+        store, namespace = self._state()
+        store.append_history(namespace, entry, self.HISTORY_LIMIT)
+        return entry["id"]
 
     def get_history(self):
         """Return a copy of the current prompt history."""
-        return list(self.history)
+        return self.history
+
+    def export_history(self, path):
+        """Write the prompt history to a .parquet, .arrow or .jsonl file.
+
+        See history_io.export_history; returns the number of entries written.
+        """
+        return _feature("history_io").export_history(self.history, path)
+
+    def import_history(self, path, reseed=True):
+        """Replace the history with the newest entries of an exported file.
+
+        Only the end of the file is read. With `reseed`, riffing continues
+        from the last imported prompt and the dedupe index remembers the
+        most recent imported prompts. Returns the number of entries read.
+        """
+        count = self.HISTORY_LIMIT
+        if reseed:
+            count = max(count, self.deduplicator.capacity)
+        entries = _feature("history_io").tail_history(path, count)
+        store, namespace = self._state()
+        store.clear(namespace)
+        for entry in entries[-self.HISTORY_LIMIT :]:
+            store.append_history(namespace, entry, self.HISTORY_LIMIT)
+        if reseed and entries:
+            self.last_generated_prompt = entries[-1]["positive"]
+            for entry in entries[-self.deduplicator.capacity :]:
+                self.deduplicator.add(entry["positive"])
+        print(f"[LMStudio] Imported {len(entries)} history entries from {path}")
+        return len(entries)
 
     def _format_gallery(self):
         """Format the prompt history as a readable gallery string."""
-        if not self.history:
+        history = self.history
+        if not history:
             return "Gallery is empty"
 
+        numbers = {
+            entry["id"]: i for i, entry in enumerate(history, 1) if entry.get("id")
+        }
         lines = []
-        for i, entry in enumerate(self.history, 1):
-            lines.append(f"--- Prompt {i} ---")
+        for i, entry in enumerate(history, 1):
+            parent = numbers.get(entry.get("parent_id"))
+            if parent:
+                lines.append(f"--- Prompt {i} (riff of Prompt {parent}) ---")
+            else:
+                lines.append(f"--- Prompt {i} ---")
             lines.append(f"Positive: {entry['positive'][:100]}...")
             if entry["negative"]:
                 lines.append(f"Negative: {entry['negative'][:100]}...")
@@ -436,17 +589,7 @@ Return only the negative prompt text, nothing else."""
         }
 
         try:
-            response = requests.post(
-                lmstudio_endpoint,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30,
-            )
-            response.raise_for_status()
-            json_response = response.json()
-            generated_negative = json_response["choices"][0]["message"][
-                "content"
-            ].strip()
+            generated_negative = self._request_completion(lmstudio_endpoint, payload)
             print(
                 f"[LMStudio] Generated negative prompt ({len(generated_negative)} chars)"
             )
@@ -455,6 +598,140 @@ Return only the negative prompt text, nothing else."""
             print(f"[LMStudio] Failed to generate negative prompt: {e}")
             return ""
 
+    def _request_completion(self, lmstudio_endpoint, payload, ticket=None):
+        """POST a chat completion payload and return the cleaned message content.
+
+        The response is decoded by response_decoder, which reads only the
+        message content and strips <think> reasoning blocks. With a
+        SpeculationTicket the request is speculative: it waits for an idle
+        server and is only sent if the ticket was not cancelled meanwhile
+        (SpeculationCancelled is raised instead).
+
+        Raises requests.exceptions.RequestException on connection/HTTP errors and
+        ValueError/KeyError/IndexError when the response has an unexpected shape.
+        """
+        import requests
+
+        with self.request_scheduler.slot(
+            lmstudio_endpoint,
+            self.scheduler_client,
+            self.scheduler_priority,
+            idle=ticket is not None,
+        ):
+            if ticket is not None and not ticket.begin():
+                raise SpeculationCancelled()
+            try:
+                response = requests.post(
+                    lmstudio_endpoint,
+                    headers={"Content-Type": "application/json"},
+                    json=payload,
+                    timeout=30,
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.circuit_breaker.record_failure(lmstudio_endpoint)
+                raise
+            self.circuit_breaker.record_success(lmstudio_endpoint)
+            response.raise_for_status()
+        print(f"[LMStudio] API response status: {response.status_code}")
+        return extract_completion(response)
+
+    def _dedupe_completion(
+        self,
+        generated_prompt,
+        lmstudio_endpoint,
+        payload,
+        threshold,
+        retries,
+        warnings,
+        structured=False,
+    ):
+        """Re-request near-duplicate completions with a bumped seed.
+
+        Each new completion is compared against recently generated prompts; when
+        the similarity reaches `threshold` the request is retried up to `retries`
+        times with seed+1, seed+2, ... The similarity is reported in `warnings`.
+        With `structured` completions the parsed positive prompt is compared,
+        since the JSON keys and punctuation are the same in every reply.
+        """
+        for attempt in range(retries + 1):
+            score = self.deduplicator.check(
+                self._dedupe_text(generated_prompt, structured), threshold
+            )
+            if score < threshold:
+                return generated_prompt
+            if attempt == retries:
+                warnings.append(
+                    f"Generated prompt is a near-duplicate of a recent prompt "
+                    f"(similarity {score:.2f} >= {threshold:.2f})."
+                )
+                return generated_prompt
+            payload = dict(payload, seed=payload.get("seed", 0) + 1)
+            warnings.append(
+                f"Rejected near-duplicate prompt (similarity {score:.2f}); "
+                f"retrying with seed {payload['seed']}."
+            )
+            print(
+                f"[LMStudio] Near-duplicate prompt (similarity {score:.2f}), "
+                f"retrying with seed {payload['seed']}"
+            )
+            generated_prompt = self._request_completion(lmstudio_endpoint, payload)
+        return generated_prompt
+
+    @staticmethod
+    def _dedupe_text(completion, structured):
+        """Return the text a completion is deduplicated on."""
+        if structured:
+            return parse_prompt_bundle(completion)["positive"]
+        return completion
+
+    def _filter_output(
+        self,
+        prompt,
+        warnings,
+        bundle=None,
+        lmstudio_endpoint=None,
+        payload=None,
+        retries=0,
+    ):
+        """Apply the SFW blocklist to a generated prompt; return (prompt, bundle).
+
+        With `retries` > 0 and a `payload`, a prompt with blocked terms is
+        re-requested with seed+1, seed+2, ... (re-parsing the structured
+        `bundle` if there is one). Terms still present afterwards are removed.
+        Hits are reported in `warnings`.
+        """
+        content_filter = self.get_content_filter()
+        hits = content_filter.scan(prompt)
+        for _ in range(retries if payload else 0):
+            if not hits:
+                break
+            payload = dict(payload, seed=payload.get("seed", 0) + 1)
+            terms = ", ".join(sorted({hit.term for hit in hits}))
+            warnings.append(
+                f"SFW filter found blocked term(s) ({terms}); "
+                f"regenerating with seed {payload['seed']}."
+            )
+            print(f"[LMStudio] SFW filter hit ({terms}), regenerating")
+            prompt = self._request_completion(lmstudio_endpoint, payload)
+            if bundle is not None:
+                bundle = parse_prompt_bundle(prompt)
+                prompt = bundle["positive"]
+            hits = content_filter.scan(prompt)
+        if hits:
+            prompt, hits = content_filter.redact(prompt)
+            warnings.append(describe_redaction(hits))
+        return prompt, bundle
+
+    def _wait_for_model(self, lmstudio_endpoint, model_identifier, warnings):
+        """Warm up the model if needed and queue this generation until it is loaded."""
+        self.model_warmup.ensure(lmstudio_endpoint, model_identifier)
+        if not self.model_warmup.wait_until_ready(lmstudio_endpoint, model_identifier):
+            error = self.model_warmup.last_error(lmstudio_endpoint, model_identifier)
+            warnings.append(
+                f"Model '{model_identifier}' could not be warmed up ({error}); "
+                "sending the request anyway."
+            )
+
     def discover_models(self, lmstudio_base_url="http://localhost:1234"):
         """Discover available models from LM Studio at runtime.
         This avoids performing network IO at import time and can be triggered by the user via `refresh_models`.
@@ -469,66 +746,64 @@ Return only the negative prompt text, nothing else."""
         print(f"[LMStudio] Updated available_models: {models}")
         return models
 
-    def generate_prompt(
+    def _build_messages(
         self,
+        warnings,
+        seed,
         enable_advanced_options,
         theme_a,
         theme_b,
         blend_mode,
-        riff_on_last_output,
-        creativity,
-        seed,
-        lmstudio_endpoint,
-        refresh_models,
-        model_identifier,
-        negative_prompt="",
-        generate_negative_prompt=False,
-        wildcard_1="none",
-        wildcard_2="none",
-        style_preset="Cinematic",
-        subject="Generic",
-        target_model="Generic",
-        prompt_tone="SFW",
-        action_pose="",
-        emotion_expression="",
-        lighting="",
-        framing="",
-        chaos=0.0,
-        mood_ancient_futuristic=0.0,
-        mood_serene_chaotic=0.0,
-        mood_organic_mechanical=0.0,
+        wildcard_1,
+        wildcard_2,
+        style_preset,
+        subject,
+        target_model,
+        prompt_tone,
+        action_pose,
+        emotion_expression,
+        lighting,
+        framing,
+        chaos,
+        mood_ancient_futuristic,
+        mood_serene_chaotic,
+        mood_organic_mechanical,
+        structured_output=False,
+        riff_prompt=None,
+        wildcard_picks=None,
     ):
+        """Build the system prompt and user message for a single generation.
 
-        # Local warnings for this run
-        warnings = []
+        When `riff_prompt` is given, the messages ask for a variation of it and
+        the theme/advanced inputs are ignored. Every random choice is drawn from
+        a `random.Random(seed)`, so identical seed and inputs give identical
+        messages. Values picked for __name__ wildcard files are recorded in
+        the `wildcard_picks` dict, if given.
+        """
+        rng = random.Random(seed)
+        advanced_people = enable_advanced_options and subject == "People"
+        picks = self.get_sampler().sample(
+            rng,
+            wildcard_1=wildcard_1,
+            wildcard_2=wildcard_2,
+            action_pose=action_pose if advanced_people else "default",
+            emotion_expression=emotion_expression if advanced_people else "default",
+            lighting=lighting if advanced_people else "default",
+            framing=framing if advanced_people else "default",
+            chaos=chaos if enable_advanced_options else 0.0,
+            sfw=prompt_tone == "SFW",
+            subject=subject,
+            target_model=target_model,
+        )
 
         # Inject selected wildcards into themes
-        if wildcard_1 and wildcard_1 != "none":
-            selected = random.choice(self.WILDCARDS.get(wildcard_1, []))
-            theme_a = f"{theme_a}, {selected}"
-        if wildcard_2 and wildcard_2 != "none":
-            selected = random.choice(self.WILDCARDS.get(wildcard_2, []))
-            theme_b = f"{theme_b}, {selected}"
-
-        # Optionally refresh model list at runtime (no network IO at import)
-        if refresh_models:
-            print("[LMStudio] refresh_models=True, triggering model discovery")
-            self.discover_models()
-            if not model_identifier or model_identifier == "No models found":
-                if self.available_models and self.available_models[0]:
-                    model_identifier = self.available_models[0]
-                    print(f"[LMStudio] Auto-selected model: {model_identifier}")
-            if model_identifier == "No models found":
-                warnings.append(
-                    "No models found at LM Studio; model identifier could not be discovered."
-                )
-        else:
-            print(
-                f"[LMStudio] refresh_models=False, using model_identifier: {model_identifier}"
-            )
+        if picks.theme_a_wildcard:
+            theme_a = f"{theme_a}, {picks.theme_a_wildcard}"
+        if picks.theme_b_wildcard:
+            theme_b = f"{theme_b}, {picks.theme_b_wildcard}"
 
         # If riffing, use a completely different logic path
-        if riff_on_last_output and self.last_generated_prompt:
+        if riff_prompt:
             base_system_prompt = f"""You are a creative assistant for a text-to-image AI.
 Your task is to take the user's prompt and create a creative variation of it.
 
@@ -539,7 +814,7 @@ Follow these rules:
 4.  **Avoid Clutter:** Do not include any meta-commentary.
     The output should only be the positive prompt itself.
 """
-            user_message = f'The previous prompt was: "{self.last_generated_prompt}"'
+            user_message = f'The previous prompt was: "{riff_prompt}"'
         else:
             # Normal generation logic
             blend_instructions = {
@@ -594,43 +869,22 @@ Follow these rules:
             if enable_advanced_options:
                 # All advanced logic, including subject-specifics, goes here
                 if subject == "People":
-                    if action_pose == "random":
-                        options = self.INPUT_TYPES()["optional"]["action_pose"][0]
-                        choices = [
-                            opt for opt in options if opt not in ["default", "random"]
-                        ]
-                        # When tone is SFW, filter out explicit poses
-                        if prompt_tone == "SFW":
-                            choices = [
-                                opt for opt in choices if opt not in self.EXPLICIT_POSES
-                            ]
-                        if not choices:
-                            action_pose = "default"
-                            warnings.append(
-                                "No non-explicit poses available for SFW tone; action_pose set to 'default'."
-                            )
-                        else:
-                            action_pose = random.choice(choices)
-                    if emotion_expression == "random":
-                        options = self.INPUT_TYPES()["optional"]["emotion_expression"][
-                            0
-                        ]
-                        emotion_expression = random.choice(
-                            [opt for opt in options if opt not in ["default", "random"]]
-                        )
-                    if lighting == "random":
-                        options = self.INPUT_TYPES()["optional"]["lighting"][0]
-                        lighting = random.choice(
-                            [opt for opt in options if opt not in ["default", "random"]]
-                        )
-                    if framing == "random":
-                        options = self.INPUT_TYPES()["optional"]["framing"][0]
-                        framing = random.choice(
-                            [opt for opt in options if opt not in ["default", "random"]]
+                    # "random" options were resolved by the sampler; explicit poses
+                    # are excluded from the random pool when the tone is SFW
+                    action_pose = picks.action_pose
+                    if action_pose is None:
+                        action_pose = "default"
+                        warnings.append(
+                            "No non-explicit poses available for SFW tone; action_pose set to 'default'."
                         )
+                    emotion_expression = picks.emotion_expression
+                    lighting = picks.lighting
+                    framing = picks.framing
 
                     # If a user explicitly selected an explicit pose but the tone is SFW, ignore it
-                    if prompt_tone == "SFW" and action_pose in self.EXPLICIT_POSES:
+                    if prompt_tone == "SFW" and self.get_catalog(
+                        "action_pose"
+                    ).is_explicit(action_pose):
                         orig = action_pose
                         action_pose = "default"
                         warnings.append(
@@ -648,60 +902,98 @@ Follow these rules:
                     if framing and framing != "default":
                         user_message += f"\n- Framing: '{framing}'"
 
-                if chaos > 0:
-                    num_to_select = int((chaos + 2) / 3) if chaos < 10 else 4
-                    all_wildcards = (
-                        self.WILDCARDS["materials"]
-                        + self.WILDCARDS["environments"]
-                        + self.WILDCARDS["styles"]
-                    )
-                    num_to_select = min(num_to_select, len(all_wildcards))
-                    selected_wildcards = random.sample(all_wildcards, num_to_select)
-                    user_message += f"\n- Wildcards: {', '.join(selected_wildcards)}"
-
-                mood_keywords = []
-                if mood_ancient_futuristic < -1.0:
-                    mood_keywords.append("ancient")
-                elif mood_ancient_futuristic > 1.0:
-                    mood_keywords.append("futuristic")
-                if mood_serene_chaotic < -1.0:
-                    mood_keywords.append("serene")
-                elif mood_serene_chaotic > 1.0:
-                    mood_keywords.append("chaotic")
-                if mood_organic_mechanical < -1.0:
-                    mood_keywords.append("organic")
-                elif mood_organic_mechanical > 1.0:
-                    mood_keywords.append("mechanical")
-
-                if mood_keywords:
-                    user_message += f"\n- Moods: {', '.join(mood_keywords)}"
+                if picks.chaos_wildcards:
+                    user_message += f"\n- Wildcards: {', '.join(picks.chaos_wildcards)}"
+
+                moods = mood_descriptors(
+                    mood_ancient_futuristic,
+                    mood_serene_chaotic,
+                    mood_organic_mechanical,
+                )
+                if moods:
+                    user_message += f"\n- Moods: {moods}"
 
         # Common logic for both riff and normal generation
         system_prompt = base_system_prompt
+        if structured_output:
+            system_prompt += """
+Respond only with a JSON object with these keys:
+- "positive": the prompt itself, following the rules above.
+- "negative": a concise negative prompt listing the unwanted qualities, artifacts
+  and defects that would ruin this specific image.
+- "tags": a list of short keyword tags describing the image.
+"""
         user_message += f"\nPrompt Tone: '{prompt_tone}'"
 
         # Resolve external wildcards in both system and user messages
-        system_prompt = self._resolve_wildcards(system_prompt, warnings)
-        user_message = self._resolve_wildcards(user_message, warnings)
-
-        pony_tags = ""
-        if target_model == "Pony":
-            pony_tags = "score_9, score_8_up, score_7_up"
-            if style_preset == "Anime":
-                pony_tags += ", source_anime"
-
-        appended_style = ""
-        if target_model in ["Generic", "Flux", "SDXL"]:
-            photographic_style = (
-                "cinematic photo, 35mm film, professional, 4k, high resolution"
+        system_prompt = self._resolve_wildcards(
+            system_prompt, warnings, rng, wildcard_picks
+        )
+        user_message = self._resolve_wildcards(
+            user_message, warnings, rng, wildcard_picks
+        )
+
+        return system_prompt, user_message, picks
+
+    def _apply_model_styling(
+        self, generated_prompt, target_model, style_preset, **tag_options
+    ):
+        """Add the model-specific quality tags or style suffix to a prompt."""
+        return apply_model_styling(
+            generated_prompt, target_model, style_preset, **tag_options
+        )
+
+    def _cache_key(self, message_options, picks, model_identifier, creativity, seed):
+        """Split a request into an exact cache bucket and fuzzy-matched theme text.
+
+        Option values are canonicalized, "random" options are replaced by the
+        values actually picked, and wildcard picks are sorted, so requests that
+        differ only in trivial wording or ordering share a bucket.
+        """
+        resolved = dict(message_options, **picks._asdict())
+        bucket = [
+            ("model", model_identifier),
+            ("creativity", creativity),
+            ("seed", seed),
+        ]
+        for name, value in sorted(resolved.items()):
+            if name in ("theme_a", "theme_b", "chaos_wildcards"):
+                continue
+            bucket.append((name, canonicalize(value)))
+        bucket.append(
+            (
+                "chaos_wildcards",
+                tuple(sorted(canonicalize(w) for w in picks.chaos_wildcards)),
             )
-            artistic_style = "masterpiece, best quality, absurdres, ultra-detailed, intricate details"
-            if style_preset in ["Photorealistic", "Cinematic"]:
-                appended_style = photographic_style
-            else:
-                appended_style = artistic_style
+        )
+        theme_a = canonicalize(message_options["theme_a"])
+        theme_b = canonicalize(message_options["theme_b"])
+        return tuple(bucket), f"{theme_a} | {theme_b}"
+
+    def _generate_completion(
+        self,
+        message_options,
+        lmstudio_endpoint,
+        model_identifier,
+        creativity,
+        seed,
+        warnings,
+        riff_prompt=None,
+        cache_threshold=0.0,
+        payload_cache=None,
+        ticket=None,
+    ):
+        """Build the request for one generation and return (completion, payload, cached).
 
-        headers = {"Content-Type": "application/json"}
+        With `cache_threshold` > 0 a completion cached for a near-identical
+        request is returned instead of calling LM Studio (`cached` is True).
+        A `payload_cache` (batch_runner.CallCache) shares the completion of
+        byte-identical payloads, e.g. between the cells of a sweep. A `ticket`
+        marks a speculative request (see _request_completion).
+        """
+        system_prompt, user_message, picks = self._build_messages(
+            warnings, seed, riff_prompt=riff_prompt, **message_options
+        )
         payload = {
             "model": model_identifier,
             "messages": [
@@ -711,20 +1003,681 @@ Follow these rules:
             "temperature": creativity,
             "seed": seed,
         }
+        if message_options.get("structured_output"):
+            payload["response_format"] = PROMPT_BUNDLE_RESPONSE_FORMAT
+        use_cache = cache_threshold > 0 and not riff_prompt
+        if use_cache:
+            bucket, text = self._cache_key(
+                message_options, picks, model_identifier, creativity, seed
+            )
+            hit = self.prompt_cache.lookup(bucket, text, cache_threshold)
+            if hit:
+                completion, score = hit
+                warnings.append(
+                    f"Reused a cached completion for a near-identical request "
+                    f"(similarity {score:.2f}); LM Studio was not called."
+                )
+                print(f"[LMStudio] Semantic cache hit (similarity {score:.2f})")
+                return completion, payload, True
+
+        if payload_cache is not None:
+            completion, shared = payload_cache.get(
+                json.dumps(payload, sort_keys=True),
+                lambda: self._request_completion(lmstudio_endpoint, payload),
+            )
+            if shared:
+                return completion, payload, True
+        else:
+            completion = self._request_completion(lmstudio_endpoint, payload, ticket)
+        if use_cache:
+            self.prompt_cache.store(bucket, text, completion)
+        return completion, payload, False
+
+    def _take_prefetched(
+        self,
+        message_options,
+        lmstudio_endpoint,
+        model_identifier,
+        creativity,
+        seed,
+        prefetch_depth,
+    ):
+        """Serve the completion pre-generated for this configuration and seed.
+
+        The buffer is keyed by every input except the seed; a different key
+        invalidates it. It holds completions for the seeds after the one
+        that started it, so only runs whose seed is incremented are served.
+        A background refill is scheduled either way, at idle priority.
+        """
+        key = (
+            lmstudio_endpoint,
+            model_identifier,
+            creativity,
+            tuple(sorted(message_options.items())),
+        )
+        item = self.prefetcher.take(key, seed)
+
+        def produce(item_seed, ticket):
+            item_warnings = []
+            completion, payload, _ = self._generate_completion(
+                message_options,
+                lmstudio_endpoint,
+                model_identifier,
+                creativity,
+                item_seed,
+                item_warnings,
+                ticket=ticket,
+            )
+            return completion, item_warnings, payload
+
+        self.prefetcher.refill(key, seed, produce, prefetch_depth)
+        return item
+
+    def _riff_key(
+        self,
+        riff_prompt,
+        message_options,
+        lmstudio_endpoint,
+        model_identifier,
+        creativity,
+        seed,
+    ):
+        """Inputs a riff depends on; a speculated riff is reused only if all match."""
+        return (
+            riff_prompt,
+            lmstudio_endpoint,
+            model_identifier,
+            creativity,
+            seed,
+            tuple(sorted(message_options.items())),
+        )
+
+    def _speculate_riff(
+        self, message_options, lmstudio_endpoint, model_identifier, creativity, seed
+    ):
+        """Request the riff of the last prompt in the background, at idle priority.
+
+        The next run takes it if it riffs with the same inputs and `seed`.
+        """
+        riff_prompt = self.last_generated_prompt
+        key = self._riff_key(
+            riff_prompt,
+            message_options,
+            lmstudio_endpoint,
+            model_identifier,
+            creativity,
+            seed,
+        )
+
+        def produce(ticket):
+            item_warnings = []
+            completion, payload, _ = self._generate_completion(
+                message_options,
+                lmstudio_endpoint,
+                model_identifier,
+                creativity,
+                seed,
+                item_warnings,
+                riff_prompt=riff_prompt,
+                ticket=ticket,
+            )
+            return completion, item_warnings, payload
+
+        self.riff_speculator.schedule(key, produce)
+
+    # Defaults for the prompt-shaping inputs when generating outside generate_prompt
+    MESSAGE_OPTION_DEFAULTS = {
+        "enable_advanced_options": False,
+        "wildcard_1": "none",
+        "wildcard_2": "none",
+        "style_preset": "Cinematic",
+        "subject": "Generic",
+        "target_model": "Generic",
+        "prompt_tone": "SFW",
+        "action_pose": "default",
+        "emotion_expression": "default",
+        "lighting": "default",
+        "framing": "default",
+        "chaos": 0.0,
+        "mood_ancient_futuristic": 0.0,
+        "mood_serene_chaotic": 0.0,
+        "mood_organic_mechanical": 0.0,
+        "structured_output": False,
+    }
+
+    # Defaults for the tag-list inputs, which only affect styling
+    TAG_OPTION_DEFAULTS = {
+        "tag_list_output": False,
+        "tag_emphasis": "",
+        "tag_token_budget": 75,
+    }
+
+    def complete_prompt(
+        self,
+        theme_a,
+        theme_b,
+        blend_mode,
+        creativity,
+        seed,
+        lmstudio_endpoint,
+        model_identifier,
+        payload_cache=None,
+        postprocess=True,
+        **options,
+    ):
+        """Generate one styled positive prompt and return (prompt, warnings, cached).
+
+        Unlike generate_prompt this does not touch riff state, history, the
+        dedupe index or the caches, so batch nodes can call it from worker
+        threads. `cached` is True when the completion came from `payload_cache`.
+        With `postprocess=False` the raw completion is returned unparsed,
+        unfiltered and unstyled (see prompt_pipeline.postprocess_prompt).
+        Raises the same request/format errors as _request_completion.
+        """
+        tag_options = {
+            name: options.pop(name, default)
+            for name, default in self.TAG_OPTION_DEFAULTS.items()
+        }
+        message_options = dict(
+            self.MESSAGE_OPTION_DEFAULTS,
+            theme_a=theme_a,
+            theme_b=theme_b,
+            blend_mode=blend_mode,
+            **options,
+        )
+        warnings = []
+        completion, _, cached = self._generate_completion(
+            message_options,
+            lmstudio_endpoint,
+            model_identifier,
+            creativity,
+            seed,
+            warnings,
+            payload_cache=payload_cache,
+        )
+        if not postprocess:
+            return completion, warnings, cached
+        if message_options["structured_output"]:
+            completion = parse_prompt_bundle(completion)["positive"]
+        if message_options["prompt_tone"] == "SFW":
+            completion, _ = self._filter_output(completion, warnings)
+        prompt = self._apply_model_styling(
+            completion,
+            message_options["target_model"],
+            message_options["style_preset"],
+            warnings=warnings,
+            **tag_options,
+        )
+        return prompt, warnings, cached
+
+    def _run_riff_chain(
+        self,
+        riff_prompt,
+        root_id,
+        message_options,
+        lmstudio_endpoint,
+        model_identifier,
+        creativity,
+        seed,
+        depth,
+        branching,
+        dedupe_threshold,
+        warnings,
+        filter_output=False,
+    ):
+        """Expand a riff tree from `riff_prompt` and return its accepted nodes.
+
+        `root_id` is the history id of the riffed prompt. Each node riffs on its parent with seed + node index. With
+        `dedupe_threshold` > 0 near-duplicate variations are dropped and not
+        expanded further. With `filter_output` blocked terms are removed from
+        each variation before it is riffed on. Nodes are returned in tree order
+        (parents first).
+        """
+        structured = message_options["structured_output"]
+
+        def riff(parent_prompt, index):
+            completion, _, _ = self._generate_completion(
+                message_options,
+                lmstudio_endpoint,
+                model_identifier,
+                creativity,
+                seed + index,
+                [],
+                riff_prompt=parent_prompt,
+            )
+            text = (
+                parse_prompt_bundle(completion)["positive"]
+                if structured
+                else completion
+            )
+            if filter_output:
+                text, _ = self._filter_output(text, warnings)
+            return text, completion
+
+        def accept(node):
+            if dedupe_threshold > 0:
+                score = self.deduplicator.check(node.extra, dedupe_threshold)
+                if score >= dedupe_threshold:
+                    warnings.append(
+                        f"Dropped near-duplicate riff at depth {node.depth} "
+                        f"(similarity {score:.2f})."
+                    )
+                    return False
+            self.deduplicator.add(node.extra)
+            return True
+
+        print(f"[LMStudio] Expanding riff chain (depth {depth}, branching {branching})")
+        nodes = _feature("riff_chain").riff_tree(
+            riff,
+            riff_prompt,
+            depth,
+            branching,
+            max_workers=self.RIFF_CHAIN_WORKERS,
+            accept=accept,
+            root_id=root_id,
+        )
+        return sorted(nodes, key=lambda node: node.index)
+
+    def _random_picks(self, message_options, seed):
+        """Return the random choices made for a generation with `seed`.
+
+        Message building is deterministic for a seed, so the picks are
+        recomputed rather than carried through every generation path.
+        """
+        wildcard_files = {}
+        _, _, picks = self._build_messages(
+            [], seed, wildcard_picks=wildcard_files, **message_options
+        )
+        result = {
+            name: value
+            for name, value in picks._asdict().items()
+            if value and value != message_options.get(name)
+        }
+        result.update(wildcard_files)
+        return result
+
+    def _fallback_prompt(self, message_options, seed, warnings):
+        """Synthesize a prompt from the inputs with local templates (no LLM).
+
+        Uses the same seeded picks (wildcards, random options, chaos) as an
+        LM Studio request with this seed would.
+        """
+        options = message_options
+        advanced = options["enable_advanced_options"]
+        _, _, picks = self._build_messages([], seed, **options)
+        details = []
+        if advanced and options["subject"] == "People":
+            for name in OPTION_CATALOGS:
+                value = getattr(picks, name, None)
+                if not value or value == "default":
+                    continue
+                if options["prompt_tone"] == "SFW" and self.get_catalog(
+                    name
+                ).is_explicit(value):
+                    continue
+                details.append(value.replace("_", " "))
+        rng = random.Random(seed)
+        themes = []
+        for theme, wildcard in (
+            (options["theme_a"], picks.theme_a_wildcard),
+            (options["theme_b"], picks.theme_b_wildcard),
+        ):
+            if wildcard:
+                theme = f"{theme}, {wildcard}"
+            themes.append(self._resolve_wildcards(theme, warnings, rng))
+        moods = ""
+        if advanced:
+            moods = mood_descriptors(
+                options["mood_ancient_futuristic"],
+                options["mood_serene_chaotic"],
+                options["mood_organic_mechanical"],
+            )
+        return _feature("prompt_fallback").synthesize_prompt(
+            themes[0],
+            themes[1],
+            blend_mode=options["blend_mode"],
+            style_preset=options["style_preset"],
+            seed=seed,
+            details=details,
+            moods=moods,
+            wildcards=picks.chaos_wildcards if advanced else (),
+            tag_list=options["target_model"] in TAG_MODELS,
+        )
+
+    def _fallback_result(
+        self,
+        message_options,
+        tag_options,
+        lmstudio_endpoint,
+        model_identifier,
+        creativity,
+        seed,
+        negative_prompt,
+        warnings,
+    ):
+        """Return node outputs with a locally synthesized prompt.
+
+        Used while the circuit breaker for the endpoint is open. The result
+        is flagged in warnings and history but does not become the riff
+        source, so riffing resumes from the last LM Studio prompt.
+        """
+        prompt = self._fallback_prompt(message_options, seed, warnings)
+        warnings.append(
+            f"Fallback: LM Studio at {lmstudio_endpoint} is unreachable, so this "
+            "prompt was built from local templates. LM Studio will be retried "
+            f"in {self.circuit_breaker.retry_in(lmstudio_endpoint):.0f}s."
+        )
+        if message_options["prompt_tone"] == "SFW":
+            prompt, _ = self._filter_output(prompt, warnings)
+        prompt = self._apply_model_styling(
+            prompt,
+            message_options["target_model"],
+            message_options["style_preset"],
+            warnings=warnings,
+            **tag_options,
+        )
+        warnings_text = "\n".join(warnings)
+        self.last_warnings = warnings
+        entry_id = self._record_history(
+            positive=prompt,
+            negative=negative_prompt,
+            warnings_text=warnings_text,
+            tags=["fallback"],
+        )
+        self.last_provenance = _feature("png_provenance").build_provenance(
+            prompt,
+            negative_prompt,
+            model=model_identifier,
+            seed=seed,
+            creativity=creativity,
+            blend_mode=message_options["blend_mode"],
+            wildcard_picks=self._random_picks(message_options, seed),
+            theme_a=message_options["theme_a"],
+            theme_b=message_options["theme_b"],
+            target_model=message_options["target_model"],
+            style_preset=message_options["style_preset"],
+            prompt_tone=message_options["prompt_tone"],
+            id=entry_id,
+            parent_id=None,
+            fallback=True,
+        )
+        return (
+            prompt,
+            negative_prompt,
+            warnings_text,
+            self._format_gallery(),
+            self._provenance_output(),
+        )
+
+    def get_provenance(self):
+        """Return the outputs and settings of the last generation, or None."""
+        return dict(self.last_provenance) if self.last_provenance else None
+
+    def _provenance_output(self):
+        """Return the last generation's provenance as the JSON node output."""
+        return _feature("png_provenance").dump_provenance(self.last_provenance)
+
+    def save_provenance(self, png_path, output_path=None):
+        """Embed the last generation's provenance in a PNG (in place by default).
+
+        See png_provenance.write_provenance; read it back with read_provenance.
+        """
+        if not self.last_provenance:
+            raise ValueError("No prompt has been generated yet")
+        _feature("png_provenance").write_provenance(
+            png_path, output_path or png_path, self.last_provenance
+        )
+
+    def get_riff_chain(self):
+        """Return the lineage of the last riff chain (id, parent_id, depth, prompt)."""
+        return [dict(entry) for entry in self.last_riff_chain]
+
+    def get_stats(self):
+        """Return runtime statistics for this node (prefetch and cache hit rates)."""
+        return {
+            "prefetch": self.prefetcher.stats(),
+            "semantic_cache": self.prompt_cache.stats(),
+            "scheduler": self.request_scheduler.stats(),
+            "speculative_riff": self.riff_speculator.stats(),
+            "memory": self.memory_profiler.stats(),
+        }
+
+    @profile_memory
+    def generate_prompt(
+        self,
+        enable_advanced_options,
+        theme_a,
+        theme_b,
+        blend_mode,
+        riff_on_last_output,
+        creativity,
+        seed,
+        lmstudio_endpoint,
+        refresh_models,
+        model_identifier,
+        negative_prompt="",
+        generate_negative_prompt=False,
+        wildcard_1="none",
+        wildcard_2="none",
+        style_preset="Cinematic",
+        subject="Generic",
+        target_model="Generic",
+        prompt_tone="SFW",
+        action_pose="",
+        emotion_expression="",
+        lighting="",
+        framing="",
+        chaos=0.0,
+        mood_ancient_futuristic=0.0,
+        mood_serene_chaotic=0.0,
+        mood_organic_mechanical=0.0,
+        dedupe_threshold=0.0,
+        dedupe_retries=1,
+        prefetch_depth=0,
+        state_namespace="",
+        semantic_cache_threshold=0.0,
+        warm_up_model=False,
+        structured_output=False,
+        riff_depth=0,
+        riff_branching=1,
+        sfw_output_filter="redact",
+        tag_list_output=False,
+        tag_emphasis="",
+        tag_token_budget=75,
+        scheduler_client="",
+        scheduler_priority=1.0,
+        speculative_riff=False,
+    ):
+
+        import requests
+
+        # Local warnings for this run
+        warnings = []
+        self.state_namespace = state_namespace.strip()
+        self.scheduler_client = (
+            scheduler_client.strip() or self.state_namespace or "default"
+        )
+        self.scheduler_priority = scheduler_priority
+
+        # Optionally refresh model list at runtime (no network IO at import)
+        if refresh_models:
+            print("[LMStudio] refresh_models=True, triggering model discovery")
+            self.discover_models()
+            if not model_identifier or model_identifier == "No models found":
+                if self.available_models and self.available_models[0]:
+                    model_identifier = self.available_models[0]
+                    print(f"[LMStudio] Auto-selected model: {model_identifier}")
+            if model_identifier == "No models found":
+                warnings.append(
+                    "No models found at LM Studio; model identifier could not be discovered."
+                )
+        else:
+            print(
+                f"[LMStudio] refresh_models=False, using model_identifier: {model_identifier}"
+            )
+
+        offline = not self.circuit_breaker.allow(lmstudio_endpoint)
+        if (
+            warm_up_model
+            and not offline
+            and model_identifier
+            and model_identifier != "No models found"
+        ):
+            self._wait_for_model(lmstudio_endpoint, model_identifier, warnings)
+
+        riff_prompt = self.last_generated_prompt if riff_on_last_output else None
+        message_options = {
+            "enable_advanced_options": enable_advanced_options,
+            "theme_a": theme_a,
+            "theme_b": theme_b,
+            "blend_mode": blend_mode,
+            "wildcard_1": wildcard_1,
+            "wildcard_2": wildcard_2,
+            "style_preset": style_preset,
+            "subject": subject,
+            "target_model": target_model,
+            "prompt_tone": prompt_tone,
+            "action_pose": action_pose,
+            "emotion_expression": emotion_expression,
+            "lighting": lighting,
+            "framing": framing,
+            "chaos": chaos,
+            "mood_ancient_futuristic": mood_ancient_futuristic,
+            "mood_serene_chaotic": mood_serene_chaotic,
+            "mood_organic_mechanical": mood_organic_mechanical,
+            "structured_output": structured_output,
+        }
+
+        tag_options = {
+            "tag_list_output": tag_list_output,
+            "tag_emphasis": tag_emphasis,
+            "tag_token_budget": tag_token_budget,
+        }
+
+        if offline:
+            return self._fallback_result(
+                message_options,
+                tag_options,
+                lmstudio_endpoint,
+                model_identifier,
+                creativity,
+                seed,
+                negative_prompt,
+                warnings,
+            )
 
         print(f"[LMStudio] Sending request to {lmstudio_endpoint}")
         print(f"[LMStudio] Using model: {model_identifier}")
         print(f"[LMStudio] Temperature: {creativity}")
 
         try:
-            response = requests.post(
-                lmstudio_endpoint, headers=headers, json=payload, timeout=30
-            )
-            response.raise_for_status()
-            print(f"[LMStudio] API response status: {response.status_code}")
+            prefetched = None
+            cached = False
+            chain = []
+            final = None
+            payload = None
+            parent_id = None
+            if riff_prompt:
+                history = self.history
+                parent_id = history[-1].get("id") if history else None
+            if riff_prompt and riff_depth > 0:
+                chain = self._run_riff_chain(
+                    riff_prompt,
+                    parent_id,
+                    message_options,
+                    lmstudio_endpoint,
+                    model_identifier,
+                    creativity,
+                    seed,
+                    riff_depth,
+                    riff_branching,
+                    dedupe_threshold,
+                    warnings,
+                    filter_output=prompt_tone == "SFW" and sfw_output_filter != "off",
+                )
+                if not chain:
+                    warnings.append(
+                        "Every riff variation was a near-duplicate; "
+                        "returning the previous prompt."
+                    )
+            elif prefetch_depth > 0 and not riff_prompt:
+                prefetched = self._take_prefetched(
+                    message_options,
+                    lmstudio_endpoint,
+                    model_identifier,
+                    creativity,
+                    seed,
+                    prefetch_depth,
+                )
+            elif riff_prompt and speculative_riff:
+                prefetched = self.riff_speculator.take(
+                    self._riff_key(
+                        riff_prompt,
+                        message_options,
+                        lmstudio_endpoint,
+                        model_identifier,
+                        creativity,
+                        seed,
+                    ),
+                    timeout=30,
+                )
+            if riff_prompt and riff_depth > 0:
+                # The deepest variation is the result; the chain was deduplicated
+                final = max(chain, key=lambda node: node.depth, default=None)
+                generated_prompt = final.extra if final else riff_prompt
+                parent_id = final.parent_id if final else parent_id
+            elif prefetched:
+                generated_prompt, item_warnings, payload = prefetched
+                warnings.extend(item_warnings)
+                if riff_prompt:
+                    print("[LMStudio] Served riff from speculative precomputation")
+                else:
+                    print("[LMStudio] Served prompt from prefetch buffer")
+            else:
+                generated_prompt, payload, cached = self._generate_completion(
+                    message_options,
+                    lmstudio_endpoint,
+                    model_identifier,
+                    creativity,
+                    seed,
+                    warnings,
+                    riff_prompt=riff_prompt,
+                    cache_threshold=semantic_cache_threshold,
+                )
+            # A cache hit is an intentional repeat, so it is not deduplicated.
+            # In structured mode the parsed positive prompt is compared. A riff
+            # chain deduplicates its own variations, and when it rejected all
+            # of them there is no request to retry.
+            if not (riff_prompt and riff_depth > 0):
+                if dedupe_threshold > 0 and not cached:
+                    generated_prompt = self._dedupe_completion(
+                        generated_prompt,
+                        lmstudio_endpoint,
+                        payload,
+                        dedupe_threshold,
+                        dedupe_retries,
+                        warnings,
+                        structured=structured_output,
+                    )
+                self.deduplicator.add(
+                    self._dedupe_text(generated_prompt, structured_output)
+                )
 
-            json_response = response.json()
-            generated_prompt = json_response["choices"][0]["message"]["content"].strip()
+            bundle = None
+            if structured_output:
+                bundle = parse_prompt_bundle(generated_prompt)
+                generated_prompt = bundle["positive"]
+            if prompt_tone == "SFW" and sfw_output_filter != "off":
+                generated_prompt, bundle = self._filter_output(
+                    generated_prompt,
+                    warnings,
+                    bundle=bundle,
+                    lmstudio_endpoint=lmstudio_endpoint,
+                    payload=payload,
+                    retries=(
+                        self.FILTER_RETRIES if sfw_output_filter == "regenerate" else 0
+                    ),
+                )
             print(
                 f"[LMStudio] Successfully generated prompt ({len(generated_prompt)} chars)"
             )
@@ -732,19 +1685,29 @@ Follow these rules:
             # Save the successful output for the next riff
             self.last_generated_prompt = generated_prompt
 
-            if target_model == "Pony":
-                generated_prompt = f"{pony_tags} {generated_prompt}"
-
-            if target_model in ["Generic", "Flux", "SDXL"]:
-                generated_prompt = f"{generated_prompt} {appended_style}"
+            generated_prompt = self._apply_model_styling(
+                generated_prompt,
+                target_model,
+                style_preset,
+                warnings=warnings,
+                **tag_options,
+            )
 
             generated_negative_prompt = negative_prompt
 
-            # Generate intelligent negative prompt if requested
+            # Generate intelligent negative prompt if requested. Structured output
+            # already carries one; a second request is only made when the model
+            # ignored the schema.
             if generate_negative_prompt:
-                gen_neg = self._generate_negative_prompt(
-                    generated_prompt, lmstudio_endpoint, model_identifier, creativity
-                )
+                if bundle and bundle["negative"]:
+                    gen_neg = bundle["negative"]
+                else:
+                    gen_neg = self._generate_negative_prompt(
+                        generated_prompt,
+                        lmstudio_endpoint,
+                        model_identifier,
+                        creativity,
+                    )
                 if gen_neg:
                     # Combine user negative prompt (if any) with generated one
                     generated_negative_prompt = (
@@ -755,18 +1718,100 @@ Follow these rules:
 
             # Save warnings and history for external inspection/gallery
             self.last_warnings = warnings
-            self._record_history(
+            self.last_riff_chain = []
+            for node in chain:
+                styled = self._apply_model_styling(
+                    node.prompt, target_model, style_preset, **tag_options
+                )
+                self.last_riff_chain.append(
+                    {
+                        "id": node.id,
+                        "parent_id": node.parent_id,
+                        "depth": node.depth,
+                        "prompt": styled,
+                    }
+                )
+                if node is not final:
+                    self._record_history(
+                        positive=styled,
+                        negative="",
+                        warnings_text="",
+                        tags=(
+                            parse_prompt_bundle(node.extra)["tags"]
+                            if structured_output
+                            else []
+                        ),
+                        entry_id=node.id,
+                        parent_id=node.parent_id,
+                    )
+            entry_id = self._record_history(
                 positive=generated_prompt,
                 negative=generated_negative_prompt,
                 warnings_text=warnings_text,
+                tags=bundle["tags"] if bundle else [],
+                entry_id=final.id if final else None,
+                parent_id=parent_id,
+            )
+            # Riffs ignore the themes and options, so they have no picks
+            self.last_provenance = _feature("png_provenance").build_provenance(
+                generated_prompt,
+                generated_negative_prompt,
+                model=model_identifier,
+                seed=seed,
+                creativity=creativity,
+                blend_mode=blend_mode,
+                wildcard_picks=(
+                    {}
+                    if riff_prompt
+                    else self._random_picks(
+                        message_options, payload["seed"] if payload else seed
+                    )
+                ),
+                theme_a=theme_a,
+                theme_b=theme_b,
+                target_model=target_model,
+                style_preset=style_preset,
+                prompt_tone=prompt_tone,
+                id=entry_id,
+                parent_id=parent_id,
             )
 
+            if speculative_riff and riff_depth == 0:
+                self._speculate_riff(
+                    message_options,
+                    lmstudio_endpoint,
+                    model_identifier,
+                    creativity,
+                    seed + 1,
+                )
+
             # Format gallery output
             gallery = self._format_gallery()
 
-            return (generated_prompt, generated_negative_prompt, warnings_text, gallery)
+            return (
+                generated_prompt,
+                generated_negative_prompt,
+                warnings_text,
+                gallery,
+                self._provenance_output(),
+            )
 
         except requests.exceptions.RequestException as e:
+            if warm_up_model:
+                # The model may have been unloaded; warm it up again next time
+                self.model_warmup.invalidate(lmstudio_endpoint, model_identifier)
+            if self.circuit_breaker.is_open(lmstudio_endpoint):
+                print(f"[LMStudio] Request failed: {e}")
+                return self._fallback_result(
+                    message_options,
+                    tag_options,
+                    lmstudio_endpoint,
+                    model_identifier,
+                    creativity,
+                    seed,
+                    negative_prompt,
+                    warnings,
+                )
             error_message = (
                 f"API Error: Could not connect to LM Studio at {lmstudio_endpoint}. "
                 "Please ensure it is running and the endpoint is correct. "
@@ -774,7 +1819,8 @@ Follow these rules:
             )
             self.last_warnings = [error_message]
             gallery = self._format_gallery()
-            return (error_message, negative_prompt, error_message, gallery)
+            # Nothing was generated, so there is no provenance to save
+            return (error_message, negative_prompt, error_message, gallery, "")
         except (ValueError, KeyError, IndexError) as e:
             error_message = (
                 "API Error: Received an unexpected response format from the API. "
@@ -782,4 +1828,5 @@ Follow these rules:
             )
             self.last_warnings = [error_message]
             gallery = self._format_gallery()
-            return (error_message, negative_prompt, error_message, gallery)
+            # Nothing was generated, so there is no provenance to save
+            return (error_message, negative_prompt, error_message, gallery, "")
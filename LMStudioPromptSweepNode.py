@@ -0,0 +1,247 @@
+import csv
+import json
+import time
+from itertools import islice, product
+from math import prod
+
+try:
+    from .batch_runner import CallCache, run_bounded
+    from .LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+except ImportError:
+    from batch_runner import CallCache, run_bounded
+    from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+
+# Swept parameters, in the order they vary (the last one changes fastest).
+SWEEP_AXES = ("creativity", "chaos", "style_preset", "target_model")
+
+RESULT_FIELDS = SWEEP_AXES + ("index", "prompt", "error", "latency_ms", "cached")
+
+# Completions kept for sharing between cells. Cells with identical requests
+# lie close together in sweep order, so a small window finds them.
+SHARED_REQUESTS = 256
+
+# Cells shown in the `results` output when the sweep is written to a file.
+RESULTS_PREVIEW_CELLS = 20
+
+
+def parse_numbers(text):
+    """Parse "0.5, 0.7" or an inclusive "start:stop:step" range into floats."""
+    values = []
+    for token in text.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        if ":" in token:
+            start, stop, step = (float(part) for part in token.split(":"))
+            if step <= 0:
+                raise ValueError(f"Range step must be positive: '{token}'")
+            count = int(round((stop - start) / step, 9)) + 1
+            values.extend(round(start + i * step, 6) for i in range(max(count, 0)))
+        else:
+            values.append(float(token))
+    return values
+
+
+def parse_choices(text, options):
+    """Parse a comma-separated subset of `options`; "All" selects every option."""
+    if text.strip().lower() == "all":
+        return list(options)
+    values = [token.strip() for token in text.split(",") if token.strip()]
+    unknown = [value for value in values if value not in options]
+    if unknown:
+        raise ValueError(f"Unknown value(s) {unknown}; expected one of {options}")
+    return values
+
+
+def sweep_cells(axes):
+    """Lazily yield (index, {name: value}) for the Cartesian product of `axes`.
+
+    `axes` is a sequence of (name, values) pairs. Only the value lists are
+    held in memory; cells are produced one at a time.
+    """
+    names = [name for name, _ in axes]
+    for index, values in enumerate(product(*(values for _, values in axes))):
+        yield index, dict(zip(names, values))
+
+
+class _ResultSink:
+    """Appends sweep results to a CSV or JSONL file, one flushed row per cell."""
+
+    def __init__(self, path, output_format):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = None
+        if output_format == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.writer is not None:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class LMStudioPromptSweepNode:
+    """
+    Sweeps creativity, chaos, style preset and target model in one execution.
+    Every combination of the given values is generated for the same themes,
+    with bounded concurrency, and each result is streamed to a CSV or JSONL
+    file together with its latency as soon as it completes.
+    """
+
+    @classmethod
+    def INPUT_TYPES(s):
+        enhancer_inputs = LMStudioPromptEnhancerNode.INPUT_TYPES()
+        required = enhancer_inputs["required"]
+        optional = enhancer_inputs["optional"]
+        return {
+            "required": {
+                "theme_a": required["theme_a"],
+                "theme_b": required["theme_b"],
+                "blend_mode": required["blend_mode"],
+                "creativity_values": (
+                    "STRING",
+                    {"multiline": False, "default": "0.5, 0.7, 1.0"},
+                ),
+                "chaos_values": ("STRING", {"multiline": False, "default": "0"}),
+                "style_presets": (
+                    "STRING",
+                    {"multiline": False, "default": "Cinematic"},
+                ),
+                "target_models": ("STRING", {"multiline": False, "default": "Generic"}),
+                "seed": required["seed"],
+                "max_workers": ("INT", {"default": 2, "min": 1, "max": 16}),
+                "max_cells": ("INT", {"default": 0, "min": 0, "max": 1000000}),
+                "lmstudio_endpoint": required["lmstudio_endpoint"],
+                "model_identifier": required["model_identifier"],
+            },
+            "optional": {
+                "output_path": ("STRING", {"multiline": False, "default": ""}),
+                "output_format": (["jsonl", "csv"],),
+                "prompt_tone": optional["prompt_tone"],
+            },
+        }
+
+    @classmethod
+    def VALIDATE_INPUTS(s, model_identifier):
+        return True
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("results", "summary")
+    FUNCTION = "run_sweep"
+    CATEGORY = "LMStudio"
+
+    def __init__(self):
+        self.enhancer = LMStudioPromptEnhancerNode()
+
+    def run_sweep(
+        self,
+        theme_a,
+        theme_b,
+        blend_mode,
+        creativity_values,
+        chaos_values,
+        style_presets,
+        target_models,
+        seed,
+        max_workers,
+        max_cells,
+        lmstudio_endpoint,
+        model_identifier,
+        output_path="",
+        output_format="jsonl",
+        prompt_tone="SFW",
+    ):
+        optional = LMStudioPromptEnhancerNode.INPUT_TYPES()["optional"]
+        try:
+            axes = (
+                ("creativity", parse_numbers(creativity_values)),
+                ("chaos", parse_numbers(chaos_values)),
+                (
+                    "style_preset",
+                    parse_choices(style_presets, optional["style_preset"][0]),
+                ),
+                (
+                    "target_model",
+                    parse_choices(target_models, optional["target_model"][0]),
+                ),
+            )
+        except ValueError as e:
+            return ("", f"Invalid sweep values: {e}")
+        total = prod(len(values) for _, values in axes)
+        if max_cells:
+            total = min(total, max_cells)
+        cells = islice(sweep_cells(axes), total)
+        print(f"[LMStudio] Sweeping {total} cell(s) with {max_workers} worker(s)")
+
+        # Cells whose requests are identical (e.g. chaos values that add the
+        # same number of wildcards) share one LM Studio call.
+        payload_cache = CallCache(maxsize=SHARED_REQUESTS)
+
+        def run(cell):
+            _, values = cell
+            started = time.perf_counter()
+            try:
+                return self.enhancer.complete_prompt(
+                    theme_a,
+                    theme_b,
+                    blend_mode,
+                    values["creativity"],
+                    seed,
+                    lmstudio_endpoint,
+                    model_identifier,
+                    payload_cache=payload_cache,
+                    enable_advanced_options=True,
+                    chaos=values["chaos"],
+                    style_preset=values["style_preset"],
+                    target_model=values["target_model"],
+                    prompt_tone=prompt_tone,
+                )
+            finally:
+                latencies[cell[0]] = (time.perf_counter() - started) * 1000
+
+        latencies = {}
+        lines = []
+        done = 0
+        errors = 0
+        sink = _ResultSink(output_path, output_format) if output_path else None
+        try:
+            for (index, values), result, error in run_bounded(run, cells, max_workers):
+                prompt, _, cached = result if error is None else ("", None, False)
+                row = dict(
+                    values,
+                    index=index,
+                    prompt=prompt,
+                    error=str(error) if error else "",
+                    latency_ms=round(latencies.pop(index), 1),
+                    cached=cached,
+                )
+                done += 1
+                errors += bool(error)
+                if sink is not None:
+                    sink.write(row)
+                    # The file holds every cell; `results` only previews them
+                    if index >= RESULTS_PREVIEW_CELLS:
+                        continue
+                label = ", ".join(f"{name}={values[name]}" for name in SWEEP_AXES)
+                lines.append((index, f"[{label}]\n{prompt or f'Error: {error}'}"))
+        finally:
+            if sink is not None:
+                sink.close()
+
+        lines.sort()
+        results = "\n\n".join(line for _, line in lines)
+        summary = (
+            f"{done} cell(s), {errors} error(s), "
+            f"{payload_cache.hits} shared request(s)"
+        )
+        if output_path:
+            summary += f", written to {output_path}"
+            if done > len(lines):
+                results += f"\n\n... {done - len(lines)} more cell(s) in {output_path}"
+        print(f"[LMStudio] Sweep finished: {summary}")
+        return (results, summary)
@@ -0,0 +1,75 @@
+import json
+import os
+
+
+class LMStudioSaveProvenanceNode:
+    """
+    Saves images like ComfyUI's Save Image node and embeds the `provenance`
+    output of the Prompt Enhancer in every PNG (see png_provenance), so each
+    picture records the prompt, model, seed and random picks it came from.
+    """
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "images": ("IMAGE",),
+                "provenance": ("STRING", {"forceInput": True}),
+                "filename_prefix": ("STRING", {"default": "LMStudio"}),
+            },
+            "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},
+        }
+
+    RETURN_TYPES = ()
+    FUNCTION = "save_images"
+    OUTPUT_NODE = True
+    CATEGORY = "LMStudio"
+
+    def save_images(
+        self,
+        images,
+        provenance,
+        filename_prefix="LMStudio",
+        prompt=None,
+        extra_pnginfo=None,
+    ):
+        """Save the images to the ComfyUI output folder with their provenance.
+
+        The workflow metadata is written as ComfyUI does. An empty
+        `provenance` (the enhancer failed) saves the images unstamped.
+        """
+        # ComfyUI's own modules and image stack are only needed when saving
+        import folder_paths
+        import numpy as np
+        from PIL import Image
+        from PIL.PngImagePlugin import PngInfo
+
+        try:
+            from .png_provenance import write_provenance
+        except ImportError:
+            from png_provenance import write_provenance
+
+        stamp = json.loads(provenance) if provenance.strip() else None
+        folder, filename, counter, subfolder, _ = folder_paths.get_save_image_path(
+            filename_prefix,
+            folder_paths.get_output_directory(),
+            images[0].shape[1],
+            images[0].shape[0],
+        )
+        results = []
+        for image in images:
+            pixels = np.clip(255.0 * image.cpu().numpy(), 0, 255).astype(np.uint8)
+            metadata = PngInfo()
+            if prompt is not None:
+                metadata.add_text("prompt", json.dumps(prompt))
+            for key, value in (extra_pnginfo or {}).items():
+                metadata.add_text(key, json.dumps(value))
+            file = f"{filename}_{counter:05}_.png"
+            path = os.path.join(folder, file)
+            Image.fromarray(pixels).save(path, pnginfo=metadata, compress_level=4)
+            if stamp:
+                write_provenance(path, path, stamp)
+            results.append({"filename": file, "subfolder": subfolder, "type": "output"})
+            counter += 1
+        print(f"[LMStudio] Saved {len(results)} image(s) with provenance to {folder}")
+        return {"ui": {"images": results}}
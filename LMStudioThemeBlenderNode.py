@@ -0,0 +1,173 @@
+import random
+from itertools import combinations
+
+try:
+    from .batch_runner import run_bounded
+    from .LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+except ImportError:
+    from batch_runner import run_bounded
+    from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+
+BLEND_MODES = [
+    "Simple Mix",
+    "A vs. B",
+    "A in the world of B",
+    "A made of B",
+    "Style of A, Subject of B",
+]
+
+
+def parse_themes(text):
+    """Split one-theme-per-line text into unique, non-empty themes in order."""
+    themes = []
+    for line in text.splitlines():
+        theme = line.strip()
+        if theme and theme not in themes:
+            themes.append(theme)
+    return themes
+
+
+def _join_themes(themes):
+    if len(themes) == 1:
+        return themes[0]
+    return ", ".join(themes[:-1]) + " and " + themes[-1]
+
+
+def theme_combinations(
+    themes, group_size=2, blend_modes=BLEND_MODES, max_combinations=0, seed=0
+):
+    """Return the blend jobs for every group of themes across blend modes.
+
+    Each job is (group, blend_mode, theme_a, theme_b). The first theme of a
+    group is theme A; the rest are joined into theme B, so triples read as
+    "A in the world of B and C". With `max_combinations` > 0 a seeded random
+    sample of that size is kept, in the original order.
+    """
+    jobs = [
+        (group, mode, group[0], _join_themes(group[1:]))
+        for group in combinations(themes, group_size)
+        for mode in blend_modes
+    ]
+    if 0 < max_combinations < len(jobs):
+        keep = sorted(random.Random(seed).sample(range(len(jobs)), max_combinations))
+        jobs = [jobs[i] for i in keep]
+    return jobs
+
+
+class LMStudioThemeBlenderNode:
+    """
+    Blends a whole list of themes in one execution: every pair (or triple) of
+    themes is sent through the Concept Blender in each selected blend mode,
+    with the requests spread over a bounded pool of workers, and the results
+    are returned as a grid of prompts.
+    """
+
+    @classmethod
+    def INPUT_TYPES(s):
+        enhancer_inputs = LMStudioPromptEnhancerNode.INPUT_TYPES()
+        required = enhancer_inputs["required"]
+        optional = enhancer_inputs["optional"]
+        return {
+            "required": {
+                "themes": (
+                    "STRING",
+                    {"multiline": True, "default": "a knight\na dragon\na lighthouse"},
+                ),
+                "combination_size": ("INT", {"default": 2, "min": 2, "max": 3}),
+                "blend_mode": (["All"] + BLEND_MODES,),
+                "max_combinations": (
+                    "INT",
+                    {"default": 0, "min": 0, "max": 10000, "step": 1},
+                ),
+                "max_workers": ("INT", {"default": 2, "min": 1, "max": 16}),
+                "creativity": required["creativity"],
+                "seed": required["seed"],
+                "lmstudio_endpoint": required["lmstudio_endpoint"],
+                "model_identifier": required["model_identifier"],
+            },
+            "optional": {
+                "style_preset": optional["style_preset"],
+                "target_model": optional["target_model"],
+                "prompt_tone": optional["prompt_tone"],
+            },
+        }
+
+    @classmethod
+    def VALIDATE_INPUTS(s, model_identifier):
+        return True
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("grid", "prompts", "warnings")
+    OUTPUT_IS_LIST = (False, True, False)
+    FUNCTION = "blend_themes"
+    CATEGORY = "LMStudio"
+
+    def __init__(self):
+        self.enhancer = LMStudioPromptEnhancerNode()
+
+    def blend_themes(
+        self,
+        themes,
+        combination_size,
+        blend_mode,
+        max_combinations,
+        max_workers,
+        creativity,
+        seed,
+        lmstudio_endpoint,
+        model_identifier,
+        style_preset="Cinematic",
+        target_model="Generic",
+        prompt_tone="SFW",
+    ):
+        theme_list = parse_themes(themes)
+        if len(theme_list) < combination_size:
+            message = (
+                f"Theme Blender needs at least {combination_size} themes, "
+                f"got {len(theme_list)}."
+            )
+            return (message, [], message)
+
+        modes = BLEND_MODES if blend_mode == "All" else [blend_mode]
+        jobs = theme_combinations(
+            theme_list, combination_size, modes, max_combinations, seed
+        )
+        print(
+            f"[LMStudio] Blending {len(theme_list)} themes into {len(jobs)} prompt(s) "
+            f"with {max_workers} worker(s)"
+        )
+
+        def run(job):
+            index, (_, mode, theme_a, theme_b) = job
+            return self.enhancer.complete_prompt(
+                theme_a,
+                theme_b,
+                mode,
+                creativity,
+                seed + index,
+                lmstudio_endpoint,
+                model_identifier,
+                style_preset=style_preset,
+                target_model=target_model,
+                prompt_tone=prompt_tone,
+            )
+
+        results = [None] * len(jobs)
+        warnings = []
+        for (index, job), result, error in run_bounded(
+            run, enumerate(jobs), max_workers
+        ):
+            label = f"{' + '.join(job[0])} ({job[1]})"
+            if error is not None:
+                results[index] = f"Error: {error}"
+                warnings.append(f"{label}: {error}")
+                continue
+            prompt, job_warnings, _ = result
+            results[index] = prompt
+            warnings.extend(f"{label}: {warning}" for warning in job_warnings)
+
+        grid = "\n\n".join(
+            f"[{' + '.join(group)} | {mode}]\n{prompt}"
+            for (group, mode, _, _), prompt in zip(jobs, results)
+        )
+        return (grid, results, "\n".join(warnings))
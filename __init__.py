@@ -1,22 +1,33 @@
-import json
-import os
-
 from .LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+from .LMStudioPromptSweepNode import LMStudioPromptSweepNode
+from .LMStudioSaveProvenanceNode import LMStudioSaveProvenanceNode
+from .LMStudioThemeBlenderNode import LMStudioThemeBlenderNode
 
-# Get the directory of the current file
-current_dir = os.path.dirname(os.path.abspath(__file__))
-# Path to the package.json file
-package_json_path = os.path.join(current_dir, "package.json")
+try:
+    from ._version import __version__
+except ImportError:
+    # Fall back to package.json for source trees without the embedded version.
+    import json
+    import os
 
-# Read the version from package.json
-__version__ = "unknown"
-if os.path.exists(package_json_path):
-    with open(package_json_path, "r") as f:
-        package_info = json.load(f)
-        __version__ = package_info.get("version", "unknown")
+    __version__ = "unknown"
+    package_json_path = os.path.join(os.path.dirname(__file__), "package.json")
+    if os.path.exists(package_json_path):
+        with open(package_json_path, "r") as f:
+            __version__ = json.load(f).get("version", "unknown")
 
-NODE_CLASS_MAPPINGS = {"LMStudioPromptEnhancer": LMStudioPromptEnhancerNode}
+NODE_CLASS_MAPPINGS = {
+    "LMStudioPromptEnhancer": LMStudioPromptEnhancerNode,
+    "LMStudioThemeBlender": LMStudioThemeBlenderNode,
+    "LMStudioPromptSweep": LMStudioPromptSweepNode,
+    "LMStudioSaveProvenance": LMStudioSaveProvenanceNode,
+}
 
-NODE_DISPLAY_NAME_MAPPINGS = {"LMStudioPromptEnhancer": "LM Studio Prompt Enhancer"}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LMStudioPromptEnhancer": "LM Studio Prompt Enhancer",
+    "LMStudioThemeBlender": "LM Studio Theme Blender",
+    "LMStudioPromptSweep": "LM Studio Prompt Sweep",
+    "LMStudioSaveProvenance": "LM Studio Save Image (Provenance)",
+}
 
 __all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS", "__version__"]
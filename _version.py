@@ -0,0 +1,3 @@
+# Kept in sync with package.json at release time so importing the package does
+# not need to read and parse package.json.
+__version__ = "0.1.0"
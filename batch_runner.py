@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+
+
+def run_bounded(fn, items, max_workers=4):
+    """Apply fn to items on a thread pool with at most `max_workers` in flight.
+
+    Items are pulled from the iterable only as workers free up, so generators
+    of any size are never materialized. Yields (item, result, error) tuples in
+    completion order; `error` is the exception raised by fn, or None.
+    """
+    max_workers = max(1, int(max_workers))
+    iterator = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {
+            pool.submit(fn, item): item for item in islice(iterator, max_workers)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, None if error else future.result(), error
+                for next_item in islice(iterator, 1):
+                    pending[pool.submit(fn, next_item)] = next_item
+
+
+class CallCache:
+    """
+    A thread-safe memo that runs the call for each key once.
+
+    Concurrent callers asking for a key that is already being computed wait
+    for that result instead of starting a duplicate call. Failed calls are
+    not kept, so a later request for the same key tries again. With
+    `maxsize`, the least recently used finished results beyond that many are
+    evicted; calls still running are never evicted.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._futures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._futures)
+
+    def get(self, key, fn):
+        """Return (result, cached) for key, calling fn() only on the first request."""
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+                self.misses += 1
+            else:
+                self._futures.move_to_end(key)
+                self.hits += 1
+        if owner:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                with self._lock:
+                    del self._futures[key]
+                future.set_exception(e)
+            else:
+                with self._lock:
+                    self._evict()
+        return future.result(), not owner
+
+    def _evict(self):
+        # Called with the lock held
+        if self.maxsize is None or len(self._futures) <= self.maxsize:
+            return
+        excess = len(self._futures) - self.maxsize
+        for key in [key for key, future in self._futures.items() if future.done()]:
+            if excess <= 0:
+                break
+            del self._futures[key]
+            self.evictions += 1
+            excess -= 1
@@ -0,0 +1,320 @@
+"""Generate prompts in bulk from a JSONL file of job specs, without ComfyUI.
+
+Each input line is a JSON object with the node's prompt inputs (theme_a,
+theme_b, blend_mode, creativity, seed, style_preset, ...) and an optional
+"id". Jobs go through a durable SQLite queue, so an interrupted run resumes
+where it stopped when started again with the same queue file. Results are
+appended to a JSONL file as they complete.
+
+Usage:
+    python bulk_generate.py jobs.jsonl -o results.jsonl --model my-model
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+try:
+    from .batch_runner import run_bounded
+    from .LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+    from .prompt_pipeline import PROCESS, THREAD, PromptPipeline, postprocess_prompt
+except ImportError:
+    from batch_runner import run_bounded
+    from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+    from prompt_pipeline import PROCESS, THREAD, PromptPipeline, postprocess_prompt
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Spec keys passed positionally to complete_prompt; the rest are options.
+_PROMPT_ARGS = ("theme_a", "theme_b", "blend_mode", "creativity", "seed")
+
+
+class JobQueue:
+    """
+    A durable job queue in a SQLite file (WAL mode).
+
+    Jobs are keyed by their spec id, so enqueueing the same input again is a
+    no-op and a restarted run only picks up unfinished work. Jobs that were
+    running when the process died are returned to the queue on open. Failed
+    attempts are retried with a linear backoff until `max_attempts`.
+    """
+
+    def __init__(self, path, max_attempts=3, retry_delay=1.0):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, job_key TEXT UNIQUE NOT NULL, "
+                "spec TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL "
+                "DEFAULT 0, result TEXT, error TEXT)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, available_at)"
+            )
+            recovered = self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING)
+            ).rowcount
+        if recovered:
+            print(f"[LMStudio] Re-queued {recovered} job(s) interrupted by a crash")
+
+    def enqueue(self, specs):
+        """Add (job_key, spec) pairs; keys already in the queue are skipped."""
+        with self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (job_key, spec, status) VALUES (?, ?, ?)",
+                ((key, json.dumps(spec), PENDING) for key, spec in specs),
+            )
+            return self._conn.total_changes - before
+
+    def claim(self):
+        """Mark the next available pending job running; return (id, key, spec)."""
+        row = self._conn.execute(
+            "SELECT id, job_key, spec FROM jobs WHERE status = ? AND available_at <= ? "
+            "ORDER BY id LIMIT 1",
+            (PENDING, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        with self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE id = ?", (RUNNING, row[0])
+            )
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, job_id, result):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL WHERE id = ?",
+                (DONE, json.dumps(result), job_id),
+            )
+
+    def fail(self, job_id, error):
+        """Record a failed attempt; return True if the job will be retried."""
+        attempts = self._conn.execute(
+            "SELECT attempts FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()[0]
+        attempts += 1
+        retry = attempts < self.max_attempts
+        with self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, error = ?, available_at = ? "
+                "WHERE id = ?",
+                (
+                    PENDING if retry else FAILED,
+                    attempts,
+                    str(error),
+                    time.time() + self.retry_delay * attempts,
+                    job_id,
+                ),
+            )
+        return retry
+
+    def next_available_at(self):
+        """Return when the next pending job becomes available, or None."""
+        row = self._conn.execute(
+            "SELECT MIN(available_at) FROM jobs WHERE status = ?", (PENDING,)
+        ).fetchone()
+        return row[0]
+
+    def counts(self):
+        counts = dict.fromkeys((PENDING, RUNNING, DONE, FAILED), 0)
+        for status, count in self._conn.execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ):
+            counts[status] = count
+        return counts
+
+    def close(self):
+        self._conn.close()
+
+
+def read_job_specs(path):
+    """Yield (job_key, spec) from a JSONL file; the key is "id" or the line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            spec = json.loads(line)
+            yield str(spec.get("id", f"line-{line_number}")), spec
+
+
+def run_bulk(
+    jobs_path,
+    output_path,
+    queue_path=None,
+    lmstudio_endpoint="http://localhost:1234/v1/chat/completions",
+    model_identifier="",
+    max_workers=4,
+    max_attempts=3,
+    retry_delay=1.0,
+    defaults=None,
+    progress_interval=5.0,
+    enhancer=None,
+    process_workers=0,
+):
+    """Process every job in `jobs_path` and append results to `output_path`.
+
+    Returns a stats dict with done/failed counts, elapsed seconds and
+    prompts_per_sec for this run. Each output line is written before its job
+    is marked done, so a crash can repeat a line but never lose one.
+
+    With `process_workers` > 0, requests run on `max_workers` threads and
+    post-processing (parsing, SFW filter, styling) runs in a pool of that many
+    processes, connected by a bounded queue; per-stage counters are returned
+    under "stages".
+    """
+    enhancer = enhancer or LMStudioPromptEnhancerNode()
+    defaults = dict(
+        {"blend_mode": "Simple Mix", "creativity": 0.7, "seed": 0}, **(defaults or {})
+    )
+    queue = JobQueue(
+        queue_path or f"{output_path}.queue.sqlite3", max_attempts, retry_delay
+    )
+    added = queue.enqueue(read_job_specs(jobs_path))
+    counts = queue.counts()
+    print(
+        f"[LMStudio] Queued {added} new job(s); {counts[PENDING]} pending, "
+        f"{counts[DONE]} already done"
+    )
+
+    def fetch(job, postprocess=True):
+        _, job_key, spec = job
+        spec = dict(defaults, **spec)
+        spec.pop("id", None)
+        endpoint = spec.pop("lmstudio_endpoint", lmstudio_endpoint)
+        model = spec.pop("model_identifier", model_identifier)
+        args = [spec.pop(name) for name in _PROMPT_ARGS]
+        text, warnings, _ = enhancer.complete_prompt(
+            *args, endpoint, model, postprocess=postprocess, **spec
+        )
+        if postprocess:
+            return {"prompt": text, "warnings": warnings}
+        return dict(spec, completion=text, warnings=warnings)
+
+    pipeline = None
+    if process_workers > 0:
+        pipeline = PromptPipeline(
+            [
+                (
+                    "fetch",
+                    lambda job: fetch(job, postprocess=False),
+                    max_workers,
+                    THREAD,
+                ),
+                ("postprocess", postprocess_prompt, process_workers, PROCESS),
+            ],
+            queue_size=max(max_workers, process_workers) * 4,
+        )
+
+    started = time.perf_counter()
+    last_report = started
+    done = failed = 0
+    with open(output_path, "a", encoding="utf-8") as out:
+        try:
+            while True:
+                jobs = iter(queue.claim, None)
+                if pipeline is not None:
+                    results = pipeline.run(jobs)
+                else:
+                    results = run_bounded(fetch, jobs, max_workers)
+                for (job_id, job_key, _), result, error in results:
+                    if error is None:
+                        result = dict(id=job_key, **result)
+                        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        out.flush()
+                        queue.complete(job_id, result)
+                        done += 1
+                    elif not queue.fail(job_id, error):
+                        failed += 1
+                        print(f"[LMStudio] Job {job_key} failed: {error}")
+                    now = time.perf_counter()
+                    if now - last_report >= progress_interval:
+                        last_report = now
+                        rate = done / (now - started)
+                        print(
+                            f"[LMStudio] {done} done, {failed} failed, "
+                            f"{rate:.2f} prompts/sec"
+                        )
+                next_at = queue.next_available_at()
+                if next_at is None:
+                    break
+                # Only retries waiting out their backoff are left
+                time.sleep(max(0.0, next_at - time.time()))
+        finally:
+            queue.close()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "done": done,
+        "failed": failed,
+        "elapsed": elapsed,
+        "prompts_per_sec": done / elapsed if elapsed > 0 else 0.0,
+    }
+    if pipeline is not None:
+        stats["stages"] = pipeline.stats()
+        for name, stage in stats["stages"].items():
+            print(
+                f"[LMStudio] Stage {name}: {stage['processed']} item(s), "
+                f"{stage['items_per_sec']:.2f}/sec, "
+                f"{stage['utilization']:.0%} busy, {stage['errors']} error(s)"
+            )
+    print(
+        f"[LMStudio] Finished: {done} prompt(s) in {elapsed:.1f}s "
+        f"({stats['prompts_per_sec']:.2f} prompts/sec), {failed} failed"
+    )
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("jobs", help="JSONL file with one job spec per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file")
+    parser.add_argument(
+        "--queue", help="SQLite queue file (default: <output>.queue.sqlite3)"
+    )
+    parser.add_argument(
+        "--endpoint", default="http://localhost:1234/v1/chat/completions"
+    )
+    parser.add_argument("--model", default="", help="LM Studio model identifier")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    parser.add_argument(
+        "--process-workers",
+        type=int,
+        default=0,
+        help="Post-process prompts in this many worker processes",
+    )
+    parser.add_argument("--retries", type=int, default=2, help="Retries per job")
+    parser.add_argument("--retry-delay", type=float, default=1.0)
+    parser.add_argument("--creativity", type=float, default=0.7)
+    args = parser.parse_args(argv)
+
+    stats = run_bulk(
+        args.jobs,
+        args.output,
+        queue_path=args.queue,
+        lmstudio_endpoint=args.endpoint,
+        model_identifier=args.model,
+        max_workers=args.workers,
+        process_workers=args.process_workers,
+        max_attempts=args.retries + 1,
+        retry_delay=args.retry_delay,
+        defaults={"creativity": args.creativity},
+    )
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import threading
+import time
+
+try:
+    from .model_warmup import lmstudio_base_url
+except ImportError:
+    from model_warmup import lmstudio_base_url
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an LM Studio server that keeps failing.
+
+    After `failure_threshold` consecutive connection failures the circuit for
+    that server opens and allow() returns False. Once `reset_timeout` seconds
+    have passed, one probe request is allowed (half-open): a success closes
+    the circuit again, a failure reopens it for another `reset_timeout`.
+    Any HTTP response counts as a success; only unreachable servers trip it.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._circuits = {}
+
+    def _circuit(self, lmstudio_endpoint):
+        key = lmstudio_base_url(lmstudio_endpoint)
+        return self._circuits.setdefault(
+            key, {"state": CLOSED, "failures": 0, "opened_at": 0.0}
+        )
+
+    def state(self, lmstudio_endpoint):
+        with self._lock:
+            return self._circuit(lmstudio_endpoint)["state"]
+
+    def is_open(self, lmstudio_endpoint):
+        return self.state(lmstudio_endpoint) != CLOSED
+
+    def healthy(self, lmstudio_endpoint):
+        """Return whether the last request to the server (if any) succeeded."""
+        with self._lock:
+            circuit = self._circuit(lmstudio_endpoint)
+            return circuit["state"] == CLOSED and not circuit["failures"]
+
+    def allow(self, lmstudio_endpoint):
+        """Return whether a request to the endpoint's server should be sent."""
+        with self._lock:
+            circuit = self._circuit(lmstudio_endpoint)
+            if circuit["state"] == CLOSED:
+                return True
+            now = self._clock()
+            if now - circuit["opened_at"] >= self.reset_timeout:
+                # Let one probe through; another after each further timeout
+                circuit.update(state=HALF_OPEN, opened_at=now)
+                return True
+            return False
+
+    def retry_in(self, lmstudio_endpoint):
+        """Seconds until an open circuit lets a probe request through."""
+        with self._lock:
+            circuit = self._circuit(lmstudio_endpoint)
+            if circuit["state"] == CLOSED:
+                return 0.0
+            elapsed = self._clock() - circuit["opened_at"]
+            return max(0.0, self.reset_timeout - elapsed)
+
+    def record_success(self, lmstudio_endpoint):
+        with self._lock:
+            circuit = self._circuit(lmstudio_endpoint)
+            if circuit["state"] != CLOSED:
+                print(f"[LMStudio] {lmstudio_base_url(lmstudio_endpoint)} is back")
+            circuit.update(state=CLOSED, failures=0)
+
+    def record_failure(self, lmstudio_endpoint):
+        """Count a connection failure; return True if the circuit is now open."""
+        with self._lock:
+            circuit = self._circuit(lmstudio_endpoint)
+            circuit["failures"] += 1
+            if (
+                circuit["state"] == HALF_OPEN
+                or circuit["failures"] >= self.failure_threshold
+            ):
+                if circuit["state"] != OPEN:
+                    print(
+                        f"[LMStudio] {lmstudio_base_url(lmstudio_endpoint)} "
+                        f"unreachable after {circuit['failures']} attempt(s); "
+                        "using the local fallback"
+                    )
+                circuit.update(state=OPEN, opened_at=self._clock())
+            return circuit["state"] == OPEN
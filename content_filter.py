@@ -0,0 +1,138 @@
+import re
+from collections import deque, namedtuple
+
+# A blocklist hit: the matched term and its [start, end) span in the text.
+FilterHit = namedtuple("FilterHit", "term start end")
+
+# One-to-one character substitutions, so normalized offsets equal original ones.
+_LEET = str.maketrans(
+    {
+        "0": "o",
+        "1": "i",
+        "3": "e",
+        "4": "a",
+        "5": "s",
+        "7": "t",
+        "@": "a",
+        "$": "s",
+        "\t": " ",
+        "\n": " ",
+        "\r": " ",
+    }
+)
+
+# Separators left dangling after a span is cut out of a comma-separated prompt.
+_EMPTY_ITEM_RE = re.compile(r"(\s*,\s*)(?:,\s*)+")
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+
+
+def describe_redaction(hits):
+    """Warning text for the terms removed from a prompt."""
+    terms = ", ".join(sorted({hit.term for hit in hits}))
+    return f"SFW filter removed blocked term(s) from the prompt: {terms}."
+
+
+def normalize(text):
+    """Lowercase text and undo common leetspeak (n00d -> nood), keeping offsets."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters (e.g. "İ") lowercase to two; leave those as they are
+        lowered = "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+    return lowered.translate(_LEET)
+
+
+class ContentFilter:
+    """
+    Matches a blocklist against text in one pass with an Aho-Corasick automaton.
+
+    Terms and text are normalized the same way (case and leetspeak), and a
+    match only counts on word boundaries, so "nude" matches "NUD3" but not
+    "denuded". The automaton is built once; scanning is linear in the text
+    length regardless of the number of terms.
+    """
+
+    def __init__(self, terms):
+        self.terms = tuple(sorted({normalize(t).strip() for t in terms if t.strip()}))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for term in self.terms:
+            self._add(term)
+        self._build_links()
+        self._alphabet = frozenset(ch for term in self.terms for ch in term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _add(self, term):
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = (term,)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                link = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = link if link != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def scan(self, text):
+        """Return the blocklist hits in text, ordered by position."""
+        if not self.terms:
+            return []
+        norm = normalize(text)
+        goto, fail, out, alphabet = self._goto, self._fail, self._out, self._alphabet
+        length = len(norm)
+        hits = []
+        state = 0
+        for i, ch in enumerate(norm):
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            if end < length and norm[end].isalnum():
+                continue
+            for term in out[state]:
+                start = end - len(term)
+                if start == 0 or not norm[start - 1].isalnum():
+                    hits.append(FilterHit(term, start, end))
+        hits.sort(key=lambda hit: (hit.start, -hit.end))
+        return hits
+
+    def redact(self, text, replacement=""):
+        """Remove (or replace) every hit; return (clean_text, hits)."""
+        hits = self.scan(text)
+        if not hits:
+            return text, hits
+        parts = []
+        position = 0
+        for hit in hits:
+            if hit.start < position:
+                continue  # nested in a longer hit already removed
+            parts.append(text[position : hit.start])
+            parts.append(replacement)
+            position = hit.end
+        parts.append(text[position:])
+        clean = _SPACES_RE.sub(" ", "".join(parts))
+        clean = _EMPTY_ITEM_RE.sub(lambda m: m.group(1), clean)
+        return clean.strip(" ,"), hits
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+from pathlib import Path
+from queue import Queue
+
+# Columns of an exported history file, in order.
+HISTORY_FIELDS = ("id", "parent_id", "positive", "negative", "warnings", "tags")
+
+# Entries per written chunk (a Parquet row group or Arrow record batch).
+DEFAULT_CHUNK_SIZE = 10_000
+
+_TAIL_BLOCK = 1 << 16
+
+
+def history_format(path):
+    """Return "parquet", "arrow" or "jsonl" for an export path, by suffix."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        return "parquet"
+    if suffix in (".arrow", ".feather"):
+        return "arrow"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported history format: {Path(path).name}")
+
+
+def _require_pyarrow(path):
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError(
+            f"pyarrow is required for {Path(path).name}; export to .jsonl instead"
+        ) from None
+    return pyarrow
+
+
+def _row(entry):
+    row = {name: entry.get(name) for name in HISTORY_FIELDS}
+    row["tags"] = list(row["tags"] or ())
+    return row
+
+
+def _chunks(entries, size):
+    chunk = []
+    for entry in entries:
+        chunk.append(_row(entry))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _ChunkWriter:
+    """
+    Writes chunks on a background thread.
+
+    The next chunk is encoded on the calling thread while the previous one
+    is compressed and written; at most `depth` chunks wait in between.
+    """
+
+    def __init__(self, write, depth=2):
+        self._write = write
+        self._queue = Queue(depth)
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="LMStudioHistoryWriter", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._write(chunk)
+                except Exception as e:
+                    self._error = e
+
+    def put(self, chunk):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(chunk)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def export_history(entries, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream history entries to a .parquet, .arrow/.feather or .jsonl file.
+
+    `entries` can be any iterable of history dicts (e.g. a generator over a
+    large archive); it is consumed in chunks of `chunk_size`, so memory use
+    does not grow with the number of entries. Parquet and Arrow need pyarrow;
+    JSONL is written with compact separators and needs nothing. Returns the
+    number of entries written.
+    """
+    fmt = history_format(path)
+    count = 0
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            writer = _ChunkWriter(f.write)
+            try:
+                for chunk in _chunks(entries, chunk_size):
+                    writer.put(
+                        "".join(
+                            json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+                            + "\n"
+                            for row in chunk
+                        )
+                    )
+                    count += len(chunk)
+            finally:
+                writer.close()
+        return count
+
+    pa = _require_pyarrow(path)
+    schema = pa.schema(
+        [(name, pa.string()) for name in HISTORY_FIELDS[:-1]]
+        + [("tags", pa.list_(pa.string()))]
+    )
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        sink = pq.ParquetWriter(str(path), schema, compression="zstd")
+
+        def write(batch):
+            # One row group per chunk, so tail_history can skip to the end
+            sink.write_table(pa.Table.from_batches([batch]))
+
+    else:
+        import pyarrow.ipc
+
+        sink = pyarrow.ipc.new_file(str(path), schema)
+        write = sink.write_batch
+    try:
+        writer = _ChunkWriter(write)
+        try:
+            for chunk in _chunks(entries, chunk_size):
+                writer.put(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+        finally:
+            writer.close()
+    finally:
+        sink.close()
+    return count
+
+
+def _select(rows, columns):
+    if columns is None:
+        return rows
+    return [{name: row.get(name) for name in columns} for row in rows]
+
+
+def iter_history(path, columns=None, batch_size=DEFAULT_CHUNK_SIZE):
+    """Yield the entries of an exported history file in order.
+
+    Parquet and Arrow files are memory-mapped and decoded one batch at a
+    time; with `columns` only those columns are read at all.
+    """
+    fmt = history_format(path)
+    if fmt == "jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield from _select([json.loads(line)], columns)
+        return
+
+    pa = _require_pyarrow(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(str(path), memory_map=True)
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            yield from batch.to_pylist()
+        return
+
+    import pyarrow.ipc
+
+    with pa.memory_map(str(path)) as source:
+        reader = pyarrow.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            yield from batch.to_pylist()
+
+
+def _tail_lines(path, count):
+    # Read backwards from the end until `count` complete lines are buffered
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(_TAIL_BLOCK, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = [line for line in data.split(b"\n") if line.strip()]
+    return [json.loads(line) for line in lines[-count:]]
+
+
+def tail_history(path, count, columns=None):
+    """Return the last `count` entries of an exported history file.
+
+    Only the end of the file is read: the last JSONL lines, or the last
+    Parquet row groups / Arrow batches (found from the file metadata), so
+    re-seeding from a multi-million entry archive stays fast.
+    """
+    if count <= 0:
+        return []
+    fmt = history_format(path)
+    if fmt == "jsonl":
+        return _select(_tail_lines(path, count), columns)
+
+    pa = _require_pyarrow(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(str(path), memory_map=True)
+        groups = []
+        rows = 0
+        for i in reversed(range(parquet.num_row_groups)):
+            if rows >= count:
+                break
+            groups.insert(0, i)
+            rows += parquet.metadata.row_group(i).num_rows
+        table = parquet.read_row_groups(groups, columns=columns)
+        return table.slice(max(0, table.num_rows - count)).to_pylist()
+
+    import pyarrow.ipc
+
+    with pa.memory_map(str(path)) as source:
+        reader = pyarrow.ipc.open_file(source)
+        batches = []
+        rows = 0
+        for i in reversed(range(reader.num_record_batches)):
+            if rows >= count:
+                break
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            batches.insert(0, batch)
+            rows += batch.num_rows
+        entries = [row for batch in batches for row in batch.to_pylist()]
+    return entries[-count:]
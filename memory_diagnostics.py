@@ -0,0 +1,185 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Allocations made by the profiler itself are left out of the reports; the
+# tracemalloc module is added when it is first imported.
+_IGNORED_FILES = (__file__, "<frozen importlib._bootstrap>")
+
+
+def current_rss():
+    """Return the resident set size of this process in bytes, or None.
+
+    Reads /proc/self/statm on Linux; elsewhere falls back to the peak RSS
+    from getrusage, which only ever grows.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class MemoryProfiler:
+    """
+    Measures the memory each profiled call leaves behind, with tracemalloc.
+
+    While enabled, every measured call takes a snapshot before and after and
+    records the net allocation delta, the peak above the starting point and
+    the `top` allocation sites by growth. The last `keep` reports are kept,
+    so the diagnostics themselves stay bounded. tracemalloc traces the whole
+    process: concurrent calls see each other's allocations, and tracing slows
+    allocation-heavy code down noticeably, so only enable it to investigate.
+    Disabled, a measured call costs one attribute check, and tracemalloc
+    is not even imported.
+    """
+
+    def __init__(self, enabled=False, top=10, keep=20, frames=1):
+        self.top = top
+        self.frames = frames
+        self.enabled = False
+        self._reports = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self.calls = 0
+        self.total_size_diff = 0
+        self.max_size_diff = 0
+        if enabled:
+            self.enable()
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler from the environment.
+
+        LMSTUDIO_MEMORY_DIAGNOSTICS=1 enables it; LMSTUDIO_MEMORY_TOP sets the
+        number of allocation sites per report (default 10).
+        """
+        return cls(
+            enabled=os.environ.get("LMSTUDIO_MEMORY_DIAGNOSTICS", "").lower()
+            in ("1", "true", "yes", "on"),
+            top=int(os.environ.get("LMSTUDIO_MEMORY_TOP", "10")),
+        )
+
+    def enable(self):
+        """Start tracing allocations (if nothing else already does)."""
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.enabled = True
+
+    def disable(self):
+        """Stop measuring, and stop tracing if enable() started it."""
+        self.enabled = False
+        if self._started_tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _snapshot(self):
+        import tracemalloc
+
+        ignored = (tracemalloc.__file__,) + _IGNORED_FILES
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, name) for name in ignored]
+        )
+
+    @contextmanager
+    def measure(self, label):
+        """Record the allocations made inside the block as one report."""
+        if not self.enabled:
+            yield
+            return
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        before = self._snapshot()
+        start_traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] - start_traced
+            stats = self._snapshot().compare_to(before, "lineno")
+            report = {
+                "label": label,
+                "size_diff": sum(stat.size_diff for stat in stats),
+                "count_diff": sum(stat.count_diff for stat in stats),
+                "peak": max(0, peak),
+                "seconds": seconds,
+                "top": [
+                    {
+                        "site": f"{stat.traceback[0].filename}:"
+                        f"{stat.traceback[0].lineno}",
+                        "size_diff": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                    }
+                    for stat in stats[: self.top]
+                    if stat.size_diff
+                ],
+            }
+            with self._lock:
+                self._reports.append(report)
+                self.calls += 1
+                self.total_size_diff += report["size_diff"]
+                self.max_size_diff = max(self.max_size_diff, report["size_diff"])
+            top = report["top"][0]["site"] if report["top"] else "none"
+            print(
+                f"[LMStudio] {label}: {report['size_diff']:+d} bytes retained, "
+                f"peak {report['peak']} bytes, top site {top}"
+            )
+
+    def reports(self):
+        """Return the most recent reports, oldest first."""
+        with self._lock:
+            return list(self._reports)
+
+    def stats(self):
+        """Totals over all measured calls, traced memory and the last report."""
+        traced, peak = 0, 0
+        # Nothing can be tracing if tracemalloc was never imported
+        tracemalloc = sys.modules.get("tracemalloc")
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "calls": self.calls,
+                "total_size_diff": self.total_size_diff,
+                "max_size_diff": self.max_size_diff,
+                "traced": traced,
+                "traced_peak": peak,
+                "rss": current_rss(),
+                "last": self._reports[-1] if self._reports else None,
+            }
+
+
+def profile_memory(method):
+    """Decorate a node method so its calls are measured by `self.memory_profiler`."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.memory_profiler
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+        with profiler.measure(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,118 @@
+import threading
+from urllib.parse import quote, urlsplit
+
+COLD = "cold"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+def lmstudio_base_url(lmstudio_endpoint):
+    """Return scheme://host:port of an LM Studio endpoint URL."""
+    parts = urlsplit(lmstudio_endpoint)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class ModelWarmup:
+    """
+    Loads models in LM Studio ahead of generation and tracks their readiness.
+
+    `ensure()` starts a background warm-up for a model that is not known to
+    be loaded: it asks the LM Studio REST API (`/api/v0/models/<id>`) for the
+    model state and, when the model is not loaded, sends a one-token
+    completion so LM Studio loads it. Generations call `wait_until_ready()`
+    and queue behind the warm-up instead of spending their own request
+    timeout on the cold load.
+    """
+
+    def __init__(self, load_timeout=300):
+        self.load_timeout = load_timeout
+        self._lock = threading.Lock()
+        self._states = {}
+        self._events = {}
+        self._errors = {}
+
+    def state(self, lmstudio_endpoint, model):
+        key = (lmstudio_base_url(lmstudio_endpoint), model)
+        with self._lock:
+            return self._states.get(key, COLD)
+
+    def ensure(self, lmstudio_endpoint, model):
+        """Start warming up `model` unless it is already loading or ready."""
+        key = (lmstudio_base_url(lmstudio_endpoint), model)
+        with self._lock:
+            if self._states.get(key) in (LOADING, READY):
+                return
+            self._states[key] = LOADING
+            self._events[key] = threading.Event()
+        print(f"[LMStudio] Warming up model: {model}")
+        threading.Thread(
+            target=self._warm_up,
+            args=(key, lmstudio_endpoint),
+            name="LMStudioWarmup",
+            daemon=True,
+        ).start()
+
+    def _warm_up(self, key, lmstudio_endpoint):
+        import requests
+
+        base_url, model = key
+        try:
+            try:
+                response = requests.get(
+                    f"{base_url}/api/v0/models/{quote(model, safe='')}", timeout=5
+                )
+                if response.ok and response.json().get("state") == "loaded":
+                    self._finish(key, READY)
+                    return
+            except (requests.exceptions.RequestException, ValueError):
+                # Older servers have no REST status endpoint; fall through to load
+                pass
+            response = requests.post(
+                lmstudio_endpoint,
+                headers={"Content-Type": "application/json"},
+                json={
+                    "model": model,
+                    "messages": [{"role": "user", "content": "Hi"}],
+                    "max_tokens": 1,
+                    "temperature": 0,
+                },
+                timeout=self.load_timeout,
+            )
+            response.raise_for_status()
+            self._finish(key, READY)
+        except Exception as e:
+            print(f"[LMStudio] Model warm-up failed for {model}: {e}")
+            self._finish(key, FAILED, str(e))
+
+    def _finish(self, key, state, error=None):
+        with self._lock:
+            self._states[key] = state
+            if error:
+                self._errors[key] = error
+            event = self._events.pop(key, None)
+        if state == READY:
+            print(f"[LMStudio] Model ready: {key[1]}")
+        if event is not None:
+            event.set()
+
+    def wait_until_ready(self, lmstudio_endpoint, model, timeout=None):
+        """Block until the warm-up of `model` finishes; True if it is ready."""
+        key = (lmstudio_base_url(lmstudio_endpoint), model)
+        with self._lock:
+            event = self._events.get(key)
+        if event is not None:
+            event.wait(self.load_timeout if timeout is None else timeout)
+        return self.state(lmstudio_endpoint, model) == READY
+
+    def last_error(self, lmstudio_endpoint, model):
+        key = (lmstudio_base_url(lmstudio_endpoint), model)
+        with self._lock:
+            return self._errors.get(key)
+
+    def invalidate(self, lmstudio_endpoint, model):
+        """Forget readiness (e.g. LM Studio unloaded the model after a failure)."""
+        key = (lmstudio_base_url(lmstudio_endpoint), model)
+        with self._lock:
+            if self._states.get(key) != LOADING:
+                self._states.pop(key, None)
@@ -0,0 +1,160 @@
+import functools
+from array import array
+from itertools import product
+
+# Mood Matrix axes as (negative pole, positive pole), in slider order.
+AXES = (
+    ("ancient", "futuristic"),
+    ("serene", "chaotic"),
+    ("organic", "mechanical"),
+)
+
+# Graded descriptors per pole, from the mildest to the most intense tier.
+TIERS = {
+    "ancient": ("slightly ancient", "ancient", "deeply ancient", "primordial"),
+    "futuristic": (
+        "slightly futuristic",
+        "futuristic",
+        "highly futuristic",
+        "hyper-futuristic",
+    ),
+    "serene": ("calm", "serene", "deeply serene", "utterly tranquil"),
+    "chaotic": ("restless", "chaotic", "wildly chaotic", "cataclysmic"),
+    "organic": ("slightly organic", "organic", "lush and organic", "fully biological"),
+    "mechanical": (
+        "slightly mechanical",
+        "mechanical",
+        "heavily mechanical",
+        "fully machine-like",
+    ),
+}
+
+# Slider magnitude above which each tier starts. |value| <= 1.0 is neutral,
+# matching the original single-keyword threshold.
+TIER_THRESHOLDS = (1.0, 3.0, 5.5, 8.0)
+MAX_TIER = len(TIER_THRESHOLDS)
+
+# Extra phrases used when two poles are both at least at tier 2.
+COMBINED_PHRASES = {
+    ("ancient", "serene"): "timeless",
+    ("ancient", "chaotic"): "war-torn ruins",
+    ("ancient", "organic"): "primeval",
+    ("ancient", "mechanical"): "clockwork antiquity",
+    ("futuristic", "serene"): "utopian",
+    ("futuristic", "chaotic"): "dystopian",
+    ("futuristic", "organic"): "biotech",
+    ("futuristic", "mechanical"): "cybernetic",
+    ("serene", "organic"): "pastoral",
+    ("serene", "mechanical"): "sterile precision",
+    ("chaotic", "organic"): "feral",
+    ("chaotic", "mechanical"): "industrial frenzy",
+}
+COMBINED_MIN_TIER = 2
+
+SLIDER_MIN = -10.0
+SLIDER_MAX = 10.0
+# Table steps per slider unit (the sliders use step=0.1).
+RESOLUTION = 10
+
+
+# Interpolated descriptor for a slider past the middle of a tier's range,
+# e.g. "chaotic verging on wildly chaotic".
+BLEND_PHRASE = "{lower} verging on {upper}"
+
+# Half-tier steps per tier: level 2k is tier k, level 2k+1 lies between tier
+# k and tier k+1.
+MAX_LEVEL = 2 * MAX_TIER
+
+
+def _level_for(value):
+    """Signed level (-MAX_LEVEL..MAX_LEVEL) for a slider value.
+
+    Past the midpoint of a tier's range the value moves half a tier toward
+    the next one; the top tier and the neutral band are not interpolated.
+    """
+    magnitude = abs(value)
+    tier = sum(1 for threshold in TIER_THRESHOLDS if magnitude > threshold)
+    level = 2 * tier
+    if 0 < tier < MAX_TIER:
+        lower, upper = TIER_THRESHOLDS[tier - 1], TIER_THRESHOLDS[tier]
+        if (magnitude - lower) / (upper - lower) > 0.5:
+            level += 1
+    return level if value > 0 else -level
+
+
+@functools.lru_cache(maxsize=None)
+def _level_table():
+    """Level for every slider step, built on first use."""
+    steps = int((SLIDER_MAX - SLIDER_MIN) * RESOLUTION)
+    return array(
+        "b",
+        (_level_for(round(SLIDER_MIN + i / RESOLUTION, 6)) for i in range(steps + 1)),
+    )
+
+
+def _descriptor(pole, level):
+    tier, half = divmod(level, 2)
+    if half:
+        return BLEND_PHRASE.format(lower=TIERS[pole][tier - 1], upper=TIERS[pole][tier])
+    return TIERS[pole][tier - 1]
+
+
+def _cell_phrase(levels):
+    descriptors = []
+    active = []
+    for (negative, positive), level in zip(AXES, levels):
+        if abs(level) < 2:
+            # Neutral; level 1 never occurs since the neutral band is kept
+            continue
+        pole = positive if level > 0 else negative
+        descriptors.append(_descriptor(pole, abs(level)))
+        if abs(level) // 2 >= COMBINED_MIN_TIER:
+            active.append(pole)
+    for i, first in enumerate(active):
+        for second in active[i + 1 :]:
+            descriptors.append(COMBINED_PHRASES[(first, second)])
+    return ", ".join(descriptors)
+
+
+@functools.lru_cache(maxsize=None)
+def _lattice():
+    """Precompute the mood phrase for every combination of axis levels.
+
+    Built on the first lookup rather than at import, so loading the node
+    does not pay for the 17**3 cells.
+    """
+    phrases = []
+    phrase_ids = {}
+    cells = array("H")
+    span = range(-MAX_LEVEL, MAX_LEVEL + 1)
+    for levels in product(span, repeat=len(AXES)):
+        phrase = _cell_phrase(levels)
+        if phrase not in phrase_ids:
+            phrase_ids[phrase] = len(phrases)
+            phrases.append(phrase)
+        cells.append(phrase_ids[phrase])
+    return tuple(phrases), cells
+
+
+_SIDE = 2 * MAX_LEVEL + 1
+
+
+def mood_level(value):
+    """Return the signed interpolated level (half-tier steps) in O(1)."""
+    value = min(max(value, SLIDER_MIN), SLIDER_MAX)
+    return _level_table()[int(round((value - SLIDER_MIN) * RESOLUTION))]
+
+
+def mood_tier(value):
+    """Return the signed intensity tier for a slider value in O(1)."""
+    level = mood_level(value)
+    return level // 2 if level >= 0 else -(-level // 2)
+
+
+def mood_descriptors(ancient_futuristic, serene_chaotic, organic_mechanical):
+    """Return the graded mood text for the three sliders ("" when all neutral)."""
+    a = mood_level(ancient_futuristic) + MAX_LEVEL
+    b = mood_level(serene_chaotic) + MAX_LEVEL
+    c = mood_level(organic_mechanical) + MAX_LEVEL
+    phrases, cells = _lattice()
+    return phrases[cells[(a * _SIDE + b) * _SIDE + c]]
@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Format version of catalog data files this module reads.
+CATALOG_VERSION = 1
+
+# Option catalogs backing the node dropdowns, by input name.
+OPTION_CATALOGS = ("action_pose", "emotion_expression", "lighting", "framing")
+
+# Subdirectory holding chaos/injection wildcard groups, one file per group.
+WILDCARD_DIR = "wildcards"
+
+CATALOG_SUFFIXES = (".json", ".yaml", ".yml", ".txt")
+
+BUNDLED_CATALOG_DIR = Path(__file__).resolve().parent / "catalogs"
+
+CatalogEntry = namedtuple("CatalogEntry", "value explicit subjects models")
+
+
+def _entry_from_data(item):
+    if isinstance(item, str):
+        return CatalogEntry(item, False, frozenset(), frozenset())
+    if not isinstance(item, dict) or not isinstance(item.get("value"), str):
+        raise ValueError(f"Catalog entry must be a string or have a 'value': {item!r}")
+    return CatalogEntry(
+        item["value"],
+        bool(item.get("explicit", False)),
+        frozenset(item.get("subjects", ())),
+        frozenset(item.get("models", ())),
+    )
+
+
+def _entry_from_line(line):
+    # "value | explicit, subject:People, model:Pony"
+    value, _, tag_text = line.partition("|")
+    tags = [tag.strip() for tag in tag_text.split(",") if tag.strip()]
+    return CatalogEntry(
+        value.strip(),
+        "explicit" in tags,
+        frozenset(tag[8:] for tag in tags if tag.startswith("subject:")),
+        frozenset(tag[6:] for tag in tags if tag.startswith("model:")),
+    )
+
+
+def parse_catalog(path):
+    """Read a catalog file and return its entries.
+
+    JSON and YAML files hold {"version": 1, "entries": [...]}, where each
+    entry is a string or {"value", "explicit", "subjects", "models"}. TXT
+    files hold one value per line with optional "| tag, tag" metadata;
+    blank lines and lines starting with "#" are skipped. YAML needs PyYAML.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".txt":
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        return [_entry_from_line(line) for line in lines if line and line[0] != "#"]
+
+    with open(path, "r", encoding="utf-8") as f:
+        if suffix == ".json":
+            data = json.load(f)
+        elif suffix in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"PyYAML is required to read {path.name}") from None
+            data = yaml.safe_load(f)
+        else:
+            raise ValueError(f"Unsupported catalog format: {path.name}")
+    if not isinstance(data, dict) or data.get("version") != CATALOG_VERSION:
+        raise ValueError(
+            f"{path.name}: expected a catalog object with version {CATALOG_VERSION}"
+        )
+    return [_entry_from_data(item) for item in data.get("entries", ())]
+
+
+class OptionCatalog:
+    """
+    An immutable catalog of option values with tag indexes.
+
+    Values keep their file order in a tuple and are indexed by explicit flag,
+    subject and model into frozensets. Entries without subject (or model)
+    tags apply to every subject (or model). Filtered views are computed once
+    per (sfw, subject, model) combination and then served from a dict.
+    """
+
+    def __init__(self, entries, name="", version=CATALOG_VERSION):
+        self.name = name
+        self.version = version
+        unique = {}
+        for entry in entries:
+            unique.setdefault(entry.value, entry)
+        self.entries = tuple(unique.values())
+        self.values = tuple(unique)
+        self.positions = {value: i for i, value in enumerate(self.values)}
+        self.explicit = frozenset(e.value for e in self.entries if e.explicit)
+        self.by_subject = self._index("subjects")
+        self.by_model = self._index("models")
+        self._untagged_subjects = frozenset(
+            e.value for e in self.entries if not e.subjects
+        )
+        self._untagged_models = frozenset(e.value for e in self.entries if not e.models)
+        self._all = frozenset(self.values)
+        self._views = {}
+
+    @classmethod
+    def from_values(cls, values, explicit=(), name=""):
+        """Build a catalog from plain values, flagging those in `explicit`."""
+        explicit = frozenset(explicit)
+        return cls(
+            (
+                CatalogEntry(value, value in explicit, frozenset(), frozenset())
+                for value in values
+            ),
+            name=name,
+        )
+
+    def _index(self, field):
+        index = {}
+        for entry in self.entries:
+            for tag in getattr(entry, field):
+                index.setdefault(tag, set()).add(entry.value)
+        return {tag: frozenset(values) for tag, values in index.items()}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value in self._all
+
+    def is_explicit(self, value):
+        return value in self.explicit
+
+    def allowed(self, sfw=False, subject=None, model=None):
+        """Return the values allowed for a tone/subject/model, in catalog order."""
+        key = (bool(sfw), subject, model)
+        view = self._views.get(key)
+        if view is None:
+            allowed = self._all
+            if sfw:
+                allowed = allowed - self.explicit
+            if subject is not None:
+                allowed = allowed & (
+                    self.by_subject.get(subject, frozenset()) | self._untagged_subjects
+                )
+            if model is not None:
+                allowed = allowed & (
+                    self.by_model.get(model, frozenset()) | self._untagged_models
+                )
+            view = tuple(sorted(allowed, key=self.positions.__getitem__))
+            self._views[key] = view
+        return view
+
+
+class CatalogRegistry:
+    """
+    Loads catalogs from data directories once per process, with hot reload.
+
+    Directories are searched in order and a later directory's file replaces
+    an earlier one of the same name, so user catalogs override the bundled
+    ones. File modification times are checked at most every
+    `reload_interval` seconds; a changed, added or removed file reloads the
+    catalogs and bumps `generation`.
+    """
+
+    def __init__(self, directories, reload_interval=2.0):
+        self.directories = [Path(d) for d in directories]
+        self.reload_interval = reload_interval
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._options = {}
+        self._wildcards = {}
+
+    def _find_files(self):
+        files = {}
+        for directory in self.directories:
+            for kind, folder in (
+                ("option", directory),
+                ("wildcard", directory / WILDCARD_DIR),
+            ):
+                try:
+                    names = sorted(os.listdir(folder))
+                except OSError:
+                    continue
+                for filename in names:
+                    stem, suffix = os.path.splitext(filename)
+                    if suffix.lower() in CATALOG_SUFFIXES:
+                        files[(kind, stem)] = folder / filename
+        return files
+
+    def _snapshot_signature(self, files):
+        signature = []
+        for key, path in sorted(files.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature.append((key, str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def refresh(self, force=False):
+        """Reload the catalogs if their files changed; return the generation."""
+        now = time.monotonic()
+        if not force and self._signature is not None:
+            if now - self._checked_at < self.reload_interval:
+                return self.generation
+        with self._lock:
+            files = self._find_files()
+            signature = self._snapshot_signature(files)
+            self._checked_at = now
+            if signature == self._signature:
+                return self.generation
+            options, wildcards = {}, {}
+            for (kind, name), path in files.items():
+                try:
+                    entries = parse_catalog(path)
+                except (OSError, ValueError) as e:
+                    print(f"[LMStudio] Skipping catalog {path}: {e}")
+                    continue
+                catalog = OptionCatalog(entries, name=name)
+                (options if kind == "option" else wildcards)[name] = catalog
+            if self._signature is not None:
+                print("[LMStudio] Option catalogs reloaded")
+            self._options, self._wildcards = options, wildcards
+            self._signature = signature
+            self.generation += 1
+            return self.generation
+
+    def option(self, name):
+        """Return the option catalog `name` (empty when no file provides it)."""
+        self.refresh()
+        return self._options.get(name) or OptionCatalog((), name=name)
+
+    def wildcards(self):
+        """Return {group: catalog} for the chaos/injection wildcard groups."""
+        self.refresh()
+        return dict(self._wildcards)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_catalog_registry():
+    """Return the process-wide registry for the bundled and user catalogs.
+
+    Extra catalog directories can be listed in `LMSTUDIO_CATALOG_PATH`
+    (separated by os.pathsep); they take precedence over the bundled files.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            extra = os.environ.get("LMSTUDIO_CATALOG_PATH", "")
+            directories = [BUNDLED_CATALOG_DIR]
+            directories += [Path(p) for p in extra.split(os.pathsep) if p]
+            _registry = CatalogRegistry(directories)
+        return _registry
@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+try:
+    from ._version import __version__
+except ImportError:
+    from _version import __version__
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# iTXt keyword holding the generator provenance JSON.
+PROVENANCE_KEYWORD = "lmstudio_provenance"
+
+# Texts at least this long are stored zlib-compressed.
+COMPRESS_MIN_BYTES = 256
+
+_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+_COPY_BLOCK = 1 << 16
+
+
+def make_chunk(chunk_type, data):
+    """Return a complete PNG chunk: length, type, data and CRC."""
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def encode_itxt(keyword, text, compress=None):
+    """Return an iTXt chunk for `text`, compressed when long (or if `compress`)."""
+    keyword = keyword.encode("latin-1")
+    if not 1 <= len(keyword) <= 79:
+        raise ValueError("PNG text keywords must be 1-79 characters")
+    payload = text.encode("utf-8")
+    if compress is None:
+        compress = len(payload) >= COMPRESS_MIN_BYTES
+    if compress:
+        payload = zlib.compress(payload, 9)
+    # keyword, compression flag and method, empty language tag and translation
+    header = keyword + b"\0" + bytes((int(compress), 0)) + b"\0\0"
+    return make_chunk(b"iTXt", header + payload)
+
+
+def decode_itxt(data):
+    """Return (keyword, text) from the data of an iTXt chunk."""
+    keyword, rest = data.split(b"\0", 1)
+    compressed = rest[0]
+    _, _, rest = rest[2:].split(b"\0", 2)
+    if compressed:
+        rest = zlib.decompress(rest)
+    return keyword.decode("latin-1"), rest.decode("utf-8")
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated PNG file")
+    return data
+
+
+def _check_signature(f, path):
+    if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        raise ValueError(f"Not a PNG file: {path}")
+
+
+def _copy(fin, fout, size):
+    while size:
+        block = _read_exact(fin, min(size, _COPY_BLOCK))
+        fout.write(block)
+        size -= len(block)
+
+
+def build_provenance(
+    positive,
+    negative="",
+    model="",
+    seed=None,
+    creativity=None,
+    blend_mode="",
+    wildcard_picks=None,
+    **extra,
+):
+    """Collect the generator outputs and settings to embed in an image."""
+    provenance = {
+        "generator": "LMStudioPromptEnhancer",
+        "version": __version__,
+        "positive": positive,
+        "negative": negative,
+        "model": model,
+        "seed": seed,
+        "creativity": creativity,
+        "blend_mode": blend_mode,
+        "wildcard_picks": wildcard_picks or {},
+    }
+    provenance.update(extra)
+    return provenance
+
+
+def dump_provenance(provenance):
+    """Serialize provenance as the compact JSON that is embedded in PNGs."""
+    return json.dumps(
+        provenance, ensure_ascii=False, separators=(",", ":"), sort_keys=True
+    )
+
+
+def write_provenance(src, dst, provenance, keyword=PROVENANCE_KEYWORD):
+    """Copy the PNG `src` to `dst` with `provenance` in a compact iTXt chunk.
+
+    The file is streamed chunk by chunk; image data is copied as-is, never
+    decoded. The chunk is placed before the first IDAT so readers find it
+    without scanning the image data. An existing chunk with the same keyword
+    is replaced; other metadata is kept. `dst` may equal `src`: the copy is
+    written to a temporary file that replaces the target when complete.
+    """
+    chunk = encode_itxt(keyword, dump_provenance(provenance))
+    target_keyword = keyword.encode("latin-1")
+    directory = os.path.dirname(os.path.abspath(dst))
+    fd, tmp_path = tempfile.mkstemp(suffix=".png.tmp", dir=directory)
+    try:
+        with open(src, "rb") as fin, os.fdopen(fd, "wb") as fout:
+            _check_signature(fin, src)
+            fout.write(PNG_SIGNATURE)
+            inserted = False
+            while True:
+                header = _read_exact(fin, 8)
+                length, chunk_type = struct.unpack(">I4s", header)
+                if chunk_type in _TEXT_CHUNKS:
+                    data = _read_exact(fin, length + 4)
+                    # The keyword ends at the first NUL of the data (not the CRC)
+                    if data[:length].partition(b"\0")[0] == target_keyword:
+                        continue
+                    fout.write(header + data)
+                    continue
+                if not inserted and chunk_type in (b"IDAT", b"IEND"):
+                    fout.write(chunk)
+                    inserted = True
+                fout.write(header)
+                _copy(fin, fout, length + 4)
+                if chunk_type == b"IEND":
+                    break
+        # mkstemp creates the file as 0600; keep the source's permissions
+        shutil.copymode(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_provenance(path, keyword=PROVENANCE_KEYWORD):
+    """Return the provenance dict embedded in a PNG, or None if there is none.
+
+    Only text chunks are read; image data is skipped with seeks.
+    """
+    target_keyword = keyword.encode("latin-1")
+    with open(path, "rb") as f:
+        _check_signature(f, path)
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type == b"iTXt":
+                data = _read_exact(f, length)
+                (crc,) = struct.unpack(">I", _read_exact(f, 4))
+                if data.partition(b"\0")[0] != target_keyword:
+                    continue
+                if zlib.crc32(chunk_type + data) != crc:
+                    raise ValueError(f"Corrupt {keyword} chunk in {path}")
+                return json.loads(decode_itxt(data)[1])
+            if chunk_type == b"IEND":
+                return None
+            f.seek(length + 4, os.SEEK_CUR)
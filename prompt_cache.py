@@ -0,0 +1,111 @@
+import re
+from collections import Counter, OrderedDict
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,;:!?'\""
+
+
+def canonicalize(text):
+    """Normalize free text for cache keys: case, whitespace and edge punctuation."""
+    return _WHITESPACE_RE.sub(" ", str(text).lower()).strip(_EDGE_PUNCTUATION)
+
+
+def char_ngrams(text, n=3):
+    """Return the set of character n-grams of text (padded at both ends)."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i : i + n] for i in range(len(padded) - n + 1)}
+
+
+class SemanticPromptCache:
+    """
+    A bounded completion cache with exact and fuzzy lookups.
+
+    Entries live in a bucket (an exact key for everything that must match,
+    such as model and options) and are matched on their canonical text by
+    character n-gram Jaccard similarity. An inverted n-gram index per bucket
+    keeps fuzzy lookups proportional to the number of entries sharing grams
+    rather than the cache size. The least recently used entry is evicted once
+    `capacity` is reached.
+    """
+
+    def __init__(self, capacity=512, ngram=3):
+        self.capacity = capacity
+        self.ngram = ngram
+        self._entries = OrderedDict()
+        self._exact = {}
+        self._index = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, bucket, text, threshold):
+        """Return (completion, similarity) for the best match >= threshold, or None."""
+        text = canonicalize(text)
+        entry_id = self._exact.get((bucket, text))
+        if entry_id is not None:
+            return self._hit(entry_id, 1.0)
+
+        grams = char_ngrams(text, self.ngram)
+        postings = self._index.get(bucket, {})
+        shared = Counter()
+        for gram in grams:
+            shared.update(postings.get(gram, ()))
+
+        best_id, best_score = None, 0.0
+        for candidate, overlap in shared.items():
+            candidate_grams = self._entries[candidate][2]
+            score = overlap / (len(grams) + len(candidate_grams) - overlap)
+            if score > best_score:
+                best_id, best_score = candidate, score
+        if best_id is None or best_score < threshold:
+            self.misses += 1
+            return None
+        return self._hit(best_id, best_score)
+
+    def _hit(self, entry_id, score):
+        self.hits += 1
+        self._entries.move_to_end(entry_id)
+        return self._entries[entry_id][3], score
+
+    def store(self, bucket, text, completion):
+        """Cache a completion for (bucket, text), replacing an identical key."""
+        text = canonicalize(text)
+        existing = self._exact.get((bucket, text))
+        if existing is not None:
+            self._remove(existing)
+        entry_id = self._next_id
+        self._next_id += 1
+        grams = char_ngrams(text, self.ngram)
+        self._entries[entry_id] = (bucket, text, grams, completion)
+        self._exact[(bucket, text)] = entry_id
+        postings = self._index.setdefault(bucket, {})
+        for gram in grams:
+            postings.setdefault(gram, set()).add(entry_id)
+        while len(self._entries) > self.capacity:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id):
+        bucket, text, grams, _ = self._entries.pop(entry_id)
+        del self._exact[(bucket, text)]
+        postings = self._index[bucket]
+        for gram in grams:
+            ids = postings[gram]
+            ids.discard(entry_id)
+            if not ids:
+                del postings[gram]
+        if not postings:
+            del self._index[bucket]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
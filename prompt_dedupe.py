@@ -0,0 +1,121 @@
+import hashlib
+import re
+from collections import deque
+
+SIMHASH_BITS = 64
+# The 64-bit signature is split into this many bands for the candidate index.
+# Two signatures within (SIMHASH_BANDS - 1) differing bits are guaranteed to
+# share at least one band, so they are always found as candidates.
+SIMHASH_BANDS = 8
+_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+# The lowest similarity the band index is guaranteed to find (about 0.89);
+# checks against a lower threshold scan every remembered signature instead.
+INDEX_MIN_SIMILARITY = 1.0 - (SIMHASH_BANDS - 1) / SIMHASH_BITS
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _features(text):
+    """Split text into word unigrams and bigrams used as SimHash features."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    features = list(tokens)
+    features.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def simhash(text):
+    """Compute a 64-bit SimHash signature for a prompt."""
+    counts = [0] * SIMHASH_BITS
+    for feature in _features(text):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        for bit in range(SIMHASH_BITS):
+            if value >> bit & 1:
+                counts[bit] += 1
+            else:
+                counts[bit] -= 1
+    signature = 0
+    for bit, count in enumerate(counts):
+        if count > 0:
+            signature |= 1 << bit
+    return signature
+
+
+def similarity(sig_a, sig_b):
+    """Return the similarity (0.0 - 1.0) of two SimHash signatures."""
+    return 1.0 - bin(sig_a ^ sig_b).count("1") / SIMHASH_BITS
+
+
+class PromptDeduplicator:
+    """
+    A bounded index of recent prompt signatures for near-duplicate detection.
+
+    Signatures are bucketed by band so a lookup only compares against prompts
+    that share at least one band, keeping checks roughly constant-time
+    regardless of how many prompts are remembered. The bands only guarantee
+    matches down to INDEX_MIN_SIMILARITY; below that check() compares against
+    every remembered prompt, which is still cheap at the bounded capacity.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._entries = deque()
+        self._bands = [dict() for _ in range(SIMHASH_BANDS)]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(signature):
+        return [
+            (signature >> (band * _BAND_BITS)) & _BAND_MASK
+            for band in range(SIMHASH_BANDS)
+        ]
+
+    def check(self, text, threshold=0.0):
+        """Return the highest similarity between text and a remembered prompt.
+
+        Only similarities of at least `threshold` are guaranteed to be found;
+        with the default every remembered prompt is compared.
+        """
+        signature = simhash(text)
+        if threshold < INDEX_MIN_SIMILARITY:
+            return max(
+                (similarity(signature, other) for other in self._entries),
+                default=0.0,
+            )
+        best = 0.0
+        seen = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate in self._bands[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                best = max(best, similarity(signature, candidate))
+        return best
+
+    def add(self, text):
+        """Remember a prompt, evicting the oldest one once capacity is reached."""
+        signature = simhash(text)
+        self._entries.append(signature)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._bands[band].setdefault(key, [])
+            bucket.append(signature)
+        while len(self._entries) > self.capacity:
+            self._evict(self._entries.popleft())
+
+    def _evict(self, signature):
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._bands[band].get(key)
+            if not bucket:
+                continue
+            bucket.remove(signature)
+            if not bucket:
+                del self._bands[band][key]
+
+    def clear(self):
+        """Forget all remembered prompts."""
+        self._entries.clear()
+        for band in self._bands:
+            band.clear()
@@ -0,0 +1,72 @@
+import random
+
+# Subject phrasings per blend mode; {a} and {b} are the themes.
+BLEND_TEMPLATES = {
+    "Simple Mix": (
+        "{a} merged with {b}",
+        "a scene where {a} meets {b}",
+        "{a} intertwined with {b}",
+    ),
+    "A vs. B": (
+        "{a} confronting {b}",
+        "{a} locked in a clash with {b}",
+        "a dramatic standoff between {a} and {b}",
+    ),
+    "A in the world of B": (
+        "{a} in the world of {b}",
+        "{a} exploring a realm of {b}",
+        "{a} set within the landscape of {b}",
+    ),
+    "A made of B": (
+        "{a} made of {b}",
+        "{a} sculpted entirely from {b}",
+        "{a} formed out of {b}",
+    ),
+    "Style of A, Subject of B": (
+        "{b} in the style of {a}",
+        "{b}, rendered with the aesthetic of {a}",
+        "{b} reimagined through the mood of {a}",
+    ),
+}
+
+STYLE_KEYWORDS = {
+    "Cinematic": "cinematic composition, dramatic lighting, shallow depth of field",
+    "Photorealistic": "photorealistic, natural light, sharp focus, fine detail",
+    "Anime": "anime style, cel shading, vibrant colors, clean line art",
+    "Fantasy Art": "fantasy art, painterly brushwork, epic atmosphere",
+    "Sci-Fi": "science fiction, sleek technology, glowing neon accents",
+}
+
+
+def synthesize_prompt(
+    theme_a,
+    theme_b,
+    blend_mode="Simple Mix",
+    style_preset="Cinematic",
+    seed=0,
+    details=(),
+    moods="",
+    wildcards=(),
+    tag_list=False,
+):
+    """Build a prompt from the node inputs with fixed templates, without an LLM.
+
+    The blend mode picks the subject phrasing (chosen by `seed`), followed by
+    the pose/lighting/framing `details`, `moods`, `wildcards` and the style
+    preset keywords. With `tag_list` the result is comma-separated keywords,
+    otherwise a single sentence. Same inputs, same prompt.
+    """
+    a = theme_a.strip() or theme_b.strip() or "a striking subject"
+    b = theme_b.strip() or "an unexpected setting"
+    templates = BLEND_TEMPLATES.get(blend_mode, BLEND_TEMPLATES["Simple Mix"])
+    subject = random.Random(seed).choice(templates).format(a=a, b=b)
+    parts = [subject, *details]
+    if moods:
+        parts.append(f"{moods} mood")
+    parts.extend(wildcards)
+    parts.append(STYLE_KEYWORDS.get(style_preset, STYLE_KEYWORDS["Cinematic"]))
+    parts = [part.strip() for part in parts if part and part.strip()]
+    text = ", ".join(parts)
+    if tag_list:
+        return text
+    return f"{text[0].upper()}{text[1:]}."
@@ -0,0 +1,197 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+
+try:
+    from .content_filter import describe_redaction
+    from .LMStudioPromptEnhancerNode import (
+        LMStudioPromptEnhancerNode,
+        apply_model_styling,
+    )
+    from .response_decoder import parse_prompt_bundle
+except ImportError:
+    from content_filter import describe_redaction
+    from LMStudioPromptEnhancerNode import (
+        LMStudioPromptEnhancerNode,
+        apply_model_styling,
+    )
+    from response_decoder import parse_prompt_bundle
+
+THREAD = "thread"
+PROCESS = "process"
+
+_STOP = object()
+
+
+def postprocess_prompt(task):
+    """Turn a raw completion into the final prompt; safe to run in a process pool.
+
+    `task` is a dict with "completion" and the generation options
+    "structured_output", "prompt_tone", "target_model", "style_preset" and the
+    tag-list options (plus optional "warnings"). Returns {"prompt", "warnings"}: the positive
+    prompt parsed from structured output, with blocked terms removed in SFW
+    tone and the model styling applied.
+    """
+    prompt = task["completion"]
+    warnings = list(task.get("warnings", ()))
+    if task.get("structured_output"):
+        prompt = parse_prompt_bundle(prompt)["positive"]
+    if task.get("prompt_tone", "SFW") == "SFW":
+        prompt, hits = LMStudioPromptEnhancerNode.get_content_filter().redact(prompt)
+        if hits:
+            warnings.append(describe_redaction(hits))
+    prompt = apply_model_styling(
+        prompt,
+        task.get("target_model", "Generic"),
+        task.get("style_preset", "Cinematic"),
+        warnings=warnings,
+        **{
+            name: task.get(name, default)
+            for name, default in LMStudioPromptEnhancerNode.TAG_OPTION_DEFAULTS.items()
+        },
+    )
+    return {"prompt": prompt, "warnings": warnings}
+
+
+class _StageStats:
+    def __init__(self, workers):
+        self.workers = workers
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, failed):
+        with self.lock:
+            self.processed += 1
+            self.errors += failed
+            self.busy += seconds
+
+
+class PromptPipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+
+    Each stage is (name, fn, workers, kind). Thread stages call fn on
+    `workers` threads (for HTTP fetches); process stages send fn to a shared
+    process pool, with `workers` calls in flight, so CPU-bound
+    post-processing does not hold the GIL. A full queue blocks the stage
+    feeding it, so a slow stage throttles the ones before it instead of
+    letting work pile up. Items that fail in a stage skip the remaining
+    stages and are reported with their error.
+    """
+
+    def __init__(self, stages, queue_size=64):
+        self.stages = [tuple(stage) for stage in stages]
+        self.queue_size = queue_size
+        self._stats = {name: _StageStats(workers) for name, _, workers, _ in stages}
+        self._queues = []
+        self._started = None
+        self._finished = None
+
+    def _worker(self, fn, call, stats, in_queue, out_queue):
+        while True:
+            record = in_queue.get()
+            if record is _STOP:
+                return
+            item, value, error = record
+            if error is None:
+                started = time.perf_counter()
+                try:
+                    value = call(fn, value)
+                except Exception as e:
+                    error = e
+                stats.record(time.perf_counter() - started, error is not None)
+            out_queue.put((item, value, error))
+
+    def run(self, items):
+        """Yield (item, result, error) for each item, in completion order.
+
+        Items are pulled from `items` on the calling thread, only while fewer
+        than `queue_size` are in the pipeline.
+        """
+        process_workers = sum(w for _, _, w, kind in self.stages if kind == PROCESS)
+        pool = None
+        if process_workers:
+            pool = ProcessPoolExecutor(process_workers)
+            # Start the worker processes before any pipeline thread exists
+            pool.submit(int).result()
+        queues = [Queue(self.queue_size) for _ in self.stages] + [Queue()]
+        self._queues = queues
+        threads = []
+        for i, (name, fn, workers, kind) in enumerate(self.stages):
+            if kind == PROCESS:
+
+                def call(fn, value):
+                    return pool.submit(fn, value).result()
+
+            else:
+
+                def call(fn, value):
+                    return fn(value)
+
+            for _ in range(workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(fn, call, self._stats[name], queues[i], queues[i + 1]),
+                    name=f"LMStudioPipeline-{name}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append((i, thread))
+
+        if self._started is None:
+            self._started = time.perf_counter()
+        self._finished = None
+        iterator = iter(items)
+        exhausted = False
+        in_flight = 0
+        try:
+            while True:
+                while not exhausted and in_flight < self.queue_size:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    queues[0].put((item, item, None))
+                    in_flight += 1
+                if not in_flight:
+                    return
+                item, value, error = queues[-1].get()
+                in_flight -= 1
+                yield item, None if error else value, error
+        finally:
+            # Stop each stage after the items already queued for it
+            for i, (_, _, workers, _) in enumerate(self.stages):
+                for _ in range(workers):
+                    queues[i].put(_STOP)
+                for stage_index, thread in threads:
+                    if stage_index == i:
+                        thread.join()
+            if pool is not None:
+                pool.shutdown()
+            self._finished = time.perf_counter()
+
+    def stats(self):
+        """Per-stage counters: processed, errors, busy seconds, rate and queue depth."""
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        result = {}
+        for i, (name, _, workers, kind) in enumerate(self.stages):
+            stats = self._stats[name]
+            result[name] = {
+                "kind": kind,
+                "workers": workers,
+                "processed": stats.processed,
+                "errors": stats.errors,
+                "busy_seconds": stats.busy,
+                "items_per_sec": stats.processed / elapsed if elapsed else 0.0,
+                "utilization": (
+                    stats.busy / (elapsed * workers) if elapsed and workers else 0.0
+                ),
+                "queue_depth": self._queues[i].qsize() if self._queues else 0,
+            }
+        return result
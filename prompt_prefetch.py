@@ -0,0 +1,288 @@
+import threading
+from collections import deque
+
+
+class PromptPrefetcher:
+    """
+    A background buffer of pre-generated prompts for one input configuration.
+
+    The node serves prompts from the buffer instantly and a single daemon
+    worker refills it up to the requested depth while the GPU renders. Only
+    one configuration (key) is buffered at a time; taking or refilling with a
+    different key invalidates the buffer and discards in-flight results.
+
+    Items are generated for consecutive seeds after the seed of the run that
+    started the buffer, and a run is only served the item generated for its
+    own seed. Any other seed is a miss and moves the buffer to the seeds
+    after it. Refill requests wait for an idle server (see SpeculationTicket),
+    and one still waiting when the buffer is moved is cancelled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = deque()
+        self._key = None
+        self._generation = 0
+        self._next_seed = None
+        self._ticket = None
+        self._depth = 0
+        self._producer = None
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def _reset(self, next_seed):
+        """Drop buffered and in-flight items; produce from next_seed onwards."""
+        self._buffer.clear()
+        self._generation += 1
+        self._next_seed = next_seed
+        if self._ticket is not None and self._ticket.cancel():
+            self.cancelled += 1
+        self._ticket = None
+
+    def _invalidate(self, key):
+        """Switch to a new key, dropping buffered and in-flight items."""
+        if self._key is not None:
+            self.invalidations += 1
+        self._key = key
+        self._producer = None
+        self._reset(None)
+
+    def take(self, key, seed):
+        """Pop the item buffered for key and seed, or return None on a miss."""
+        with self._lock:
+            if key != self._key:
+                self._invalidate(key)
+            # Items for seeds before the requested one are never served
+            while self._buffer and self._buffer[0][0] < seed:
+                self._buffer.popleft()
+            if self._buffer and self._buffer[0][0] == seed:
+                self.hits += 1
+                return self._buffer.popleft()[1]
+            self.misses += 1
+            self._reset(seed + 1)
+            return None
+
+    def refill(self, key, seed, producer, depth):
+        """Refill the buffer for key up to depth items in the background.
+
+        `producer(seed, ticket)` is called on the worker thread for the seeds
+        after `seed` (seed + 1, seed + 2, ...) and must return the item to
+        buffer. Like a RiffSpeculator producer it must call `ticket.begin()`
+        right before sending its request, and raise SpeculationCancelled
+        instead if that returns False.
+        """
+        with self._lock:
+            if key != self._key:
+                self._invalidate(key)
+            if self._next_seed is None or self._next_seed <= seed:
+                self._reset(seed + 1)
+            self._producer = producer
+            self._depth = depth
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="LMStudioPrefetch", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._producer is None or len(self._buffer) >= self._depth:
+                    self._worker = None
+                    return
+                generation = self._generation
+                producer = self._producer
+                seed = self._next_seed
+                self._next_seed += 1
+                ticket = self._ticket = SpeculationTicket()
+            try:
+                item = producer(seed, ticket)
+            except SpeculationCancelled:
+                # The buffer moved on; produce for its new seeds
+                continue
+            except Exception as e:
+                print(f"[LMStudio] Prefetch failed: {e}")
+                with self._lock:
+                    self.errors += 1
+                    self._worker = None
+                return
+            with self._lock:
+                if generation == self._generation:
+                    self._buffer.append((seed, item))
+
+    def join(self, timeout=None):
+        """Wait for the current refill to finish (mainly for tests/shutdown)."""
+        with self._lock:
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def stats(self):
+        """Return hit/miss counters, hit rate and current queue depth."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "queue_depth": len(self._buffer),
+                "invalidations": self.invalidations,
+                "cancelled": self.cancelled,
+                "errors": self.errors,
+            }
+
+
+class SpeculationCancelled(Exception):
+    """Raised in place of a speculative request that was abandoned before it ran."""
+
+
+class SpeculationTicket:
+    """
+    Decides, exactly once, whether a speculative request runs or is cancelled.
+
+    The request calls begin() right before it is sent; the owner calls
+    cancel() when it no longer wants the result. Whichever comes first wins,
+    so an abandoned request never reaches the server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = False
+        self._cancelled = False
+
+    def begin(self):
+        """Mark the request as sent; return False if it was cancelled first."""
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._started = True
+            return True
+
+    def cancel(self):
+        """Cancel the request unless it was already sent; return whether it was."""
+        with self._lock:
+            if self._started:
+                return False
+            self._cancelled = True
+            return True
+
+
+class RiffSpeculator:
+    """
+    Holds one speculatively generated riff, keyed by the inputs it is for.
+
+    After a generation the node schedules the riff that the next run would
+    request. A run with matching inputs takes it instantly, or waits for it
+    when its request is already running. A request still waiting for an
+    idle server is cancelled instead, as is the previous speculation when a
+    new key is scheduled, so abandoned speculations cost no LM Studio time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._item = None
+        self._ticket = None
+        self._done = None
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def schedule(self, key, producer):
+        """Run `producer(ticket)` in the background and keep its item for key.
+
+        The producer must call `ticket.begin()` right before sending its
+        request, and raise SpeculationCancelled instead if that returns False.
+        """
+        with self._lock:
+            if key == self._key:
+                return
+            if self._key is not None:
+                self._discard()
+            self._key = key
+            self._item = None
+            ticket = self._ticket = SpeculationTicket()
+            done = self._done = threading.Event()
+        threading.Thread(
+            target=self._run,
+            args=(key, producer, ticket, done),
+            name="LMStudioSpeculativeRiff",
+            daemon=True,
+        ).start()
+
+    def _discard(self):
+        # Called with the lock held
+        self.discarded += 1
+        if self._ticket.cancel():
+            self.cancelled += 1
+        self._key = None
+
+    def _run(self, key, producer, ticket, done):
+        try:
+            item = producer(ticket)
+        except SpeculationCancelled:
+            item = None
+        except Exception as e:
+            print(f"[LMStudio] Speculative riff failed: {e}")
+            item = None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            if key == self._key:
+                self._item = item
+        done.set()
+
+    def take(self, key, timeout=None):
+        """Return the item speculated for key, or None on a miss."""
+        with self._lock:
+            if key != self._key:
+                self.misses += 1
+                if self._key is not None:
+                    # The run moved on; the pending speculation is superseded
+                    self._discard()
+                return None
+            done = self._done
+            if not done.is_set() and self._ticket.cancel():
+                # Still waiting for an idle server: cancelled rather than awaited
+                self.misses += 1
+                self.discarded += 1
+                self.cancelled += 1
+                self._key = None
+                return None
+        done.wait(timeout)
+        with self._lock:
+            item = self._item if key == self._key else None
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._key = None
+            self._item = None
+            return item
+
+    def join(self, timeout=None):
+        """Wait for the current speculation to finish (mainly for tests)."""
+        with self._lock:
+            done = self._done
+        if done is not None:
+            done.wait(timeout)
+
+    def stats(self):
+        """Return hit/miss counters and how many speculations went unused."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "discarded": self.discarded,
+                "cancelled": self.cancelled,
+                "errors": self.errors,
+            }
@@ -0,0 +1,118 @@
+import random
+from collections import namedtuple
+
+try:
+    from .option_catalog import OptionCatalog
+except ImportError:
+    from option_catalog import OptionCatalog
+
+# Random choices made for one generation. Option fields hold the resolved value
+# ("random" replaced by a pick) or None when no allowed value was available.
+CreativePicks = namedtuple(
+    "CreativePicks",
+    [
+        "theme_a_wildcard",
+        "theme_b_wildcard",
+        "action_pose",
+        "emotion_expression",
+        "lighting",
+        "framing",
+        "chaos_wildcards",
+    ],
+)
+
+RANDOM_OPTIONS = ("action_pose", "emotion_expression", "lighting", "framing")
+
+
+def chaos_wildcard_count(chaos):
+    """Number of chaos wildcards for a chaos level (1 per 3 points, 4 at 10)."""
+    if chaos <= 0:
+        return 0
+    return int((chaos + 2) / 3) if chaos < 10 else 4
+
+
+class CreativeSampler:
+    """
+    Seeded sampler for wildcard injections, chaos wildcards and "random" options.
+
+    Options are held as OptionCatalogs (plain value lists are wrapped, with
+    `explicit_options` flagged), so the choice list for a tone, subject and
+    target model is a precomputed tuple. All draws come from the given
+    `random.Random`, so the same seed and inputs always produce the same
+    picks.
+    """
+
+    def __init__(self, wildcards, options, explicit_options=()):
+        self.wildcards = {name: tuple(values) for name, values in wildcards.items()}
+        self.chaos_pool = tuple(
+            value for values in self.wildcards.values() for value in values
+        )
+        self.option_catalogs = {
+            name: (
+                values
+                if isinstance(values, OptionCatalog)
+                else OptionCatalog.from_values(
+                    (v for v in values if v not in ("default", "random")),
+                    explicit_options,
+                    name=name,
+                )
+            )
+            for name, values in options.items()
+        }
+
+    def _pick_wildcard(self, rng, name):
+        values = self.wildcards.get(name)
+        if not name or name == "none" or not values:
+            return None
+        return rng.choice(values)
+
+    def sample(
+        self,
+        rng,
+        wildcard_1="none",
+        wildcard_2="none",
+        action_pose="default",
+        emotion_expression="default",
+        lighting="default",
+        framing="default",
+        chaos=0.0,
+        sfw=True,
+        subject=None,
+        target_model=None,
+    ):
+        """Resolve every random choice for one generation using `rng`.
+
+        "random" options draw from the catalog entries allowed for the tone
+        and, when given, the subject and target model tags.
+        """
+        theme_a_wildcard = self._pick_wildcard(rng, wildcard_1)
+        theme_b_wildcard = self._pick_wildcard(rng, wildcard_2)
+
+        resolved = {}
+        requested = {
+            "action_pose": action_pose,
+            "emotion_expression": emotion_expression,
+            "lighting": lighting,
+            "framing": framing,
+        }
+        for name in RANDOM_OPTIONS:
+            value = requested[name]
+            if value == "random":
+                catalog = self.option_catalogs.get(name)
+                pool = catalog.allowed(sfw, subject, target_model) if catalog else ()
+                value = rng.choice(pool) if pool else None
+            resolved[name] = value
+
+        count = min(chaos_wildcard_count(chaos), len(self.chaos_pool))
+        chaos_wildcards = tuple(rng.sample(self.chaos_pool, count)) if count else ()
+
+        return CreativePicks(
+            theme_a_wildcard=theme_a_wildcard,
+            theme_b_wildcard=theme_b_wildcard,
+            chaos_wildcards=chaos_wildcards,
+            **resolved,
+        )
+
+    def sample_batch(self, seeds, **options):
+        """Sample picks for many seeds at once; item i equals sample(Random(seeds[i]))."""
+        return [self.sample(random.Random(seed), **options) for seed in seeds]
@@ -0,0 +1,161 @@
+import re
+from collections import namedtuple
+
+# Target models whose prompts are comma-separated tag lists.
+TAG_MODELS = ("Pony", "SDXL", "Flux")
+
+# One tag and its emphasis weight (1.0 = no emphasis).
+Tag = namedtuple("Tag", "text weight")
+
+# The result of build_tag_list: the formatted prompt, the kept and dropped
+# tags, and the estimated token count of the kept tags.
+TagList = namedtuple("TagList", "text tags dropped tokens")
+
+# Canonical sections, in output order.
+QUALITY, SOURCE, RATING, CONTENT, STYLE = range(5)
+
+QUALITY_TAGS = frozenset(
+    (
+        "masterpiece",
+        "best quality",
+        "high quality",
+        "amazing quality",
+        "very aesthetic",
+        "absurdres",
+        "highres",
+        "ultra-detailed",
+    )
+)
+
+# Weight of one level of bare parentheses in ComfyUI/A1111 prompt syntax.
+_PAREN_WEIGHT = 1.1
+
+_WEIGHTED_RE = re.compile(r"^\((.+):\s*(-?\d+(?:\.\d+)?)\s*\)$", re.S)
+_SPACE_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"[a-z]+|\d|[^\sa-z\d]")
+
+
+def tag_key(text):
+    """Identity of a tag for deduplication: case, spacing and "_" vs " " ignored."""
+    return _SPACE_RE.sub(" ", text.replace("_", " ")).strip().lower()
+
+
+def _parse_tag(item):
+    item = item.strip()
+    match = _WEIGHTED_RE.match(item)
+    if match:
+        return Tag(match.group(1).strip(), float(match.group(2)))
+    weight = 1.0
+    while len(item) > 2 and item[0] + item[-1] in ("()", "[]"):
+        weight = weight * _PAREN_WEIGHT if item[0] == "(" else weight / _PAREN_WEIGHT
+        item = item[1:-1].strip()
+    return Tag(item, weight)
+
+
+def parse_tags(text):
+    """Split comma/newline separated text into Tags, reading (tag:w) emphasis."""
+    tags = []
+    for item in re.split(r"[,\n]", text):
+        tag = _parse_tag(item)
+        if tag.text.strip(" .;"):
+            tags.append(Tag(tag.text.strip(" .;"), tag.weight))
+    return tags
+
+
+def parse_emphasis(text):
+    """Parse "dragon:1.3, neon sign" into {tag_key: weight}; a bare tag is 1.1."""
+    weights = {}
+    for item in text.split(","):
+        name, sep, weight = item.rpartition(":")
+        if not sep:
+            name, weight = item, str(_PAREN_WEIGHT)
+        try:
+            weight = float(weight)
+        except ValueError:
+            name, weight = item, _PAREN_WEIGHT
+        if tag_key(name):
+            weights[tag_key(name)] = weight
+    return weights
+
+
+def estimate_tokens(text):
+    """Rough CLIP token count of a tag: words, digits and punctuation."""
+    return len(_TOKEN_RE.findall(text.lower()))
+
+
+def format_tag(tag):
+    if round(tag.weight, 2) == 1.0:
+        return tag.text
+    return f"({tag.text}:{round(tag.weight, 2):g})"
+
+
+def _section(key, style_keys):
+    if key.startswith("score ") or key in QUALITY_TAGS:
+        return QUALITY
+    if key.startswith("source "):
+        return SOURCE
+    if key.startswith("rating "):
+        return RATING
+    if key in style_keys:
+        return STYLE
+    return CONTENT
+
+
+def build_tag_list(tags, leading=(), trailing=(), emphasis=None, token_budget=0):
+    """Merge generated tags with style tags into one clean, ordered tag list.
+
+    `tags` come from the model; `leading` and `trailing` are the model's
+    quality and style tags (see apply_model_styling). Duplicates are merged
+    on tag_key, keeping the first spelling and the strongest weight, and
+    only the first rating_* tag is kept. Tags are ordered quality, source,
+    rating, content, style; within a section they keep their order. Weights
+    from `emphasis` ({tag_key: weight}) override those in the text. With a
+    `token_budget`, tags that do not fit are dropped, style tags first and
+    quality/source/rating tags last; a comma counts as one token.
+
+    Runs in one linear pass over the tags.
+    """
+    emphasis = emphasis or {}
+    trailing = list(trailing)
+    style_keys = {tag_key(tag.text) for tag in trailing}
+    merged = {}
+    rating = None
+    for tag in (*leading, *tags, *trailing):
+        key = tag_key(tag.text)
+        if not key:
+            continue
+        seen = merged.get(key)
+        if seen is not None:
+            if abs(tag.weight - 1.0) > abs(seen.weight - 1.0):
+                merged[key] = Tag(seen.text, tag.weight)
+            continue
+        if key.startswith("rating "):
+            if rating is not None:
+                continue
+            rating = key
+        merged[key] = tag
+
+    sections = ([], [], [], [], [])
+    for key, tag in merged.items():
+        if key in emphasis:
+            tag = Tag(tag.text, emphasis[key])
+        sections[_section(key, style_keys)].append(tag)
+
+    dropped = []
+    tokens = 0
+    if token_budget > 0:
+        kept = ([], [], [], [], [])
+        for section in (QUALITY, SOURCE, RATING, CONTENT, STYLE):
+            for tag in sections[section]:
+                cost = estimate_tokens(tag.text) + (1 if tokens else 0)
+                if tokens + cost <= token_budget:
+                    kept[section].append(tag)
+                    tokens += cost
+                else:
+                    dropped.append(tag)
+        sections = kept
+    ordered = [tag for section in sections for tag in section]
+    if token_budget <= 0:
+        tokens = sum(estimate_tokens(tag.text) for tag in ordered)
+        tokens += max(0, len(ordered) - 1)
+    return TagList(", ".join(map(format_tag, ordered)), ordered, dropped, tokens)
@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    from .model_warmup import lmstudio_base_url
+except ImportError:
+    from model_warmup import lmstudio_base_url
+
+
+class TokenBucket:
+    """
+    A token-bucket rate limiter: `rate` requests per second, bursts of `burst`.
+
+    Callers that find the bucket empty reserve a future token and sleep until
+    it is due, so concurrent callers are spaced out instead of retrying.
+    """
+
+    def __init__(self, rate, burst=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available; return the seconds waited."""
+        delay = self.reserve()
+        if delay > 0:
+            self._sleep(delay)
+        return delay
+
+
+class _EndpointState:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.in_flight = 0
+        self.waiting = []  # heap of (tag, seq, event)
+        self.idle_waiting = deque()
+        self.virtual_time = 0.0
+        self.client_tags = {}
+        self.requests = 0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.rate_wait = 0.0
+        self.clients = {}
+
+
+class RequestScheduler:
+    """
+    Shares LM Studio capacity fairly between the clients of one process.
+
+    At most `max_in_flight` requests run per LM Studio server; the rest wait
+    in a weighted fair queue. Each request gets a virtual finish tag one
+    `1/priority` step after the later of the client's previous tag and the
+    tag now being served, and the smallest tag runs next. A client with a
+    large batch therefore only gets its share, and a single request from
+    another client waits for at most one request per active client. With a
+    `rate` (requests per second), a token bucket spaces requests out as
+    well. Idle requests (speculative work) only start when nothing else is
+    running or waiting on the server. Waiting times are reported by stats().
+    """
+
+    def __init__(self, max_in_flight=4, rate=0.0, burst=1.0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._endpoints = {}
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler from the environment.
+
+        LMSTUDIO_MAX_IN_FLIGHT (default 4), LMSTUDIO_RATE_LIMIT (requests per
+        second, 0 = unlimited) and LMSTUDIO_RATE_BURST (default 1).
+        """
+        return cls(
+            max_in_flight=int(os.environ.get("LMSTUDIO_MAX_IN_FLIGHT", "4")),
+            rate=float(os.environ.get("LMSTUDIO_RATE_LIMIT", "0")),
+            burst=float(os.environ.get("LMSTUDIO_RATE_BURST", "1")),
+        )
+
+    def _state(self, lmstudio_endpoint):
+        key = lmstudio_base_url(lmstudio_endpoint)
+        state = self._endpoints.get(key)
+        if state is None:
+            bucket = TokenBucket(self.rate, self.burst) if self.rate > 0 else None
+            state = self._endpoints[key] = _EndpointState(bucket)
+        return state
+
+    @contextmanager
+    def slot(self, lmstudio_endpoint, client="default", priority=1.0, idle=False):
+        """Hold one request slot for `client` on the endpoint's server.
+
+        An `idle` request waits until the server has nothing else in flight
+        or queued, and does not advance the client's fair-queue position.
+        """
+        started = time.perf_counter()
+        event = None
+        with self._lock:
+            state = self._state(lmstudio_endpoint)
+            if idle:
+                if state.in_flight == 0 and not state.waiting:
+                    state.in_flight += 1
+                else:
+                    event = threading.Event()
+                    state.idle_waiting.append(event)
+            else:
+                tag = max(state.virtual_time, state.client_tags.get(client, 0.0))
+                tag += 1.0 / max(priority, 0.01)
+                state.client_tags[client] = tag
+                if state.in_flight < self.max_in_flight and not state.waiting:
+                    state.in_flight += 1
+                    state.virtual_time = tag
+                else:
+                    event = threading.Event()
+                    heapq.heappush(state.waiting, (tag, next(self._seq), event))
+        if event is not None:
+            event.wait()
+        try:
+            queue_wait = time.perf_counter() - started
+            rate_wait = state.bucket.acquire() if state.bucket else 0.0
+            with self._lock:
+                state.requests += 1
+                state.queue_wait += queue_wait
+                state.max_queue_wait = max(state.max_queue_wait, queue_wait)
+                state.rate_wait += rate_wait
+                client_stats = state.clients.setdefault(client, [0, 0.0])
+                client_stats[0] += 1
+                client_stats[1] += queue_wait + rate_wait
+            yield
+        finally:
+            with self._lock:
+                if state.waiting:
+                    # Hand the slot straight to the next request in tag order
+                    tag, _, waiter = heapq.heappop(state.waiting)
+                    state.virtual_time = tag
+                    waiter.set()
+                elif state.idle_waiting and state.in_flight == 1:
+                    state.idle_waiting.popleft().set()
+                else:
+                    state.in_flight -= 1
+
+    def stats(self):
+        """Per-server request counts, queue depth and average/max waits."""
+        with self._lock:
+            return {
+                key: {
+                    "in_flight": state.in_flight,
+                    "queued": len(state.waiting),
+                    "idle_queued": len(state.idle_waiting),
+                    "requests": state.requests,
+                    "avg_queue_wait": (
+                        state.queue_wait / state.requests if state.requests else 0.0
+                    ),
+                    "max_queue_wait": state.max_queue_wait,
+                    "rate_limit_wait": state.rate_wait,
+                    "clients": {
+                        client: {"requests": count, "avg_wait": wait / count}
+                        for client, (count, wait) in state.clients.items()
+                    },
+                }
+                for key, state in self._endpoints.items()
+            }
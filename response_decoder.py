@@ -0,0 +1,163 @@
+import json
+import re
+from typing import Optional
+
+# Reasoning blocks some local models emit before the answer, removed in one pass.
+_REASONING_RE = re.compile(
+    r"<(think|thinking|reasoning)>.*?</\1>\s*", re.DOTALL | re.IGNORECASE
+)
+
+_decoder = None
+
+
+def strip_reasoning(text):
+    """Remove <think>...</think> style reasoning blocks and surrounding whitespace."""
+    if "<" in text:
+        text = _REASONING_RE.sub("", text)
+    return text.strip()
+
+
+def _content_from_data(data):
+    content = data["choices"][0]["message"]["content"]
+    if not isinstance(content, str):
+        raise ValueError("Completion message has no text content.")
+    return content
+
+
+def _decode_stdlib(body):
+    return _content_from_data(json.loads(body))
+
+
+def _make_orjson_decoder(orjson):
+    def decode(body):
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(str(e)) from e
+        return _content_from_data(data)
+
+    return decode
+
+
+def _make_msgspec_decoder(msgspec):
+    # Only the fields we read are declared; logprobs, usage, reasoning_content
+    # and everything else in the response are skipped without being built.
+    class Message(msgspec.Struct):
+        content: Optional[str] = None
+
+    class Choice(msgspec.Struct):
+        message: Message
+
+    class Completion(msgspec.Struct):
+        choices: list[Choice]
+
+    decoder = msgspec.json.Decoder(Completion)
+
+    def decode(body):
+        try:
+            completion = decoder.decode(body)
+        except msgspec.MsgspecError as e:
+            raise ValueError(str(e)) from e
+        content = completion.choices[0].message.content
+        if content is None:
+            raise ValueError("Completion message has no text content.")
+        return content
+
+    return decode
+
+
+def get_decoder():
+    """Return the fastest available body decoder (msgspec, orjson, then json).
+
+    The optional libraries are imported on first use to keep package import
+    cheap.
+    """
+    global _decoder
+    if _decoder is None:
+        try:
+            import msgspec
+
+            _decoder = _make_msgspec_decoder(msgspec)
+        except ImportError:
+            try:
+                import orjson
+
+                _decoder = _make_orjson_decoder(orjson)
+            except ImportError:
+                _decoder = _decode_stdlib
+    return _decoder
+
+
+def decode_completion_body(body):
+    """Decode a raw chat completion body and return its cleaned message text.
+
+    Raises ValueError, KeyError or IndexError when the body is not a chat
+    completion.
+    """
+    return strip_reasoning(get_decoder()(body))
+
+
+def extract_completion(response):
+    """Return the cleaned message text of a chat completion HTTP response."""
+    body = getattr(response, "content", None)
+    if isinstance(body, (bytes, bytearray)):
+        return decode_completion_body(body)
+    # Response-like objects without a raw body (e.g. test doubles)
+    return strip_reasoning(_content_from_data(response.json()))
+
+
+# JSON schema for structured output mode: positive, negative and tags at once.
+PROMPT_BUNDLE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "positive": {"type": "string"},
+        "negative": {"type": "string"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["positive", "negative", "tags"],
+}
+
+PROMPT_BUNDLE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "prompt_bundle",
+        "strict": True,
+        "schema": PROMPT_BUNDLE_SCHEMA,
+    },
+}
+
+
+def _find_json_object(text):
+    """Return the first JSON object embedded in text, or None."""
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            value = None
+        if isinstance(value, dict):
+            return value
+        start = text.find("{", start + 1)
+    return None
+
+
+def parse_prompt_bundle(text):
+    """Parse a structured-output completion into {positive, negative, tags}.
+
+    Models that ignore the schema may wrap the object in prose or code fences,
+    or return plain text; the first embedded object is used, and plain text is
+    treated as the positive prompt with no negative prompt or tags.
+    """
+    data = _find_json_object(text)
+    if data is None or not isinstance(data.get("positive"), str):
+        return {"positive": text.strip(), "negative": "", "tags": []}
+    negative = data.get("negative")
+    tags = data.get("tags")
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return {
+        "positive": data["positive"].strip(),
+        "negative": negative.strip() if isinstance(negative, str) else "",
+        "tags": [str(tag).strip() for tag in tags or () if tag and str(tag).strip()],
+    }
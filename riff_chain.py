@@ -0,0 +1,59 @@
+import uuid
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# One variation in a riff tree. `index` numbers the nodes of the full tree
+# breadth-first (the root is 0, the children of node i are i*branching+1 ...
+# i*branching+branching), so it does not depend on completion order. `extra`
+# is whatever the riff function returned alongside the prompt text.
+RiffNode = namedtuple("RiffNode", "id parent_id depth index prompt extra")
+
+
+def new_entry_id():
+    """Return a short random id for a history entry."""
+    return uuid.uuid4().hex[:12]
+
+
+def riff_tree(
+    riff, root_prompt, depth, branching, max_workers=4, accept=None, root_id=None
+):
+    """Expand a tree of riffs on `root_prompt` and yield its nodes as they finish.
+
+    `riff(parent_prompt, index)` returns (prompt, extra) for one variation.
+    The children of a node are requested as soon as that node is accepted,
+    so siblings run concurrently and deeper levels start while their cousins
+    are still generating; at most `max_workers` requests are in flight.
+    `accept(node)`, called on the calling thread, can reject a node (e.g. a
+    near-duplicate), which is then neither yielded nor expanded. The first
+    exception raised by `riff` cancels the queued requests and propagates.
+    """
+    root = RiffNode(root_id, None, 0, 0, root_prompt, None)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending = {}
+
+        def expand(node):
+            if node.depth >= depth:
+                return
+            for branch in range(branching):
+                index = node.index * branching + branch + 1
+                future = pool.submit(riff, node.prompt, index)
+                pending[future] = (node, index)
+
+        expand(root)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: pending[f][1]):
+                parent, index = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    for queued in pending:
+                        queued.cancel()
+                    raise error
+                prompt, extra = future.result()
+                node = RiffNode(
+                    new_entry_id(), parent.id, parent.depth + 1, index, prompt, extra
+                )
+                if accept is not None and not accept(node):
+                    continue
+                yield node
+                expand(node)
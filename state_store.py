@@ -0,0 +1,272 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+# Immutable per-namespace view of the node state. Writers build a new snapshot
+# and swap the reference, so readers never take a lock.
+StateSnapshot = namedtuple("StateSnapshot", ["last_prompt", "history", "warnings"])
+
+EMPTY_SNAPSHOT = StateSnapshot(None, (), ())
+
+
+class MemoryStateStore:
+    """
+    In-process state store for riff state, warnings and prompt history.
+
+    Reads return the current immutable snapshot for a namespace without
+    locking; writes are serialized and replace the snapshot atomically.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.RLock()
+
+    def snapshot(self, namespace):
+        return self._snapshots.get(namespace, EMPTY_SNAPSHOT)
+
+    def get_last_prompt(self, namespace):
+        return self.snapshot(namespace).last_prompt
+
+    def get_history(self, namespace):
+        return self.snapshot(namespace).history
+
+    def get_warnings(self, namespace):
+        return self.snapshot(namespace).warnings
+
+    def _replace(self, namespace, **fields):
+        self._snapshots[namespace] = self.snapshot(namespace)._replace(**fields)
+
+    def set_last_prompt(self, namespace, prompt):
+        with self._lock:
+            self._replace(namespace, last_prompt=prompt)
+
+    def set_warnings(self, namespace, warnings):
+        with self._lock:
+            self._replace(namespace, warnings=tuple(warnings))
+
+    def append_history(self, namespace, entry, limit):
+        """Append a history entry, keeping only the most recent `limit` entries."""
+        with self._lock:
+            history = self.snapshot(namespace).history + (entry,)
+            self._replace(namespace, history=history[-limit:])
+
+    def clear(self, namespace):
+        with self._lock:
+            self._snapshots.pop(namespace, None)
+
+    def flush(self):
+        """Persist pending writes (no-op for the in-memory store)."""
+
+    def close(self):
+        self.flush()
+
+
+class SQLiteStateStore(MemoryStateStore):
+    """
+    State store persisted to a SQLite database in WAL mode.
+
+    Multiple node instances and ComfyUI worker processes pointing at the same
+    file share state. Reads are served from the in-memory snapshots and are
+    refreshed at most every `refresh_interval` seconds when another
+    connection has committed (PRAGMA data_version). Writes are applied to the
+    snapshot immediately and batched to disk every `flush_interval` seconds or
+    once `batch_size` writes are pending.
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=32, refresh_interval=1.0):
+        super().__init__()
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        # Imported here so the default in-memory backend does not load sqlite3
+        import sqlite3
+
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "namespace TEXT NOT NULL, entry TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS history_namespace ON history (namespace, id)"
+        )
+        self._pending_state = {}
+        self._pending_history = []
+        self._history_limits = {}
+        self._flush_timer = None
+        self._data_version = self._read_data_version()
+        self._last_refresh = time.monotonic()
+        self._closed = False
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self, namespace):
+        rows = dict(
+            self._conn.execute(
+                "SELECT key, value FROM state WHERE namespace = ?", (namespace,)
+            ).fetchall()
+        )
+        history = tuple(
+            json.loads(entry)
+            for (entry,) in self._conn.execute(
+                "SELECT entry FROM history WHERE namespace = ? ORDER BY id",
+                (namespace,),
+            )
+        )
+        return StateSnapshot(
+            last_prompt=(
+                json.loads(rows["last_prompt"]) if "last_prompt" in rows else None
+            ),
+            history=history,
+            warnings=tuple(json.loads(rows.get("warnings") or "[]")),
+        )
+
+    def _refresh(self):
+        """Reload cached namespaces if another connection committed changes."""
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            version = self._read_data_version()
+            if version == self._data_version:
+                return
+            self._flush_locked()
+            for namespace in list(self._snapshots):
+                self._snapshots[namespace] = self._load(namespace)
+            self._data_version = version
+
+    def snapshot(self, namespace):
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self._refresh()
+        snapshot = self._snapshots.get(namespace)
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshots.get(namespace)
+                if snapshot is None:
+                    snapshot = self._load(namespace)
+                    self._snapshots[namespace] = snapshot
+        return snapshot
+
+    def set_last_prompt(self, namespace, prompt):
+        with self._lock:
+            super().set_last_prompt(namespace, prompt)
+            self._pending_state[(namespace, "last_prompt")] = json.dumps(prompt)
+            self._schedule_flush()
+
+    def set_warnings(self, namespace, warnings):
+        with self._lock:
+            super().set_warnings(namespace, warnings)
+            self._pending_state[(namespace, "warnings")] = json.dumps(list(warnings))
+            self._schedule_flush()
+
+    def append_history(self, namespace, entry, limit):
+        with self._lock:
+            super().append_history(namespace, entry, limit)
+            self._pending_history.append((namespace, json.dumps(entry)))
+            self._history_limits[namespace] = limit
+            self._schedule_flush()
+
+    def clear(self, namespace):
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM history WHERE namespace = ?", (namespace,))
+            super().clear(namespace)
+
+    def _schedule_flush(self):
+        pending = len(self._pending_state) + len(self._pending_history)
+        if pending >= self.batch_size:
+            self._flush_locked()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_locked(self):
+        import sqlite3
+
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._closed or not (self._pending_state or self._pending_history):
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO state (namespace, key, value) VALUES (?, ?, ?)",
+                [(ns, key, value) for (ns, key), value in self._pending_state.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO history (namespace, entry) VALUES (?, ?)",
+                self._pending_history,
+            )
+            for namespace, limit in self._history_limits.items():
+                self._conn.execute(
+                    "DELETE FROM history WHERE namespace = ? AND id NOT IN ("
+                    "SELECT id FROM history WHERE namespace = ? "
+                    "ORDER BY id DESC LIMIT ?)",
+                    (namespace, namespace, limit),
+                )
+            self._conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._pending_state.clear()
+        self._pending_history.clear()
+        self._history_limits.clear()
+
+    def flush(self):
+        """Write all pending changes to the database in one transaction."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._closed = True
+            self._conn.close()
+
+
+def create_state_store(backend="memory", path=None):
+    """Create a state store for the given backend name ('memory' or 'sqlite')."""
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("The sqlite state backend requires a database path.")
+        return SQLiteStateStore(path)
+    raise ValueError(f"Unknown state backend: {backend}")
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_state_store():
+    """Return the process-wide store used for named (shared) namespaces.
+
+    The backend is chosen with the LMSTUDIO_STATE_BACKEND environment variable
+    ('memory' by default, or 'sqlite' with LMSTUDIO_STATE_PATH pointing at the
+    database file shared between ComfyUI workers).
+    """
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = create_state_store(
+                os.environ.get("LMSTUDIO_STATE_BACKEND", "memory"),
+                os.environ.get("LMSTUDIO_STATE_PATH"),
+            )
+            atexit.register(_shared_store.close)
+        return _shared_store
@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import requests
+
+from bulk_generate import DONE, FAILED, JobQueue, run_bulk
+
+
+def echo_response(url, headers=None, json=None, timeout=None):
+    response = MagicMock(status_code=200)
+    user = json["messages"][1]["content"]
+    response.json.return_value = {"choices": [{"message": {"content": user}}]}
+    return response
+
+
+class TestBulkGenerate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jobs = os.path.join(self.tmp.name, "jobs.jsonl")
+        self.output = os.path.join(self.tmp.name, "out.jsonl")
+        self.queue = os.path.join(self.tmp.name, "queue.sqlite3")
+        with open(self.jobs, "w", encoding="utf-8") as f:
+            for i in range(5):
+                f.write(json.dumps({"theme_a": f"theme {i}", "theme_b": "a dragon"}))
+                f.write("\n")
+            f.write(json.dumps({"id": "named", "theme_a": "x", "theme_b": "y"}) + "\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_output(self):
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def run_bulk(self, **kwargs):
+        return run_bulk(
+            self.jobs,
+            self.output,
+            queue_path=self.queue,
+            model_identifier="fake-model",
+            max_workers=3,
+            retry_delay=0,
+            progress_interval=0,
+            **kwargs,
+        )
+
+    @patch("requests.post")
+    def test_processes_all_jobs_and_streams_jsonl(self, mock_post):
+        mock_post.side_effect = echo_response
+        stats = self.run_bulk()
+
+        self.assertEqual(stats["done"], 6)
+        self.assertGreater(stats["prompts_per_sec"], 0)
+        rows = self.read_output()
+        self.assertEqual(
+            sorted(row["id"] for row in rows),
+            ["line-1", "line-2", "line-3", "line-4", "line-5", "named"],
+        )
+        self.assertIn("theme 0", next(r for r in rows if r["id"] == "line-1")["prompt"])
+
+        # A second run over the same queue finds nothing left to do
+        stats = self.run_bulk()
+        self.assertEqual(stats["done"], 0)
+        self.assertEqual(len(self.read_output()), 6)
+        self.assertEqual(mock_post.call_count, 6)
+
+    @patch("requests.post")
+    def test_retries_then_gives_up(self, mock_post):
+        calls = {"named": 0}
+
+        def flaky(url, headers=None, json=None, timeout=None):
+            if "Theme A: 'x'" in json["messages"][1]["content"]:
+                calls["named"] += 1
+                raise requests.exceptions.ConnectionError("down")
+            if "theme 2" in json["messages"][1]["content"] and not calls.get("t2"):
+                calls["t2"] = True
+                raise requests.exceptions.Timeout("slow")
+            return echo_response(url, json=json)
+
+        mock_post.side_effect = flaky
+        stats = self.run_bulk(max_attempts=3)
+
+        self.assertEqual((stats["done"], stats["failed"]), (5, 1))
+        self.assertEqual(calls["named"], 3)
+        queue = JobQueue(self.queue)
+        counts = queue.counts()
+        queue.close()
+        self.assertEqual((counts[DONE], counts[FAILED]), (5, 1))
+
+    @patch("requests.post")
+    def test_resumes_after_crash(self, mock_post):
+        """Jobs left running by a dead process are re-queued on the next run."""
+        mock_post.side_effect = echo_response
+        queue = JobQueue(self.queue)
+        queue.enqueue([("line-1", {"theme_a": "theme 0", "theme_b": "a dragon"})])
+        queue.claim()  # the "crashed" run took this job and never finished it
+        queue.close()
+        with sqlite3.connect(self.queue) as conn:
+            status = conn.execute("SELECT status FROM jobs").fetchone()[0]
+        self.assertEqual(status, "running")
+
+        stats = self.run_bulk()
+        self.assertEqual(stats["done"], 6)
+
+    @patch("requests.post")
+    def test_process_pool_post_processing(self, mock_post):
+        """Post-processing in worker processes gives the same output."""
+        mock_post.side_effect = echo_response
+        stats = self.run_bulk(process_workers=2)
+
+        self.assertEqual(stats["done"], 6)
+        self.assertEqual(stats["stages"]["postprocess"]["processed"], 6)
+        row = next(r for r in self.read_output() if r["id"] == "line-1")
+        self.assertIn("theme 0", row["prompt"])
+        self.assertTrue(row["prompt"].endswith("high resolution"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+import time
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from content_filter import ContentFilter, normalize
+
+
+class TestContentFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.filter = ContentFilter(["nude", "bare breasts", "sex", "he"])
+
+    def test_normalize_keeps_offsets(self):
+        text = "NUD3 $3X"
+        self.assertEqual(normalize(text), "nude sex")
+        self.assertEqual(len(normalize(text)), len(text))
+
+    def test_word_boundaries(self):
+        """Terms only match whole words, not substrings of other words."""
+        hits = self.filter.scan("A nude statue, denuded hills, Sussex, the hero")
+        self.assertEqual([hit.term for hit in hits], ["nude"])
+        self.assertEqual((hits[0].start, hits[0].end), (2, 6))
+
+    def test_leetspeak_and_phrases(self):
+        hits = self.filter.scan("B4re  breasts? no: b4re breasts, NUD3!")
+        self.assertEqual([hit.term for hit in hits], ["bare breasts", "nude"])
+
+    def test_overlapping_terms(self):
+        """Suffix terms sharing a trie path are found through failure links."""
+        content_filter = ContentFilter(["she", "he", "hers", "his"])
+        hits = content_filter.scan("ushers he his")
+        self.assertEqual([hit.term for hit in hits], ["he", "his"])
+
+    def test_redact_tidies_separators(self):
+        clean, hits = self.filter.redact("portrait, nude, soft light, a nude woman")
+        self.assertEqual(clean, "portrait, soft light, a woman")
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(self.filter.redact("clean prompt"), ("clean prompt", []))
+
+    def test_benchmark_10k_terms(self):
+        """Scan time does not grow with the blocklist: 10k terms vs 100 terms."""
+        rng = random.Random(0)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        terms = [
+            "".join(rng.choice(letters) for _ in range(rng.randint(4, 10)))
+            for _ in range(10_000)
+        ]
+        prompt = (
+            "a lone knight in weathered armor facing a colossal dragon above a "
+            "storm-lashed cliff, cinematic lighting, volumetric fog, dramatic "
+            "rim light, ultra detailed, golden hour, sweeping wide shot, epic "
+            "fantasy atmosphere, embers drifting through the air, 8k"
+        ) * 2
+
+        def per_prompt(content_filter, runs=200):
+            started = time.perf_counter()
+            for _ in range(runs):
+                content_filter.scan(prompt)
+            return (time.perf_counter() - started) / runs
+
+        small_filter, large_filter = ContentFilter(terms[:100]), ContentFilter(terms)
+        small = min(per_prompt(small_filter) for _ in range(3))
+        large = min(per_prompt(large_filter) for _ in range(3))
+        self.assertLess(
+            large, small * 3, f"{large * 1e6:.0f} us vs {small * 1e6:.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
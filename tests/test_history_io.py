@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from history_io import export_history, iter_history, tail_history
+from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+
+try:
+    import pyarrow  # noqa: F401
+
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+
+def make_entries(count):
+    for i in range(count):
+        yield {
+            "id": f"id{i}",
+            "parent_id": f"id{i - 1}" if i % 3 else None,
+            "positive": f"prompt number {i}, ünïcode",
+            "negative": "blurry",
+            "warnings": "",
+            "tags": ["a", str(i)],
+        }
+
+
+class TestHistoryIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def roundtrip(self, suffix):
+        path = os.path.join(self.tmpdir, f"history{suffix}")
+        written = export_history(make_entries(2500), path, chunk_size=300)
+
+        self.assertEqual(written, 2500)
+        self.assertEqual(list(iter_history(path)), list(make_entries(2500)))
+        self.assertEqual(
+            list(iter_history(path, columns=["positive"]))[7],
+            {"positive": "prompt number 7, ünïcode"},
+        )
+        self.assertEqual(tail_history(path, 450), list(make_entries(2500))[-450:])
+        self.assertEqual(
+            tail_history(path, 2, columns=["id"]), [{"id": "id2498"}, {"id": "id2499"}]
+        )
+        self.assertEqual(len(tail_history(path, 10_000)), 2500)
+
+    def test_jsonl_roundtrip(self):
+        self.roundtrip(".jsonl")
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow not installed")
+    def test_parquet_roundtrip(self):
+        self.roundtrip(".parquet")
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow not installed")
+    def test_arrow_roundtrip(self):
+        self.roundtrip(".arrow")
+
+    def test_unsupported_or_missing_dependency(self):
+        with self.assertRaises(ValueError):
+            export_history([], os.path.join(self.tmpdir, "history.csv"))
+        with patch.dict(sys.modules, {"pyarrow": None}):
+            with self.assertRaisesRegex(ValueError, "pyarrow is required"):
+                export_history([], os.path.join(self.tmpdir, "history.parquet"))
+
+    def test_node_import_reseeds_riff_and_dedupe(self):
+        path = os.path.join(self.tmpdir, "history.jsonl")
+        export_history(make_entries(500), path)
+        node = LMStudioPromptEnhancerNode()
+
+        self.assertEqual(node.import_history(path), node.deduplicator.capacity)
+        self.assertEqual(len(node.get_history()), node.HISTORY_LIMIT)
+        self.assertEqual(node.get_history()[-1]["id"], "id499")
+        self.assertEqual(node.last_generated_prompt, "prompt number 499, ünïcode")
+        self.assertEqual(node.deduplicator.check("prompt number 499, ünïcode"), 1.0)
+
+        out = os.path.join(self.tmpdir, "export.jsonl")
+        self.assertEqual(node.export_history(out), node.HISTORY_LIMIT)
+        self.assertEqual(list(iter_history(out)), node.get_history())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Subprocess environment with bytecode writing enabled, so the cache can be warmed.
+BYTECODE_ENV = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+
+BENCHMARKS = os.environ.get("LMSTUDIO_BENCHMARKS", "") == "1"
+
+# Cumulative import budget for the node module, in microseconds.
+IMPORT_BUDGET_US = 80_000
+
+# Optional-feature modules that are imported on first use, not with the node.
+DEFERRED_MODULES = (
+    "requests",
+    "history_io",
+    "png_provenance",
+    "prompt_fallback",
+    "riff_chain",
+    "sqlite3",
+    "tracemalloc",
+)
+
+# Imports the repository as a package the way ComfyUI loads a custom node.
+PACKAGE_IMPORT = f"""
+import builtins, importlib.util, json, sys
+opened = []
+real_open = builtins.open
+def tracking_open(file, *args, **kwargs):
+    opened.append(str(file))
+    return real_open(file, *args, **kwargs)
+builtins.open = tracking_open
+spec = importlib.util.spec_from_file_location(
+    "lmstudio_prompt_enhancer",
+    {os.path.join(ROOT, "__init__.py")!r},
+    submodule_search_locations=[{ROOT!r}],
+)
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+opened_on_import = list(opened)
+module.NODE_CLASS_MAPPINGS["LMStudioPromptEnhancer"].INPUT_TYPES()
+opened_on_define = opened[len(opened_on_import):]
+module.NODE_CLASS_MAPPINGS["LMStudioPromptEnhancer"].INPUT_TYPES()
+builtins.open = real_open
+print(json.dumps({{
+    "version": module.__version__,
+    "requests_loaded": "requests" in sys.modules,
+    "opened_on_import": opened_on_import,
+    "opened_on_define": opened_on_define,
+    "opened": opened,
+}}))
+"""
+
+
+class TestImportTime(unittest.TestCase):
+
+    def import_node(self):
+        """Return the -X importtime report of importing the node module."""
+        # Warm the bytecode cache so the measurement excludes compilation.
+        subprocess.run(
+            [sys.executable, "-c", "import LMStudioPromptEnhancerNode"],
+            cwd=ROOT,
+            env=BYTECODE_ENV,
+            check=True,
+        )
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                "import LMStudioPromptEnhancerNode",
+            ],
+            cwd=ROOT,
+            env=BYTECODE_ENV,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return [
+            [part.strip() for part in line.split("|")]
+            for line in result.stderr.splitlines()
+        ]
+
+    def test_optional_features_are_not_imported(self):
+        """Importing the node does not load requests or optional features."""
+        imported = {parts[-1] for parts in self.import_node()}
+        self.assertIn("LMStudioPromptEnhancerNode", imported)
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, imported)
+
+    @unittest.skipUnless(BENCHMARKS, "set LMSTUDIO_BENCHMARKS=1 to run")
+    def test_node_import_within_budget(self):
+        """Importing the node module stays within the absolute budget."""
+        cumulative = None
+        for parts in self.import_node():
+            if len(parts) == 3 and parts[2] == "LMStudioPromptEnhancerNode":
+                cumulative = int(parts[1])
+        self.assertIsNotNone(cumulative)
+        self.assertLess(cumulative, IMPORT_BUDGET_US)
+
+    def test_package_init_does_no_io(self):
+        """Loading the package opens no files or sockets.
+
+        Defining the node reads only the option catalogs, once per process.
+        """
+        result = subprocess.run(
+            [sys.executable, "-c", PACKAGE_IMPORT],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        info = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertFalse(info["requests_loaded"])
+        self.assertEqual(info["opened_on_import"], [])
+        catalog_dir = os.path.join(ROOT, "catalogs")
+        for path in info["opened_on_define"]:
+            self.assertTrue(path.startswith(catalog_dir), path)
+        self.assertEqual(info["opened"], info["opened_on_define"])
+        with open(os.path.join(ROOT, "package.json")) as f:
+            self.assertEqual(info["version"], json.load(f)["version"])
+
+
+if __name__ == "__main__":
+    unittest.main()
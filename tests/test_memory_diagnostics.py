@@ -0,0 +1,157 @@
+import gc
+import json
+import os
+import sys
+import threading
+import tracemalloc
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+from memory_diagnostics import MemoryProfiler, current_rss
+
+# Generations in the soak test; set LMSTUDIO_SOAK_ITERATIONS=100000 for a full soak
+SOAK_ITERATIONS = int(os.environ.get("LMSTUDIO_SOAK_ITERATIONS", "300"))
+
+# Memory the process may gain after warm-up, however long the soak runs
+RSS_GROWTH_LIMIT = 32 * 1024 * 1024
+OBJECT_GROWTH_LIMIT = 2000
+
+WORDS = (
+    "knight dragon castle storm neon forest ruin glacier desert harbor "
+    "lantern comet marble velvet copper orchid tundra canyon reef spire"
+).split()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion with a different prompt."""
+
+    counter = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubHandler.counter += 1
+        n = StubHandler.counter
+        words = [WORDS[(n * 7 + i * i * 13) % len(WORDS)] for i in range(40)]
+        content = f"prompt {n}: " + " ".join(words)
+        body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMemoryProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = MemoryProfiler(enabled=True, top=5, keep=3)
+        self.addCleanup(self.profiler.disable)
+
+    def test_reports_retained_allocations(self):
+        retained = []
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            with self.profiler.measure("grow"):
+                retained.extend(bytearray(1000) for _ in range(100))
+        report = self.profiler.reports()[-1]
+        self.assertEqual(report["label"], "grow")
+        self.assertGreater(report["size_diff"], 100_000)
+        self.assertGreaterEqual(report["peak"], report["size_diff"])
+        self.assertIn("test_memory_diagnostics.py", report["top"][0]["site"])
+        self.assertEqual(self.profiler.stats()["calls"], 1)
+
+    def test_reports_are_bounded_and_disable_stops_tracing(self):
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            for i in range(10):
+                with self.profiler.measure(f"call {i}"):
+                    pass
+        self.assertEqual(
+            [r["label"] for r in self.profiler.reports()],
+            ["call 7", "call 8", "call 9"],
+        )
+        self.profiler.disable()
+        self.assertFalse(tracemalloc.is_tracing())
+        with self.profiler.measure("off"):
+            pass
+        self.assertEqual(self.profiler.stats()["calls"], 10)
+
+    def test_current_rss(self):
+        self.assertGreater(current_rss(), 0)
+
+
+class TestNodeMemory(unittest.TestCase):
+
+    def run_node(self, node, endpoint, **params):
+        return node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a knight",
+            theme_b="a dragon",
+            blend_mode="Simple Mix",
+            creativity=0.7,
+            lmstudio_endpoint=endpoint,
+            refresh_models=False,
+            model_identifier="stub-model",
+            **params,
+        )
+
+    @patch("requests.post")
+    def test_generate_prompt_is_profiled(self, mock_post):
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"choices": [{"message": {"content": "a prompt"}}]}
+        mock_post.return_value = resp
+        profiler = MemoryProfiler(enabled=True)
+        self.addCleanup(profiler.disable)
+        node = LMStudioPromptEnhancerNode()
+        with patch.object(LMStudioPromptEnhancerNode, "memory_profiler", profiler):
+            self.run_node(
+                node, "http://localhost:1234/v1", riff_on_last_output=False, seed=1
+            )
+            stats = node.get_stats()["memory"]
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["last"]["label"], "generate_prompt")
+
+    def test_soak_memory_is_bounded(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        endpoint = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+        node = LMStudioPromptEnhancerNode()
+        warm_up = max(20, SOAK_ITERATIONS // 10)
+        half = (warm_up + SOAK_ITERATIONS) // 2
+
+        def soak(start, stop):
+            for i in range(start, stop):
+                positive, _, warnings, _, _ = self.run_node(
+                    node,
+                    endpoint,
+                    riff_on_last_output=i % 3 == 0,
+                    seed=i,
+                    dedupe_threshold=0.9 if i % 2 else 0.0,
+                )
+                self.assertTrue(positive.startswith("prompt"), warnings)
+
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            soak(0, warm_up)
+            rss = current_rss()
+            soak(warm_up, half)
+            gc.collect()
+            objects = len(gc.get_objects())
+            soak(half, SOAK_ITERATIONS)
+        gc.collect()
+        self.assertLess(len(gc.get_objects()) - objects, OBJECT_GROWTH_LIMIT)
+        self.assertLess(current_rss() - rss, RSS_GROWTH_LIMIT)
+        self.assertLessEqual(len(node.get_history()), node.HISTORY_LIMIT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from model_warmup import FAILED, READY, ModelWarmup, lmstudio_base_url
+
+ENDPOINT = "http://localhost:1234/v1/chat/completions"
+
+
+class TestModelWarmup(unittest.TestCase):
+
+    def test_base_url(self):
+        self.assertEqual(lmstudio_base_url(ENDPOINT), "http://localhost:1234")
+
+    @patch("requests.post")
+    @patch("requests.get")
+    def test_loaded_model_is_ready_without_completion(self, mock_get, mock_post):
+        """A model LM Studio reports as loaded is ready without a warm-up call."""
+        mock_get.return_value = MagicMock(ok=True)
+        mock_get.return_value.json.return_value = {"state": "loaded"}
+
+        warmup = ModelWarmup()
+        warmup.ensure(ENDPOINT, "org/model")
+        self.assertTrue(warmup.wait_until_ready(ENDPOINT, "org/model", timeout=5))
+        self.assertIn("/api/v0/models/org%2Fmodel", mock_get.call_args[0][0])
+        mock_post.assert_not_called()
+
+    @patch("requests.post")
+    @patch("requests.get")
+    def test_cold_model_loaded_with_one_token_completion(self, mock_get, mock_post):
+        """A model that is not loaded gets a cheap completion to trigger loading."""
+        mock_get.return_value = MagicMock(ok=True)
+        mock_get.return_value.json.return_value = {"state": "not-loaded"}
+        release = threading.Event()
+
+        def slow_load(*args, **kwargs):
+            release.wait(5)
+            return MagicMock(status_code=200)
+
+        mock_post.side_effect = slow_load
+
+        warmup = ModelWarmup()
+        warmup.ensure(ENDPOINT, "m")
+        warmup.ensure(ENDPOINT, "m")  # already loading; no second warm-up
+        self.assertFalse(warmup.wait_until_ready(ENDPOINT, "m", timeout=0.05))
+        release.set()
+        self.assertTrue(warmup.wait_until_ready(ENDPOINT, "m", timeout=5))
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args[1]["json"]["max_tokens"], 1)
+        self.assertEqual(warmup.state(ENDPOINT, "m"), READY)
+
+    @patch("requests.post")
+    @patch("requests.get")
+    def test_failed_warmup_is_reported_and_retried(self, mock_get, mock_post):
+        from requests.exceptions import ConnectionError
+
+        mock_get.side_effect = ConnectionError("down")
+        mock_post.side_effect = ConnectionError("down")
+
+        warmup = ModelWarmup()
+        warmup.ensure(ENDPOINT, "m")
+        self.assertFalse(warmup.wait_until_ready(ENDPOINT, "m", timeout=5))
+        self.assertEqual(warmup.state(ENDPOINT, "m"), FAILED)
+        self.assertIn("down", warmup.last_error(ENDPOINT, "m"))
+
+        warmup.ensure(ENDPOINT, "m")
+        warmup.wait_until_ready(ENDPOINT, "m", timeout=5)
+        self.assertEqual(mock_post.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
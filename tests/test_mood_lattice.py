@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mood_lattice import (
+    MAX_LEVEL,
+    MAX_TIER,
+    TIERS,
+    _cell_phrase,
+    _level_for,
+    mood_descriptors,
+    mood_level,
+    mood_tier,
+)
+
+
+class TestMoodLattice(unittest.TestCase):
+
+    def test_neutral_band_has_no_moods(self):
+        """Values within +/-1.0 produce no mood text, as before."""
+        self.assertEqual(mood_descriptors(0.0, 1.0, -1.0), "")
+
+    def test_intensity_is_monotonic(self):
+        """Tier magnitude never decreases as a slider moves away from zero."""
+        values = [i / 10 for i in range(0, 101)]
+        positive = [mood_tier(v) for v in values]
+        negative = [mood_tier(-v) for v in values]
+        self.assertEqual(positive, sorted(positive))
+        self.assertEqual(negative, sorted(negative, reverse=True))
+        self.assertEqual(positive[-1], MAX_TIER)
+        self.assertEqual(negative[-1], -MAX_TIER)
+
+    def test_levels_interpolate_between_tiers(self):
+        """Past the middle of a tier's range the text leans toward the next tier."""
+        values = [i / 10 for i in range(0, 101)]
+        levels = [mood_level(v) for v in values]
+        self.assertEqual(levels, sorted(levels))
+        self.assertEqual(levels[-1], MAX_LEVEL)
+        self.assertEqual([mood_level(-v) for v in values], [-lv for lv in levels])
+        # Every half step between neutral and the top tier is reachable
+        self.assertEqual(sorted(set(levels)), [0, *range(2, MAX_LEVEL + 1)])
+        self.assertEqual(
+            mood_descriptors(0, 4.5, 0), "chaotic verging on wildly chaotic"
+        )
+        self.assertEqual(mood_descriptors(0, 4.0, 0), "chaotic")
+        self.assertEqual(mood_descriptors(0, 9.5, 0), TIERS["chaotic"][-1])
+
+    def test_tiers_select_graded_descriptors(self):
+        """Each slider range maps to its graded descriptor."""
+        self.assertEqual(mood_descriptors(2.0, 0, 0), "slightly futuristic")
+        self.assertEqual(mood_descriptors(-4.0, 0, 0), "ancient")
+        self.assertEqual(mood_descriptors(0, 10.0, 0), TIERS["chaotic"][-1])
+
+    def test_combined_axis_phrases(self):
+        """Two strong poles add a combined phrase."""
+        moods = mood_descriptors(7.0, 0.0, 9.0)
+        self.assertIn("highly futuristic", moods)
+        self.assertIn("fully machine-like", moods)
+        self.assertIn("cybernetic", moods)
+
+    def test_out_of_range_values_are_clamped(self):
+        self.assertEqual(mood_tier(25.0), MAX_TIER)
+        self.assertEqual(mood_tier(-25.0), -MAX_TIER)
+
+    def test_lattice_is_built_on_first_lookup(self):
+        """Importing the module does not precompute the lattice."""
+        script = (
+            "import mood_lattice as m\n"
+            "print(m._lattice.cache_info().currsize)\n"
+            "m.mood_descriptors(5, 5, 5)\n"
+            "print(m._lattice.cache_info().currsize)\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        self.assertEqual(out.split(), ["0", "1"])
+
+    def test_lookup_micro_benchmark(self):
+        """A lattice lookup is faster than building the mood phrase directly."""
+        values = [(-10 + (i % 201) / 10) for i in range(20_000)]
+
+        def direct(a, b, c):
+            return _cell_phrase([_level_for(v) for v in (a, b, c)])
+
+        def timed(fn):
+            start = time.perf_counter()
+            for value in values:
+                fn(value, -value, value / 2)
+            return time.perf_counter() - start
+
+        for value in values[:201]:
+            # Slider values lie on the table's 0.1 grid
+            half = round(value / 2, 1)
+            self.assertEqual(
+                mood_descriptors(value, -value, half), direct(value, -value, half)
+            )
+        lookup = min(timed(mood_descriptors) for _ in range(3))
+        baseline = min(timed(direct) for _ in range(3))
+        self.assertLess(lookup, baseline, f"{lookup:.4f}s vs {baseline:.4f}s")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
+import json
 import os
+import random
 import sys
 import tempfile
 import unittest
@@ -8,7 +10,10 @@ from unittest.mock import MagicMock, patch
 # Add the parent directory to the system path to allow imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from circuit_breaker import CircuitBreaker
 from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+from request_scheduler import RequestScheduler
+from state_store import get_shared_state_store
 
 
 class TestLMStudioPromptEnhancerNode(unittest.TestCase):
@@ -69,11 +74,8 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         self.assertNotIn("Moods", user_message)
 
     @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
-    @patch("random.sample")
     @patch("requests.post")
-    def test_advanced_mode_uses_features(
-        self, mock_post, mock_random_sample, mock_get_models
-    ):
+    def test_advanced_mode_uses_features(self, mock_post, mock_get_models):
         """Test that advanced features are used when enable_advanced_options is True."""
         mock_get_models.return_value = ["fake-model"]
         mock_response = MagicMock()
@@ -82,7 +84,6 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
             "choices": [{"message": {"content": "prompt"}}]
         }
         mock_post.return_value = mock_response
-        mock_random_sample.return_value = ["holographic"]
 
         params = self.optional_params.copy()
         params["chaos"] = 5.0
@@ -102,9 +103,13 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
             **params,
         )
 
+        expected = LMStudioPromptEnhancerNode.get_sampler().sample(
+            random.Random(123), chaos=5.0
+        )
         user_message = mock_post.call_args[1]["json"]["messages"][1]["content"]
-        self.assertIn("Wildcards: holographic", user_message)
-        self.assertIn("Moods: futuristic", user_message)
+        self.assertEqual(len(expected.chaos_wildcards), 2)
+        self.assertIn(f"Wildcards: {', '.join(expected.chaos_wildcards)}", user_message)
+        self.assertIn("Moods: hyper-futuristic", user_message)
 
     @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
     @patch("requests.post")
@@ -115,7 +120,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
 
         mock_post.side_effect = RequestException("Test connection error")
 
-        positive_prompt, _, warnings, _ = self.node.generate_prompt(
+        positive_prompt, _, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=False,
             theme_a="test",
             theme_b="",
@@ -131,9 +136,11 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         self.assertIn("API Error: Could not connect to LM Studio", positive_prompt)
         self.assertIn("API Error: Could not connect to LM Studio", warnings)
 
-    def test_input_types_default_models(self):
-        """Ensure INPUT_TYPES fetches models at UI load time and populates dropdown."""
+    @patch("requests.get")
+    def test_input_types_default_models(self, mock_get):
+        """Ensure INPUT_TYPES populates the dropdown without probing LM Studio."""
         types = LMStudioPromptEnhancerNode.INPUT_TYPES()
+        mock_get.assert_not_called()
         model_options = types["required"]["model_identifier"][0]
         self.assertIsInstance(model_options, list)
         # Should contain either actual models or fallback message
@@ -200,7 +207,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         }
         mock_post.return_value = mock_response
 
-        positive, negative, warnings, _ = self.node.generate_prompt(
+        positive, negative, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=False,
             theme_a="a",
             theme_b="b",
@@ -228,7 +235,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         mock_response.json.return_value = {}  # missing choices
         mock_post.return_value = mock_response
 
-        positive_prompt, _, warnings, _ = self.node.generate_prompt(
+        positive_prompt, _, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=False,
             theme_a="test",
             theme_b="",
@@ -256,7 +263,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         mock_response.json.side_effect = ValueError("No JSON")
         mock_post.return_value = mock_response
 
-        positive_prompt, _, warnings, _ = self.node.generate_prompt(
+        positive_prompt, _, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=False,
             theme_a="test",
             theme_b="",
@@ -322,7 +329,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         params["action_pose"] = "ass_on_heels"
         params["prompt_tone"] = "SFW"
 
-        positive, negative, warnings, _ = self.node.generate_prompt(
+        positive, negative, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=True,
             theme_a="a",
             theme_b="b",
@@ -357,7 +364,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         params["action_pose"] = "ass_on_heels"
         params["prompt_tone"] = "NSFW"
 
-        positive, negative, warnings, _ = self.node.generate_prompt(
+        positive, negative, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=True,
             theme_a="a",
             theme_b="b",
@@ -477,7 +484,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         (tmpdir / "materials.txt").write_text("steel\n", encoding="utf-8")
         self.node.wildcard_dir = tmpdir
 
-        _, _, warnings, _ = self.node.generate_prompt(
+        _, _, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=False,
             theme_a="__materials__",
             theme_b="b",
@@ -510,7 +517,7 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
 
         self.node.wildcard_dir = Path(tempfile.mkdtemp())
 
-        _, _, warnings, _ = self.node.generate_prompt(
+        _, _, warnings, _, _ = self.node.generate_prompt(
             enable_advanced_options=False,
             theme_a="__missing__",
             theme_b="b",
@@ -528,6 +535,801 @@ class TestLMStudioPromptEnhancerNode(unittest.TestCase):
         self.assertIn("__missing__", user_message)
         self.assertIn("Wildcard __missing__ not found or empty.", warnings)
 
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_dedupe_retries_near_duplicate_with_bumped_seed(
+        self, mock_post, mock_get_models
+    ):
+        """Near-duplicate completions are re-requested with seed+1 and reported."""
+        mock_get_models.return_value = ["fake-model"]
+        responses = []
+        for content in ["same prompt", "same prompt", "a different prompt"]:
+            resp = MagicMock(status_code=200)
+            resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+            responses.append(resp)
+        mock_post.side_effect = responses
+
+        params = self.optional_params.copy()
+        params["dedupe_threshold"] = 0.9
+        params["dedupe_retries"] = 1
+
+        for _ in range(2):
+            positive, _, warnings, _, _ = self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=False,
+                creativity=0.7,
+                seed=5,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                **params,
+            )
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(mock_post.call_args[1]["json"]["seed"], 6)
+        self.assertTrue(positive.startswith("a different prompt"))
+        self.assertIn("similarity 1.00", warnings)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_prefetch_serves_buffered_prompt(self, mock_post, mock_get_models):
+        """With prefetch_depth set, the next run is served from the background buffer."""
+        mock_get_models.return_value = ["fake-model"]
+        responses = []
+        for content in ["sync prompt", "prefetched prompt", "refill prompt"]:
+            resp = MagicMock(status_code=200)
+            resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+            responses.append(resp)
+        mock_post.side_effect = responses
+
+        params = self.optional_params.copy()
+        params["prefetch_depth"] = 1
+
+        results = []
+        for seed in range(2):
+            positive, _, _, _, _ = self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=False,
+                creativity=0.7,
+                seed=seed,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                **params,
+            )
+            self.node.prefetcher.join(timeout=5)
+            results.append(positive)
+
+        self.assertTrue(results[0].startswith("sync prompt"))
+        self.assertTrue(results[1].startswith("prefetched prompt"))
+        # Each prompt was requested with the seed of the run it is served to
+        seeds = [call[1]["json"]["seed"] for call in mock_post.call_args_list]
+        self.assertEqual(seeds, [0, 1, 2])
+        self.assertEqual(self.node.get_provenance()["seed"], 1)
+        stats = self.node.get_stats()["prefetch"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["queue_depth"], 1)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_state_namespace_shares_riff_state_between_instances(
+        self, mock_post, mock_get_models
+    ):
+        """Nodes using the same state_namespace share last prompt and history."""
+        mock_get_models.return_value = ["fake-model"]
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "choices": [{"message": {"content": "shared prompt"}}]
+        }
+        mock_post.return_value = mock_response
+
+        params = self.optional_params.copy()
+        params["state_namespace"] = "test-shared-namespace"
+        other = LMStudioPromptEnhancerNode()
+        self.addCleanup(get_shared_state_store().clear, "test-shared-namespace")
+
+        self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+        other.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=True,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        user_message = mock_post.call_args[1]["json"]["messages"][1]["content"]
+        self.assertIn('The previous prompt was: "shared prompt"', user_message)
+        self.assertEqual(len(other.get_history()), 2)
+        self.assertEqual(self.node.get_history(), other.get_history())
+        self.assertEqual(LMStudioPromptEnhancerNode().get_history(), [])
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_same_seed_reproduces_random_choices(self, mock_post, mock_get_models):
+        """Chaos, wildcard and random option picks are identical for the same seed."""
+        mock_get_models.return_value = ["fake-model"]
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "choices": [{"message": {"content": "prompt"}}]
+        }
+        mock_post.return_value = mock_response
+
+        params = self.optional_params.copy()
+        params.update(
+            subject="People",
+            action_pose="random",
+            emotion_expression="random",
+            lighting="random",
+            framing="random",
+            wildcard_1="materials",
+            chaos=10.0,
+        )
+
+        messages = []
+        for seed in (42, 42, 43):
+            self.node.generate_prompt(
+                enable_advanced_options=True,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=False,
+                creativity=0.7,
+                seed=seed,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                **params,
+            )
+            messages.append(mock_post.call_args[1]["json"]["messages"][1]["content"])
+
+        self.assertEqual(messages[0], messages[1])
+        self.assertNotEqual(messages[0], messages[2])
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_semantic_cache_skips_llm_for_trivial_theme_change(
+        self, mock_post, mock_get_models
+    ):
+        """A theme differing only in whitespace/case reuses the cached completion."""
+        mock_get_models.return_value = ["fake-model"]
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "choices": [{"message": {"content": "cached knight"}}]
+        }
+        mock_post.return_value = mock_response
+
+        params = self.optional_params.copy()
+        params["semantic_cache_threshold"] = 0.9
+
+        results = []
+        for theme in ("a knight", "A knight "):
+            results.append(
+                self.node.generate_prompt(
+                    enable_advanced_options=False,
+                    theme_a=theme,
+                    theme_b="a dragon",
+                    blend_mode="Simple Mix",
+                    riff_on_last_output=False,
+                    creativity=0.7,
+                    seed=3,
+                    lmstudio_endpoint="http://f",
+                    refresh_models=False,
+                    model_identifier="fake-model",
+                    **params,
+                )
+            )
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(results[0][0], results[1][0])
+        self.assertIn("cached completion", results[1][2])
+        self.assertEqual(self.node.get_stats()["semantic_cache"]["hits"], 1)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.get")
+    @patch("requests.post")
+    def test_warm_up_model_waits_for_load(self, mock_post, mock_get, mock_get_models):
+        """With warm_up_model, generation runs after the model reports ready."""
+        from model_warmup import ModelWarmup
+
+        mock_get_models.return_value = ["fake-model"]
+        mock_get.return_value = MagicMock(ok=True)
+        mock_get.return_value.json.return_value = {"state": "loaded"}
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "choices": [{"message": {"content": "prompt"}}]
+        }
+        mock_post.return_value = mock_response
+        self.node.model_warmup = ModelWarmup()
+
+        params = self.optional_params.copy()
+        params["warm_up_model"] = True
+
+        _, _, warnings, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f/v1/chat/completions",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        mock_get.assert_called_once()
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(warnings, "")
+        self.assertEqual(
+            self.node.model_warmup.state("http://f/v1/chat/completions", "fake-model"),
+            "ready",
+        )
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_structured_output_single_call(self, mock_post, mock_get_models):
+        """Structured output returns positive, negative and tags from one request."""
+        mock_get_models.return_value = ["fake-model"]
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "choices": [
+                {
+                    "message": {
+                        "content": '{"positive": "a knight", "negative": "blurry", '
+                        '"tags": ["knight", "dragon"]}'
+                    }
+                }
+            ]
+        }
+        mock_post.return_value = mock_response
+
+        params = self.optional_params.copy()
+        params["structured_output"] = True
+        params["generate_negative_prompt"] = True
+        params["negative_prompt"] = "lowres"
+
+        positive, negative, warnings, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        self.assertEqual(mock_post.call_count, 1)
+        payload = mock_post.call_args[1]["json"]
+        self.assertEqual(payload["response_format"]["type"], "json_schema")
+        self.assertTrue(positive.startswith("a knight"))
+        self.assertEqual(negative, "lowres, blurry")
+        self.assertEqual(self.node.last_generated_prompt, "a knight")
+        self.assertEqual(self.node.get_history()[-1]["tags"], ["knight", "dragon"])
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_structured_output_falls_back_when_schema_ignored(
+        self, mock_post, mock_get_models
+    ):
+        """Plain-text replies are used as the positive prompt; negative is requested separately."""
+        mock_get_models.return_value = ["fake-model"]
+        responses = []
+        for content in ["a plain prompt", "a plain negative"]:
+            resp = MagicMock(status_code=200)
+            resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+            responses.append(resp)
+        mock_post.side_effect = responses
+
+        params = self.optional_params.copy()
+        params["structured_output"] = True
+        params["generate_negative_prompt"] = True
+
+        positive, negative, _, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertTrue(positive.startswith("a plain prompt"))
+        self.assertEqual(negative, "a plain negative")
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_riff_chain_records_lineage(self, mock_post, mock_get_models):
+        """A depth-2, branching-2 chain riffs each variation on its parent."""
+        mock_get_models.return_value = ["fake-model"]
+
+        def respond(url, headers=None, json=None, timeout=None):
+            resp = MagicMock(status_code=200)
+            content = f"variation {json['seed']}"
+            resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+            return resp
+
+        mock_post.side_effect = respond
+        self.node.last_generated_prompt = "root prompt"
+        self.node._record_history("root prompt", "", "")
+        root_id = self.node.get_history()[-1]["id"]
+
+        params = self.optional_params.copy()
+        params.update(riff_depth=2, riff_branching=2)
+        positive, _, _, gallery, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=True,
+            creativity=0.7,
+            seed=100,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        # 2 children + 4 grandchildren, seeded by their position in the tree
+        self.assertEqual(mock_post.call_count, 6)
+        chain = self.node.get_riff_chain()
+        self.assertEqual([entry["depth"] for entry in chain], [1, 1, 2, 2, 2, 2])
+        ids = {entry["id"]: entry for entry in chain}
+        for entry in chain:
+            if entry["depth"] == 1:
+                self.assertEqual(entry["parent_id"], root_id)
+            else:
+                self.assertEqual(ids[entry["parent_id"]]["depth"], 1)
+        for call in mock_post.call_args_list:
+            payload = call.kwargs["json"]
+            if payload["seed"] >= 103:
+                parent_seed = 100 + (payload["seed"] - 101) // 2
+                self.assertIn(
+                    f"variation {parent_seed}", payload["messages"][1]["content"]
+                )
+
+        self.assertTrue(positive.startswith("variation 103"))
+        self.assertEqual(self.node.last_generated_prompt, "variation 103")
+        history = self.node.get_history()
+        self.assertEqual(len(history), 7)
+        self.assertEqual(history[-1]["id"], chain[2]["id"])
+        self.assertEqual(history[-1]["parent_id"], chain[0]["id"])
+        self.assertIn("(riff of Prompt 1)", gallery)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_riff_chain_drops_duplicates(self, mock_post, mock_get_models):
+        """Near-duplicate variations are dropped and not expanded."""
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {
+            "choices": [{"message": {"content": "the same riff every time"}}]
+        }
+        mock_post.return_value = resp
+        self.node.last_generated_prompt = "root prompt"
+
+        params = self.optional_params.copy()
+        params.update(riff_depth=3, riff_branching=2, dedupe_threshold=0.9)
+        positive, _, warnings, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=True,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        # Only the first child survives; it has two (duplicate) children
+        self.assertEqual(len(self.node.get_riff_chain()), 1)
+        self.assertEqual(mock_post.call_count, 4)
+        self.assertEqual(warnings.count("Dropped near-duplicate riff"), 3)
+        self.assertTrue(positive.startswith("the same riff every time"))
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_riff_chain_all_duplicates_returns_previous(
+        self, mock_post, mock_get_models
+    ):
+        """A chain whose variations are all rejected returns the last prompt."""
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {
+            "choices": [{"message": {"content": "the same prompt every time"}}]
+        }
+        mock_post.return_value = resp
+
+        def run(riff, **extra):
+            params = dict(self.optional_params, **extra)
+            return self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=riff,
+                creativity=0.7,
+                seed=0,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                **params,
+            )
+
+        first = run(False)[0]
+        positive, _, warnings, _, _ = run(True, riff_depth=2, dedupe_threshold=0.9)
+
+        self.assertEqual(positive, first)
+        self.assertIn("Every riff variation was a near-duplicate", warnings)
+        self.assertNotIn("API Error", positive)
+        self.assertEqual(self.node.get_riff_chain(), [])
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_sfw_output_filter_redacts_blocked_terms(self, mock_post, mock_get_models):
+        """In SFW tone blocked terms are removed from the output and reported."""
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {
+            "choices": [{"message": {"content": "a knight, NUD3, marble hall"}}]
+        }
+        mock_post.return_value = resp
+
+        positive, _, warnings, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **self.optional_params,
+        )
+
+        self.assertTrue(positive.startswith("a knight, marble hall"))
+        self.assertIn(
+            "SFW filter removed blocked term(s) from the prompt: nude", warnings
+        )
+        self.assertEqual(self.node.last_generated_prompt, "a knight, marble hall")
+
+        params = dict(self.optional_params, prompt_tone="NSFW")
+        positive, _, warnings, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+        self.assertIn("NUD3", positive)
+        self.assertEqual(warnings, "")
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_sfw_output_filter_regenerates(self, mock_post, mock_get_models):
+        """In regenerate mode a flagged prompt is re-requested with a bumped seed."""
+        mock_get_models.return_value = ["fake-model"]
+        responses = []
+        for content in ["a topless knight", "an armored knight"]:
+            resp = MagicMock(status_code=200)
+            resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+            responses.append(resp)
+        mock_post.side_effect = responses
+
+        params = dict(self.optional_params, sfw_output_filter="regenerate")
+        positive, _, warnings, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=5,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(mock_post.call_args[1]["json"]["seed"], 6)
+        self.assertTrue(positive.startswith("an armored knight"))
+        self.assertIn("regenerating with seed 6", warnings)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_tag_list_output_cleans_pony_tags(self, mock_post, mock_get_models):
+        """Tag-list mode merges, dedupes, orders and weights the Pony tags."""
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {
+            "choices": [
+                {"message": {"content": "Dragon, castle, score_9, dragon, (neon:1.2)"}}
+            ]
+        }
+        mock_post.return_value = resp
+
+        params = dict(
+            self.optional_params,
+            target_model="Pony",
+            style_preset="Anime",
+            tag_list_output=True,
+            tag_emphasis="castle:1.3",
+        )
+        positive, _, _, _, _ = self.node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="a",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **params,
+        )
+        self.assertEqual(
+            positive,
+            "score_9, score_8_up, score_7_up, source_anime, Dragon, "
+            "(castle:1.3), (neon:1.2)",
+        )
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_requests_go_through_scheduler(self, mock_post, mock_get_models):
+        """Every request takes a scheduler slot under the node's client name."""
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"choices": [{"message": {"content": "a knight"}}]}
+        mock_post.return_value = resp
+
+        with patch.object(
+            LMStudioPromptEnhancerNode, "request_scheduler", RequestScheduler()
+        ):
+            self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=False,
+                creativity=0.7,
+                seed=0,
+                lmstudio_endpoint="http://studio:1234/v1/chat/completions",
+                refresh_models=False,
+                model_identifier="fake-model",
+                generate_negative_prompt=True,
+                scheduler_client="alice",
+                **self.optional_params,
+            )
+            stats = self.node.get_stats()["scheduler"]["http://studio:1234"]
+
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["clients"]["alice"]["requests"], 2)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_speculative_riff_serves_next_riff(self, mock_post, mock_get_models):
+        """The riff for seed+1 is requested in the background and reused."""
+        mock_get_models.return_value = ["fake-model"]
+
+        def respond(*args, **kwargs):
+            payload = kwargs["json"]
+            kind = "riff" if "previous prompt" in str(payload["messages"]) else "base"
+            resp = MagicMock(status_code=200)
+            resp.json.return_value = {
+                "choices": [{"message": {"content": f"{kind} {payload['seed']}"}}]
+            }
+            return resp
+
+        mock_post.side_effect = respond
+
+        def run(riff, seed):
+            return self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=riff,
+                creativity=0.7,
+                seed=seed,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                speculative_riff=True,
+                **self.optional_params,
+            )[0]
+
+        self.assertTrue(run(False, 5).startswith("base 5"))
+        self.node.riff_speculator.join(5)
+        self.assertEqual(mock_post.call_count, 2)
+
+        self.assertTrue(run(True, 6).startswith("riff 6"))
+        self.node.riff_speculator.join(5)
+        # Served from the speculation; the only new request is the next one
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(mock_post.call_args[1]["json"]["seed"], 7)
+
+        self.assertTrue(run(True, 9).startswith("riff 9"))
+        self.node.riff_speculator.join(5)
+        stats = self.node.get_stats()["speculative_riff"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_is_changed_hashes_inputs_and_wildcard_files(self):
+        """IS_CHANGED is stable for equal inputs and NaN when state matters."""
+        tmpdir = Path(tempfile.mkdtemp())
+        wildcard = tmpdir / "materials.txt"
+        wildcard.write_text("steel\n", encoding="utf-8")
+        inputs = dict(
+            enable_advanced_options=False,
+            theme_a="__materials__",
+            theme_b="b",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=0,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            **self.optional_params,
+        )
+        breaker = CircuitBreaker()
+        with (
+            patch.object(LMStudioPromptEnhancerNode, "WILDCARD_DIR", tmpdir),
+            patch.object(LMStudioPromptEnhancerNode, "circuit_breaker", breaker),
+        ):
+            is_changed = LMStudioPromptEnhancerNode.IS_CHANGED
+            first = is_changed(**inputs)
+            self.assertEqual(is_changed(**inputs), first)
+            self.assertNotEqual(is_changed(**dict(inputs, seed=1)), first)
+
+            wildcard.write_text("steel\nbrass\n", encoding="utf-8")
+            edited = is_changed(**inputs)
+            self.assertNotEqual(edited, first)
+            self.assertEqual(is_changed(**inputs), edited)
+
+            for name in ("riff_on_last_output", "refresh_models"):
+                value = is_changed(**dict(inputs, **{name: True}))
+                self.assertNotEqual(value, value)
+
+            breaker.record_failure("http://f")
+            value = is_changed(**inputs)
+            self.assertNotEqual(value, value)
+            breaker.record_success("http://f")
+            self.assertEqual(is_changed(**inputs), edited)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_abandoned_speculative_riff_is_not_sent(self, mock_post, mock_get_models):
+        """A speculation still queued for an idle server is cancelled, not sent."""
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"choices": [{"message": {"content": "a prompt"}}]}
+        mock_post.return_value = resp
+        scheduler = RequestScheduler()
+        self.addCleanup(self.node.riff_speculator.join, 5)
+
+        def run(riff, seed):
+            return self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=riff,
+                creativity=0.7,
+                seed=seed,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                speculative_riff=True,
+                **self.optional_params,
+            )
+
+        with patch.object(LMStudioPromptEnhancerNode, "request_scheduler", scheduler):
+            # Another client keeps the server busy, so the speculation queues
+            with scheduler.slot("http://f", "other"):
+                run(False, 5)
+                self.assertEqual(scheduler.stats()["http://f"]["idle_queued"], 1)
+                # The next run riffs with another seed; the speculation is moot
+                run(True, 9)
+            self.node.riff_speculator.join(5)
+
+        # Seed 6 was the abandoned speculation; seed 10 is the next run's
+        sent_seeds = [call[1]["json"]["seed"] for call in mock_post.call_args_list]
+        self.assertEqual(sent_seeds, [5, 9, 10])
+        self.assertEqual(self.node.get_stats()["speculative_riff"]["cancelled"], 1)
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_structured_dedupe_compares_positive_prompts(
+        self, mock_post, mock_get_models
+    ):
+        """The shared JSON skeleton of structured replies is not deduplicated on."""
+        mock_get_models.return_value = ["fake-model"]
+
+        def bundle(positive):
+            resp = MagicMock(status_code=200)
+            content = json.dumps(
+                {
+                    "positive": positive,
+                    "negative": "blurry, low quality, watermark, jpeg artifacts, "
+                    "deformed hands, extra limbs",
+                    "tags": ["portrait", "dramatic lighting", "high detail"],
+                }
+            )
+            resp.json.return_value = {"choices": [{"message": {"content": content}}]}
+            return resp
+
+        mock_post.side_effect = [
+            bundle("a red fox in snow"),
+            bundle("an old lighthouse at night"),
+        ]
+        params = dict(self.optional_params, structured_output=True)
+        params.update(dedupe_threshold=0.7, dedupe_retries=1)
+        for seed in (0, 1):
+            positive, _, warnings, _, _ = self.node.generate_prompt(
+                enable_advanced_options=False,
+                theme_a="a",
+                theme_b="b",
+                blend_mode="Simple Mix",
+                riff_on_last_output=False,
+                creativity=0.7,
+                seed=seed,
+                lmstudio_endpoint="http://f",
+                refresh_models=False,
+                model_identifier="fake-model",
+                **params,
+            )
+
+        self.assertTrue(positive.startswith("an old lighthouse at night"))
+        self.assertNotIn("near-duplicate", warnings)
+        self.assertEqual(mock_post.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
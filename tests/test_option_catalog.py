@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from option_catalog import (
+    BUNDLED_CATALOG_DIR,
+    OPTION_CATALOGS,
+    CatalogRegistry,
+    OptionCatalog,
+    parse_catalog,
+)
+
+
+class TestOptionCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = self.dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+        return path
+
+    def test_parse_json_and_txt(self):
+        json_path = self.write(
+            "pose.json",
+            json.dumps(
+                {
+                    "version": 1,
+                    "entries": [
+                        "standing",
+                        {"value": "straddling", "explicit": True, "models": ["Pony"]},
+                    ],
+                }
+            ),
+        )
+        entries = parse_catalog(json_path)
+        self.assertEqual([e.value for e in entries], ["standing", "straddling"])
+        self.assertTrue(entries[1].explicit)
+        self.assertEqual(entries[1].models, frozenset({"Pony"}))
+
+        txt_path = self.write(
+            "light.txt", "# comment\nsoft\n\nneon | subject:People, model:Flux\n"
+        )
+        entries = parse_catalog(txt_path)
+        self.assertEqual([e.value for e in entries], ["soft", "neon"])
+        self.assertEqual(entries[1].subjects, frozenset({"People"}))
+
+    def test_rejects_unknown_version(self):
+        path = self.write("pose.json", json.dumps({"version": 99, "entries": []}))
+        with self.assertRaises(ValueError):
+            parse_catalog(path)
+
+    def test_allowed_filters_by_tone_subject_and_model(self):
+        catalog = OptionCatalog(
+            parse_catalog(
+                self.write(
+                    "pose.txt",
+                    "standing\nkneeling | subject:People\n"
+                    "straddling | explicit, subject:People\nwaving | model:Flux\n",
+                )
+            )
+        )
+        self.assertEqual(
+            catalog.allowed(), ("standing", "kneeling", "straddling", "waving")
+        )
+        self.assertEqual(
+            catalog.allowed(sfw=True, subject="People"),
+            ("standing", "kneeling", "waving"),
+        )
+        self.assertEqual(catalog.allowed(subject="Generic"), ("standing", "waving"))
+        self.assertEqual(
+            catalog.allowed(model="Pony"), ("standing", "kneeling", "straddling")
+        )
+        self.assertIs(catalog.allowed(sfw=True), catalog.allowed(sfw=True))
+
+    def test_large_catalog_lookup(self):
+        """Filtered views of big catalogs are computed once and then reused."""
+        values = [f"pose {i}" for i in range(5000)]
+        catalog = OptionCatalog.from_values(values, explicit=values[::2])
+        self.assertEqual(len(catalog.allowed(sfw=True)), 2500)
+        self.assertIs(catalog.allowed(sfw=True), catalog.allowed(sfw=True))
+
+        def per_call(runs, uncached):
+            started = time.perf_counter()
+            for _ in range(runs):
+                if uncached:
+                    catalog._views.clear()
+                catalog.allowed(sfw=True)
+            return (time.perf_counter() - started) / runs
+
+        cached = min(per_call(1000, False) for _ in range(3))
+        uncached = min(per_call(20, True) for _ in range(3))
+        self.assertLess(cached * 10, uncached, f"{cached:.2e}s vs {uncached:.2e}s")
+
+    def test_registry_overrides_and_hot_reload(self):
+        user_dir = self.dir / "user"
+        self.write("bundled/lighting.txt", "soft\n")
+        self.write("bundled/wildcards/materials.txt", "steel\nglass\n")
+        registry = CatalogRegistry([self.dir / "bundled", user_dir], reload_interval=0)
+        self.assertEqual(registry.option("lighting").values, ("soft",))
+        self.assertEqual(registry.wildcards()["materials"].values, ("steel", "glass"))
+        generation = registry.generation
+
+        path = self.write("user/lighting.json", '{"version": 1, "entries": ["neon"]}')
+        self.assertEqual(registry.option("lighting").values, ("neon",))
+        self.assertGreater(registry.generation, generation)
+
+        path.write_text('{"version": 1, "entries": ["neon", "moody"]}')
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertEqual(registry.option("lighting").values, ("neon", "moody"))
+        self.assertEqual(len(registry.option("missing")), 0)
+
+    def test_bundled_catalogs(self):
+        registry = CatalogRegistry([BUNDLED_CATALOG_DIR])
+        for name in OPTION_CATALOGS:
+            self.assertGreater(len(registry.option(name)), 0, name)
+        self.assertTrue(registry.option("action_pose").is_explicit("lifting_skirt"))
+        self.assertEqual(
+            sorted(registry.wildcards()), ["environments", "materials", "styles"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import json
+import os
+import sys
+import tempfile
+import types
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+from LMStudioSaveProvenanceNode import LMStudioSaveProvenanceNode
+from png_provenance import (
+    build_provenance,
+    decode_itxt,
+    encode_itxt,
+    make_chunk,
+    read_provenance,
+    write_provenance,
+)
+
+
+class TestPngProvenance(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.png = os.path.join(self.tmpdir, "image.png")
+        info = PngInfo()
+        info.add_text("prompt", '{"prompt": "workflow"}')
+        Image.new("RGB", (64, 48), (10, 200, 30)).save(self.png, pnginfo=info)
+
+    def test_itxt_roundtrip(self):
+        for text in ("short", "long text " * 100):
+            chunk = encode_itxt("key", text)
+            self.assertEqual(decode_itxt(chunk[8:-4]), ("key", text))
+        self.assertLess(len(encode_itxt("key", "long text " * 100)), 200)
+
+    def test_write_and_read(self):
+        provenance = build_provenance(
+            "a knight, castle",
+            "blurry",
+            model="m",
+            seed=7,
+            creativity=0.7,
+            blend_mode="Simple Mix",
+            wildcard_picks={"materials": "obsidian"},
+        )
+        out = os.path.join(self.tmpdir, "out.png")
+        write_provenance(self.png, out, provenance)
+
+        self.assertEqual(read_provenance(out), provenance)
+        self.assertIsNone(read_provenance(self.png))
+        with Image.open(self.png) as before, Image.open(out) as after:
+            self.assertEqual(after.info["prompt"], '{"prompt": "workflow"}')
+            self.assertEqual(after.info["lmstudio_provenance"].count("knight"), 1)
+            self.assertEqual(before.tobytes(), after.tobytes())
+
+    def test_rewrite_in_place_replaces_chunk(self):
+        write_provenance(self.png, self.png, build_provenance("first"))
+        write_provenance(self.png, self.png, build_provenance("second"))
+
+        self.assertEqual(read_provenance(self.png)["positive"], "second")
+        with open(self.png, "rb") as f:
+            self.assertEqual(f.read().count(b"lmstudio_provenance"), 1)
+        self.assertEqual(os.listdir(self.tmpdir), ["image.png"])
+
+    def test_rewrite_in_place_keeps_permissions(self):
+        os.chmod(self.png, 0o644)
+        write_provenance(self.png, self.png, build_provenance("x"))
+        self.assertEqual(os.stat(self.png).st_mode & 0o777, 0o644)
+
+    def test_chunk_without_nul_is_not_matched(self):
+        # A malformed text chunk whose data is the keyword plus one byte, no NUL
+        with open(self.png, "rb") as f:
+            data = f.read()
+        odd = make_chunk(b"iTXt", b"lmstudio_provenance!")
+        with open(self.png, "wb") as f:
+            f.write(data[:-12] + odd + data[-12:])
+
+        self.assertIsNone(read_provenance(self.png))
+        write_provenance(self.png, self.png, build_provenance("x"))
+        with open(self.png, "rb") as f:
+            self.assertIn(odd, f.read())
+        self.assertEqual(read_provenance(self.png)["positive"], "x")
+
+    def test_rejects_non_png(self):
+        path = os.path.join(self.tmpdir, "not.png")
+        with open(path, "wb") as f:
+            f.write(b"GIF89a" + b"\0" * 20)
+        with self.assertRaises(ValueError):
+            write_provenance(path, path, build_provenance("x"))
+        with self.assertRaises(ValueError):
+            read_provenance(path)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["image.png", "not.png"])
+
+    @patch("LMStudioPromptEnhancerNode.get_lmstudio_models")
+    @patch("requests.post")
+    def test_node_saves_last_provenance(self, mock_post, mock_get_models):
+        mock_get_models.return_value = ["fake-model"]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"choices": [{"message": {"content": "a knight"}}]}
+        mock_post.return_value = resp
+        node = LMStudioPromptEnhancerNode()
+        with self.assertRaises(ValueError):
+            node.save_provenance(self.png)
+
+        positive, negative, _, _, output = node.generate_prompt(
+            enable_advanced_options=False,
+            theme_a="knight",
+            theme_b="castle",
+            blend_mode="Simple Mix",
+            riff_on_last_output=False,
+            creativity=0.5,
+            seed=3,
+            lmstudio_endpoint="http://f",
+            refresh_models=False,
+            model_identifier="fake-model",
+            negative_prompt="blurry",
+            wildcard_1="materials",
+        )
+        node.save_provenance(self.png)
+
+        provenance = read_provenance(self.png)
+        self.assertEqual(provenance, node.get_provenance())
+        self.assertEqual(provenance, json.loads(output))
+        self.assertEqual(provenance["positive"], positive)
+        self.assertEqual(provenance["negative"], negative)
+        self.assertEqual((provenance["model"], provenance["seed"]), ("fake-model", 3))
+        self.assertEqual(provenance["id"], node.history[-1]["id"])
+        material = provenance["wildcard_picks"]["theme_a_wildcard"]
+        user_message = mock_post.call_args[1]["json"]["messages"][1]["content"]
+        self.assertIn(f"knight, {material}", user_message)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class FakeImage:
+    """Stands in for one image of a ComfyUI IMAGE tensor (H, W, C floats)."""
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+@unittest.skipUnless(numpy, "numpy is installed with ComfyUI")
+class TestSaveProvenanceNode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        folder_paths = types.ModuleType("folder_paths")
+        folder_paths.get_output_directory = lambda: self.tmpdir
+        folder_paths.get_save_image_path = lambda prefix, output_dir, w, h: (
+            output_dir,
+            prefix,
+            7,
+            "",
+            prefix,
+        )
+        patcher = patch.dict(sys.modules, {"folder_paths": folder_paths})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.images = [FakeImage(numpy.full((4, 6, 3), 0.5)) for _ in range(2)]
+
+    def test_saves_stamped_images_with_workflow(self):
+        provenance = build_provenance("a knight", seed=3)
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            result = LMStudioSaveProvenanceNode().save_images(
+                self.images,
+                json.dumps(provenance),
+                filename_prefix="test",
+                prompt={"1": {"class_type": "LMStudioPromptEnhancer"}},
+            )
+
+        files = [image["filename"] for image in result["ui"]["images"]]
+        self.assertEqual(files, ["test_00007_.png", "test_00008_.png"])
+        path = os.path.join(self.tmpdir, files[0])
+        self.assertEqual(read_provenance(path), provenance)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (6, 4))
+            self.assertIn("LMStudioPromptEnhancer", image.text["prompt"])
+
+    def test_empty_provenance_saves_unstamped(self):
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            result = LMStudioSaveProvenanceNode().save_images(self.images[:1], "")
+        path = os.path.join(self.tmpdir, result["ui"]["images"][0]["filename"])
+        self.assertIsNone(read_provenance(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
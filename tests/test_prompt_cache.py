@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from prompt_cache import SemanticPromptCache, canonicalize
+
+
+class TestSemanticPromptCache(unittest.TestCase):
+
+    def test_canonicalize_trivial_differences(self):
+        """Case, repeated whitespace and trailing punctuation are normalized."""
+        self.assertEqual(canonicalize("  A   Knight. "), "a knight")
+        self.assertEqual(canonicalize("a knight "), canonicalize("a knight"))
+
+    def test_exact_hit_after_normalization(self):
+        cache = SemanticPromptCache()
+        cache.store(("m",), "a knight | a dragon", "cached prompt")
+        self.assertEqual(
+            cache.lookup(("m",), "A knight  | a dragon ", 0.9), ("cached prompt", 1.0)
+        )
+
+    def test_fuzzy_hit_and_threshold(self):
+        """Near-identical text hits above the threshold and misses below it."""
+        cache = SemanticPromptCache()
+        cache.store(("m",), "a brave knight | a red dragon", "cached prompt")
+        completion, score = cache.lookup(("m",), "a brave knights | a red dragon", 0.8)
+        self.assertEqual(completion, "cached prompt")
+        self.assertLess(score, 1.0)
+        self.assertIsNone(cache.lookup(("m",), "a wizard | a castle", 0.8))
+
+    def test_buckets_never_mix(self):
+        """Entries are only matched within the same exact bucket."""
+        cache = SemanticPromptCache()
+        cache.store(("model-a",), "a knight", "from a")
+        self.assertIsNone(cache.lookup(("model-b",), "a knight", 0.5))
+
+    def test_capacity_evicts_least_recently_used(self):
+        cache = SemanticPromptCache(capacity=2)
+        cache.store(("m",), "first theme", "1")
+        cache.store(("m",), "second theme", "2")
+        cache.lookup(("m",), "first theme", 1.0)
+        cache.store(("m",), "third theme", "3")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup(("m",), "second theme", 1.0))
+        self.assertIsNotNone(cache.lookup(("m",), "first theme", 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from prompt_dedupe import (
+    INDEX_MIN_SIMILARITY,
+    PromptDeduplicator,
+    simhash,
+    similarity,
+)
+
+
+class TestPromptDeduplicator(unittest.TestCase):
+
+    def test_identical_prompts_are_fully_similar(self):
+        """Identical prompts produce identical signatures."""
+        text = "a knight fighting a dragon on a burning bridge at dusk"
+        self.assertEqual(similarity(simhash(text), simhash(text)), 1.0)
+
+    def test_near_duplicate_scores_higher_than_unrelated(self):
+        """A lightly edited prompt is closer than an unrelated prompt."""
+        index = PromptDeduplicator()
+        index.add(
+            "a lone knight in silver armor fighting a red dragon on a burning "
+            "bridge at dusk, dramatic lighting, embers in the air"
+        )
+        near = index.check(
+            "a lone knight in silver armor fighting a red dragon on a burning "
+            "bridge at dusk, dramatic lighting, embers in the wind"
+        )
+        far = index.check("a quiet cottage in a snowy forest with a warm glow")
+        self.assertGreaterEqual(near, 0.85)
+        self.assertLess(far, near)
+
+    def test_capacity_evicts_oldest(self):
+        """The index only remembers the most recent prompts."""
+        index = PromptDeduplicator(capacity=2)
+        index.add("first prompt about castles")
+        index.add("second prompt about oceans")
+        index.add("third prompt about deserts")
+        self.assertEqual(len(index), 2)
+        self.assertLess(index.check("first prompt about castles"), 1.0)
+        self.assertEqual(index.check("third prompt about deserts"), 1.0)
+
+    def test_empty_index_reports_zero(self):
+        """Checking against an empty index never reports a duplicate."""
+        self.assertEqual(PromptDeduplicator().check("anything"), 0.0)
+
+    def test_low_thresholds_find_matches_outside_the_bands(self):
+        """Below the band guarantee the check falls back to a full scan."""
+        # One bit flipped in every band: 8 bits apart, so no band is shared
+        signatures = {"old": 0, "new": sum(1 << (band * 8) for band in range(8))}
+        expected = 1.0 - 8 / 64
+        self.assertLess(expected, INDEX_MIN_SIMILARITY)
+        index = PromptDeduplicator()
+        with patch("prompt_dedupe.simhash", side_effect=signatures.__getitem__):
+            index.add("old")
+            self.assertEqual(index.check("new", 0.8), expected)
+            self.assertEqual(index.check("new"), expected)
+            # At or above the guarantee only the band index is consulted
+            self.assertEqual(index.check("new", 0.9), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from LMStudioPromptEnhancerNode import LMStudioPromptEnhancerNode
+from prompt_fallback import BLEND_TEMPLATES, synthesize_prompt
+
+# Absolute timing checks only run when asked for (they depend on the machine)
+BENCHMARKS = os.environ.get("LMSTUDIO_BENCHMARKS", "") == "1"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSynthesizePrompt(unittest.TestCase):
+
+    def test_deterministic_templates(self):
+        prompt = synthesize_prompt(
+            "a knight",
+            "a dragon",
+            blend_mode="A vs. B",
+            style_preset="Anime",
+            seed=4,
+            details=["kneeling", "rim lighting"],
+            moods="serene",
+            wildcards=["obsidian"],
+        )
+        self.assertEqual(
+            prompt,
+            synthesize_prompt(
+                "a knight",
+                "a dragon",
+                blend_mode="A vs. B",
+                style_preset="Anime",
+                seed=4,
+                details=["kneeling", "rim lighting"],
+                moods="serene",
+                wildcards=["obsidian"],
+            ),
+        )
+        subjects = [
+            t.format(a="a knight", b="a dragon") for t in BLEND_TEMPLATES["A vs. B"]
+        ]
+        self.assertTrue(any(prompt.lower().startswith(s.lower()) for s in subjects))
+        for part in (
+            "kneeling",
+            "rim lighting",
+            "serene mood",
+            "obsidian",
+            "anime style",
+        ):
+            self.assertIn(part, prompt)
+        self.assertTrue(prompt.endswith("."))
+
+    def test_tag_list_and_empty_themes(self):
+        prompt = synthesize_prompt("", "", tag_list=True)
+        self.assertFalse(prompt.endswith("."))
+        self.assertIn("cinematic composition", prompt)
+
+    @unittest.skipUnless(BENCHMARKS, "set LMSTUDIO_BENCHMARKS=1 to run")
+    def test_sub_millisecond(self):
+        runs = 1000
+        started = time.perf_counter()
+        for seed in range(runs):
+            synthesize_prompt("a knight", "a dragon", "A made of B", "Sci-Fi", seed)
+        per_prompt = (time.perf_counter() - started) / runs
+        self.assertLess(per_prompt, 0.001, f"{per_prompt * 1e6:.0f} us per prompt")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold_and_probes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        endpoint = "http://studio:1234/v1/chat/completions"
+
+        self.assertFalse(breaker.record_failure(endpoint))
+        self.assertTrue(breaker.record_failure(endpoint))
+        self.assertFalse(breaker.allow("http://studio:1234/other"))
+        self.assertTrue(breaker.allow("http://elsewhere:1234/v1"))
+        self.assertEqual(breaker.retry_in(endpoint), 10)
+
+        clock.now += 10
+        self.assertTrue(breaker.allow(endpoint))
+        self.assertEqual(breaker.state(endpoint), HALF_OPEN)
+        self.assertFalse(breaker.allow(endpoint))
+        self.assertTrue(breaker.record_failure(endpoint))
+        self.assertEqual(breaker.state(endpoint), OPEN)
+
+        clock.now += 10
+        self.assertTrue(breaker.allow(endpoint))
+        breaker.record_success(endpoint)
+        self.assertEqual(breaker.state(endpoint), CLOSED)
+        self.assertFalse(breaker.record_failure(endpoint))
+
+
+class TestNodeFallback(unittest.TestCase):
+
+    def setUp(self):
+        self.node = LMStudioPromptEnhancerNode()
+        self.clock = FakeClock()
+        patcher = patch.object(
+            LMStudioPromptEnhancerNode,
+            "circuit_breaker",
+            CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=self.clock),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_node(self, **params):
+        return self.node.generate_prompt(
+            enable_advanced_options=True,
+            theme_a="a knight",
+            theme_b="a dragon",
+            blend_mode="A in the world of B",
+            riff_on_last_output=False,
+            creativity=0.7,
+            seed=3,
+            lmstudio_endpoint="http://down:1234/v1/chat/completions",
+            refresh_models=False,
+            model_identifier="fake-model",
+            subject="People",
+            lighting="rim lighting",
+            mood_serene_chaotic=6.0,
+            **params,
+        )
+
+    @patch("requests.post")
+    def test_falls_back_after_breaker_trips(self, mock_post):
+        from requests.exceptions import ConnectionError
+
+        mock_post.side_effect = ConnectionError("refused")
+        for _ in range(2):
+            positive, _, warnings, _, _ = self.run_node()
+            self.assertIn("API Error: Could not connect", positive)
+
+        positive, negative, warnings, _, _ = self.run_node(negative_prompt="blurry")
+        self.assertNotIn("API Error", positive)
+        self.assertIn("knight in the world of a dragon", positive)
+        self.assertIn("rim lighting", positive)
+        self.assertIn("wildly chaotic mood", positive)
+        self.assertEqual(negative, "blurry")
+        self.assertIn("Fallback: LM Studio at http://down:1234", warnings)
+        self.assertEqual(self.node.get_history()[-1]["tags"], ["fallback"])
+        self.assertTrue(self.node.get_provenance()["fallback"])
+        self.assertIsNone(self.node.last_generated_prompt)
+
+        # While open, no request is sent at all
+        calls = mock_post.call_count
+        self.assertEqual(self.run_node()[0], positive)
+        self.assertEqual(mock_post.call_count, calls)
+
+        # After the reset timeout a probe goes out and a success closes it
+        self.clock.now += 30
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {"choices": [{"message": {"content": "back"}}]}
+        mock_post.side_effect = None
+        mock_post.return_value = resp
+        self.assertTrue(self.run_node()[0].startswith("back"))
+        self.assertEqual(self.node.circuit_breaker.state("http://down:1234"), CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
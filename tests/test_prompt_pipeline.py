@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from LMStudioPromptEnhancerNode import apply_model_styling
+from prompt_pipeline import PROCESS, THREAD, PromptPipeline, postprocess_prompt
+
+
+def square(x):
+    if x == 3:
+        raise ValueError("no threes")
+    return x * x
+
+
+class TestPromptPipeline(unittest.TestCase):
+
+    def test_thread_and_process_stages(self):
+        pipeline = PromptPipeline(
+            [
+                ("fetch", lambda x: x + 1, 3, THREAD),
+                ("postprocess", square, 2, PROCESS),
+            ],
+            queue_size=4,
+        )
+        results = {
+            item: (value, error) for item, value, error in pipeline.run(range(10))
+        }
+
+        self.assertEqual(results[0], (1, None))
+        self.assertEqual(results[9], (100, None))
+        self.assertIsInstance(results[2][1], ValueError)
+        stats = pipeline.stats()
+        self.assertEqual(stats["fetch"]["processed"], 10)
+        self.assertEqual(stats["postprocess"]["processed"], 10)
+        self.assertEqual(stats["postprocess"]["errors"], 1)
+        self.assertGreater(stats["fetch"]["items_per_sec"], 0)
+
+    def test_failed_items_skip_later_stages(self):
+        seen = []
+
+        def fail_odd(x):
+            if x % 2:
+                raise RuntimeError("odd")
+            return x
+
+        pipeline = PromptPipeline(
+            [
+                ("a", fail_odd, 2, THREAD),
+                ("b", lambda x: seen.append(x) or x, 1, THREAD),
+            ]
+        )
+        errors = [error for _, _, error in pipeline.run(range(6)) if error]
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(sorted(seen), [0, 2, 4])
+
+    def test_backpressure_bounds_work_in_flight(self):
+        """A slow last stage keeps the pipeline from pulling far ahead."""
+        pulled = []
+        lock = threading.Lock()
+
+        def items():
+            for i in range(40):
+                with lock:
+                    pulled.append(i)
+                yield i
+
+        def slow(x):
+            time.sleep(0.005)
+            return x
+
+        pipeline = PromptPipeline(
+            [("fast", lambda x: x, 2, THREAD), ("slow", slow, 1, THREAD)],
+            queue_size=3,
+        )
+        runner = pipeline.run(items())
+        next(runner)
+        self.assertLessEqual(len(pulled), 4)
+        self.assertEqual(len(list(runner)), 39)
+
+    def test_postprocess_prompt(self):
+        task = {
+            "completion": '{"positive": "a knight, nude, castle", "negative": "", "tags": []}',
+            "structured_output": True,
+            "prompt_tone": "SFW",
+            "target_model": "Pony",
+            "style_preset": "Anime",
+        }
+        result = postprocess_prompt(task)
+        self.assertEqual(
+            result["prompt"], apply_model_styling("a knight, castle", "Pony", "Anime")
+        )
+        self.assertEqual(len(result["warnings"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import sys
+import threading
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from prompt_prefetch import PromptPrefetcher, RiffSpeculator, SpeculationCancelled
+
+
+def produce(seed, ticket):
+    ticket.begin()
+    return f"item{seed}"
+
+
+class TestPromptPrefetcher(unittest.TestCase):
+
+    def test_refill_then_hit(self):
+        """Items produced in the background are served on the next take."""
+        prefetcher = PromptPrefetcher()
+        self.assertIsNone(prefetcher.take("k", 10))
+        prefetcher.refill("k", 10, produce, 2)
+        prefetcher.join(timeout=5)
+
+        self.assertEqual(prefetcher.take("k", 11), "item11")
+        stats = prefetcher.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["queue_depth"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+    def test_only_the_requested_seed_is_served(self):
+        """Items skipped over are dropped and an unbuffered seed rebases."""
+        prefetcher = PromptPrefetcher()
+        prefetcher.refill("k", 0, produce, 3)
+        prefetcher.join(timeout=5)
+
+        self.assertEqual(prefetcher.take("k", 2), "item2")
+        self.assertEqual(prefetcher.stats()["queue_depth"], 1)
+        self.assertIsNone(prefetcher.take("k", 100))
+        self.assertEqual(prefetcher.stats()["queue_depth"], 0)
+        prefetcher.refill("k", 100, produce, 1)
+        prefetcher.join(timeout=5)
+        self.assertEqual(prefetcher.take("k", 101), "item101")
+
+    def test_key_change_invalidates_buffer(self):
+        """Taking with a different key drops items buffered for the old key."""
+        prefetcher = PromptPrefetcher()
+        prefetcher.refill("a", 0, produce, 3)
+        prefetcher.join(timeout=5)
+
+        self.assertIsNone(prefetcher.take("b", 1))
+        self.assertEqual(prefetcher.stats()["queue_depth"], 0)
+        self.assertEqual(prefetcher.stats()["invalidations"], 1)
+
+    def test_in_flight_result_discarded_after_invalidation(self):
+        """A result that completes after its key was replaced is not buffered."""
+        prefetcher = PromptPrefetcher()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_producer(seed, ticket):
+            ticket.begin()
+            started.set()
+            release.wait(5)
+            return "stale"
+
+        prefetcher.refill("old", 0, slow_producer, 1)
+        started.wait(5)
+        prefetcher.take("new", 1)
+        release.set()
+        prefetcher.join(timeout=5)
+
+        self.assertIsNone(prefetcher.take("new", 1))
+
+    def test_waiting_refill_is_cancelled_when_the_buffer_moves(self):
+        """A refill still waiting for an idle server is never sent."""
+        prefetcher = PromptPrefetcher()
+        waiting = threading.Event()
+        release = threading.Event()
+        sent = []
+
+        def queued_producer(seed, ticket):
+            # Stands in for a request waiting behind a busy server
+            if seed == 1:
+                waiting.set()
+                release.wait(5)
+            if not ticket.begin():
+                raise SpeculationCancelled()
+            sent.append(seed)
+            return f"item{seed}"
+
+        prefetcher.refill("k", 0, queued_producer, 1)
+        waiting.wait(5)
+        self.assertIsNone(prefetcher.take("k", 50))
+        release.set()
+        prefetcher.join(timeout=5)
+
+        self.assertEqual(sent, [51])
+        self.assertEqual(prefetcher.take("k", 51), "item51")
+        self.assertEqual(prefetcher.stats()["cancelled"], 1)
+        self.assertEqual(prefetcher.stats()["errors"], 0)
+
+    def test_producer_errors_are_counted(self):
+        """A failing producer stops the refill and is reported in stats."""
+        prefetcher = PromptPrefetcher()
+
+        def failing(seed, ticket):
+            raise RuntimeError("boom")
+
+        prefetcher.refill("k", 0, failing, 2)
+        prefetcher.join(timeout=5)
+        self.assertEqual(prefetcher.stats()["errors"], 1)
+
+
+class TestRiffSpeculator(unittest.TestCase):
+
+    def setUp(self):
+        self.speculator = RiffSpeculator()
+        self.gate = threading.Event()
+        self.sent = []
+
+    def producer(self, name):
+        # Stands in for a request queued behind a busy server
+        def produce(ticket):
+            self.gate.wait(5)
+            if not ticket.begin():
+                raise SpeculationCancelled()
+            self.sent.append(name)
+            return name
+
+        return produce
+
+    def test_sent_speculation_is_awaited(self):
+        self.speculator.schedule("k", self.producer("riff"))
+        self.gate.set()
+        self.speculator.join(5)
+        self.assertEqual(self.speculator.take("k", timeout=5), "riff")
+        self.assertEqual(self.speculator.stats()["hits"], 1)
+
+    def test_abandoned_speculation_is_never_sent(self):
+        self.speculator.schedule("k", self.producer("riff"))
+        self.assertIsNone(self.speculator.take("k", timeout=5))
+        self.gate.set()
+        self.speculator.join(5)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.speculator.stats()["cancelled"], 1)
+
+    def test_superseded_speculations_are_never_sent(self):
+        self.speculator.schedule("a", self.producer("a"))
+        self.speculator.schedule("b", self.producer("b"))
+        self.assertIsNone(self.speculator.take("c"))
+        self.gate.set()
+        self.speculator.join(5)
+        self.assertEqual(self.sent, [])
+        stats = self.speculator.stats()
+        self.assertEqual((stats["discarded"], stats["cancelled"]), (2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
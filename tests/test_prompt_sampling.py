@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from prompt_sampling import CreativeSampler, chaos_wildcard_count
+
+WILDCARDS = {
+    "materials": ["steel", "glass", "wood"],
+    "styles": ["ukiyo-e", "art deco"],
+}
+OPTIONS = {
+    "action_pose": ["default", "random", "standing", "lifting_skirt"],
+    "lighting": ["default", "random", "soft", "moody"],
+}
+
+
+class TestCreativeSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.sampler = CreativeSampler(
+            WILDCARDS, OPTIONS, explicit_options={"lifting_skirt"}
+        )
+
+    def test_chaos_wildcard_count(self):
+        """Chaos levels map to 0-4 wildcards."""
+        self.assertEqual(
+            [chaos_wildcard_count(c) for c in (0.0, 1.0, 4.0, 7.0, 9.9, 10.0)],
+            [0, 1, 2, 3, 3, 4],
+        )
+
+    def test_same_seed_same_picks(self):
+        """Identical seeds and options always yield identical picks."""
+        options = dict(wildcard_1="materials", lighting="random", chaos=7.0)
+        first = self.sampler.sample(random.Random(7), **options)
+        second = self.sampler.sample(random.Random(7), **options)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first.chaos_wildcards), 3)
+
+    def test_batch_matches_single_samples(self):
+        """sample_batch returns the same picks as sampling each seed alone."""
+        options = dict(wildcard_2="styles", action_pose="random", chaos=4.0)
+        batch = self.sampler.sample_batch(range(20), **options)
+        singles = [self.sampler.sample(random.Random(s), **options) for s in range(20)]
+        self.assertEqual(batch, singles)
+
+    def test_sfw_excludes_explicit_options(self):
+        """Random poses never include explicit entries in SFW mode."""
+        picks = self.sampler.sample_batch(range(50), action_pose="random", sfw=True)
+        self.assertEqual({p.action_pose for p in picks}, {"standing"})
+
+    def test_fixed_options_pass_through(self):
+        """Non-random option values are returned unchanged."""
+        picks = self.sampler.sample(random.Random(0), lighting="soft")
+        self.assertEqual(picks.lighting, "soft")
+        self.assertIsNone(picks.theme_a_wildcard)
+        self.assertEqual(picks.chaos_wildcards, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
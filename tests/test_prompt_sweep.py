@@ -0,0 +1,143 @@
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from batch_runner import CallCache
+from LMStudioPromptSweepNode import (
+    LMStudioPromptSweepNode,
+    parse_choices,
+    parse_numbers,
+    sweep_cells,
+)
+
+
+def echo_response(url, headers=None, json=None, timeout=None):
+    response = MagicMock()
+    response.json.return_value = {
+        "choices": [{"message": {"content": f"prompt at {json['temperature']}"}}]
+    }
+    return response
+
+
+class TestSweepHelpers(unittest.TestCase):
+
+    def test_parse_numbers(self):
+        self.assertEqual(parse_numbers("0.5, 1"), [0.5, 1.0])
+        self.assertEqual(parse_numbers("0.1:0.5:0.2"), [0.1, 0.3, 0.5])
+        with self.assertRaises(ValueError):
+            parse_numbers("0:1:0")
+
+    def test_parse_choices(self):
+        self.assertEqual(parse_choices("All", ["a", "b"]), ["a", "b"])
+        self.assertEqual(parse_choices("b, a", ["a", "b"]), ["b", "a"])
+        with self.assertRaises(ValueError):
+            parse_choices("c", ["a", "b"])
+
+    def test_sweep_cells_is_lazy(self):
+        """A huge grid is enumerated cell by cell without materializing it."""
+        axes = [(f"x{i}", range(100)) for i in range(6)]
+        cells = sweep_cells(axes)
+        self.assertEqual(next(cells), (0, {f"x{i}": 0 for i in range(6)}))
+        index, values = next(cells)
+        self.assertEqual((index, values["x5"]), (1, 1))
+
+    def test_call_cache_runs_once(self):
+        cache = CallCache()
+        calls = []
+        self.assertEqual(cache.get("k", lambda: calls.append(1) or "v"), ("v", False))
+        self.assertEqual(cache.get("k", lambda: calls.append(1) or "w"), ("v", True))
+        self.assertEqual(len(calls), 1)
+
+    def test_call_cache_evicts_least_recently_used(self):
+        cache = CallCache(maxsize=2)
+        cache.get("a", lambda: "a")
+        cache.get("b", lambda: "b")
+        cache.get("a", lambda: "a")
+        cache.get("c", lambda: "c")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.get("a", lambda: "x"), ("a", True))
+        self.assertEqual(cache.get("b", lambda: "new"), ("new", False))
+
+
+class TestLMStudioPromptSweepNode(unittest.TestCase):
+
+    def sweep(self, **overrides):
+        params = dict(
+            theme_a="a knight",
+            theme_b="a dragon",
+            blend_mode="Simple Mix",
+            creativity_values="0.5, 0.9",
+            chaos_values="0",
+            style_presets="Cinematic",
+            target_models="Flux, SDXL",
+            seed=7,
+            max_workers=2,
+            max_cells=0,
+            lmstudio_endpoint="http://fake-endpoint",
+            model_identifier="fake-model",
+        )
+        params.update(overrides)
+        return LMStudioPromptSweepNode().run_sweep(**params)
+
+    @patch("requests.post")
+    def test_identical_payloads_share_a_request(self, mock_post):
+        """Flux and SDXL build the same request, so each creativity is sent once."""
+        mock_post.side_effect = echo_response
+        results, summary = self.sweep()
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertIn("4 cell(s), 0 error(s), 2 shared request(s)", summary)
+        self.assertIn("[creativity=0.5, chaos=0.0, style_preset=Cinematic", results)
+        self.assertIn("prompt at 0.9", results)
+
+    @patch("requests.post")
+    def test_streams_jsonl_and_csv(self, mock_post):
+        mock_post.side_effect = echo_response
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sweep.jsonl")
+            self.sweep(output_path=path)
+            with open(path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+            self.assertEqual(sorted(row["index"] for row in rows), [0, 1, 2, 3])
+            self.assertTrue(all(row["latency_ms"] >= 0 for row in rows))
+            self.assertEqual(sum(row["cached"] for row in rows), 2)
+
+            path = os.path.join(tmp, "sweep.csv")
+            self.sweep(output_path=path, output_format="csv", max_cells=3)
+            with open(path, encoding="utf-8", newline="") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(len(rows), 3)
+            self.assertIn("latency_ms", rows[0])
+
+    @patch("LMStudioPromptSweepNode.RESULTS_PREVIEW_CELLS", 1)
+    @patch("requests.post")
+    def test_file_output_only_previews_results(self, mock_post):
+        """With an output file, `results` holds a preview instead of every cell."""
+        mock_post.side_effect = echo_response
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sweep.jsonl")
+            results, summary = self.sweep(output_path=path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 4)
+
+        self.assertEqual(results.count("[creativity="), 1)
+        self.assertIn("[creativity=0.5, chaos=0.0, style_preset=Cinematic", results)
+        self.assertIn(f"... 3 more cell(s) in {path}", results)
+        self.assertIn("4 cell(s), 0 error(s)", summary)
+
+    def test_invalid_values(self):
+        results, summary = self.sweep(style_presets="Watercolor")
+        self.assertEqual(results, "")
+        self.assertIn("Invalid sweep values", summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
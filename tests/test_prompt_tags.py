@@ -0,0 +1,120 @@
+import os
+import random
+import sys
+import time
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from LMStudioPromptEnhancerNode import apply_model_styling
+from prompt_tags import (
+    Tag,
+    build_tag_list,
+    estimate_tokens,
+    parse_emphasis,
+    parse_tags,
+)
+
+
+class TestPromptTags(unittest.TestCase):
+
+    def test_parse_tags_reads_emphasis(self):
+        tags = parse_tags("knight, (dragon:1.3),\n((fog)), [blur], , castle.")
+        self.assertEqual(
+            [t.text for t in tags], ["knight", "dragon", "fog", "blur", "castle"]
+        )
+        self.assertAlmostEqual(tags[1].weight, 1.3)
+        self.assertAlmostEqual(tags[2].weight, 1.21)
+        self.assertAlmostEqual(tags[3].weight, 1 / 1.1)
+
+    def test_parse_emphasis(self):
+        self.assertEqual(
+            parse_emphasis("Neon Sign:1.4, dragon, bad:weight"),
+            {"neon sign": 1.4, "dragon": 1.1, "bad:weight": 1.1},
+        )
+
+    def test_dedupe_order_and_conflicts(self):
+        result = build_tag_list(
+            parse_tags(
+                "castle, rating_explicit, Neon_Sign, masterpiece, neon sign, "
+                "(castle:1.2), rating_safe, 4k"
+            ),
+            leading=parse_tags("score_9, source_anime"),
+            trailing=parse_tags("4k, masterpiece"),
+        )
+        self.assertEqual(
+            result.text,
+            "score_9, masterpiece, source_anime, rating_explicit, "
+            "(castle:1.2), Neon_Sign, 4k",
+        )
+        self.assertEqual(result.dropped, [])
+
+    def test_emphasis_overrides_text_weight(self):
+        result = build_tag_list(
+            [Tag("dragon", 1.5), Tag("fog", 1.0)], emphasis={"dragon": 0.8, "fog": 1.0}
+        )
+        self.assertEqual(result.text, "(dragon:0.8), fog")
+
+    def test_token_budget_drops_style_before_content(self):
+        result = build_tag_list(
+            parse_tags("knight, dragon"),
+            leading=parse_tags("score_9"),
+            trailing=parse_tags("cinematic photo, 35mm film"),
+            token_budget=estimate_tokens("score_9, knight, dragon"),
+        )
+        self.assertEqual(result.text, "score_9, knight, dragon")
+        self.assertEqual(
+            [t.text for t in result.dropped], ["cinematic photo", "35mm film"]
+        )
+        self.assertEqual(result.tokens, estimate_tokens("score_9, knight, dragon"))
+
+    def test_model_styling_uses_tag_list_for_tag_models_only(self):
+        warnings = []
+        styled = apply_model_styling(
+            "knight, knight, dragon",
+            "SDXL",
+            "Photorealistic",
+            tag_list_output=True,
+            tag_token_budget=8,
+            warnings=warnings,
+        )
+        # Style tags that do not fit are skipped; later, shorter ones may still fit
+        self.assertEqual(styled, "knight, dragon, cinematic photo, professional")
+        self.assertIn("dropped", warnings[0])
+        self.assertEqual(
+            apply_model_styling("a knight", "Generic", "Anime", tag_list_output=True),
+            apply_model_styling("a knight", "Generic", "Anime"),
+        )
+
+    def test_benchmark_long_tag_lists(self):
+        """Processing stays linear: 10x the tags costs about 10x the time."""
+        rng = random.Random(0)
+        words = [f"tag{i}" for i in range(2000)]
+
+        def run(count):
+            text = ", ".join(
+                f"({rng.choice(words)}:1.2)" if i % 7 == 0 else rng.choice(words)
+                for i in range(count)
+            )
+            started = time.perf_counter()
+            build_tag_list(
+                parse_tags(text),
+                leading=parse_tags("score_9, score_8_up"),
+                trailing=parse_tags("masterpiece, best quality"),
+                token_budget=225,
+            )
+            return time.perf_counter() - started
+
+        run(1_000)  # warm up
+        small = min(run(1_000) for _ in range(3))
+        large = min(run(10_000) for _ in range(3))
+        self.assertLess(
+            large,
+            small * 25,
+            f"1k tags: {small * 1e3:.2f} ms, 10k: {large * 1e3:.2f} ms",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
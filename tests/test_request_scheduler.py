@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from request_scheduler import RequestScheduler, TokenBucket
+
+ENDPOINT = "http://localhost:1234/v1/chat/completions"
+SERVER = "http://localhost:1234"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0.0, 0.0, 0.5, 1.0])
+        clock.now = 10.0
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 0.5])
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def run_queued(self, scheduler, requests):
+        """Hold the only slot, queue `requests` in order, then record service order."""
+        served = []
+        release = threading.Event()
+
+        def hold():
+            with scheduler.slot(ENDPOINT, "holder"):
+                release.wait()
+
+        def request(client, priority):
+            with scheduler.slot(ENDPOINT, client, priority):
+                served.append(client)
+
+        threads = [threading.Thread(target=hold)]
+        threads[0].start()
+        while scheduler.stats().get(SERVER, {}).get("in_flight") != 1:
+            time.sleep(0.001)
+        for queued, (client, priority) in enumerate(requests, 1):
+            thread = threading.Thread(target=request, args=(client, priority))
+            thread.start()
+            threads.append(thread)
+            while scheduler.stats()[SERVER]["queued"] != queued:
+                time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return served
+
+    def test_limits_in_flight_requests(self):
+        scheduler = RequestScheduler(max_in_flight=2)
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def request():
+            with scheduler.slot(ENDPOINT):
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active)
+                time.sleep(0.005)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(active[1], 2)
+        stats = scheduler.stats()[SERVER]
+        self.assertEqual((stats["requests"], stats["in_flight"]), (10, 0))
+        self.assertGreater(stats["max_queue_wait"], 0)
+
+    def test_batch_does_not_starve_other_clients(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        served = self.run_queued(scheduler, [("batch", 1.0)] * 6 + [("user", 1.0)])
+
+        self.assertLessEqual(served.index("user"), 1)
+        clients = scheduler.stats()[SERVER]["clients"]
+        self.assertEqual(clients["batch"]["requests"], 6)
+        self.assertLess(clients["user"]["avg_wait"], clients["batch"]["avg_wait"])
+
+    def test_priority_weights_share(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        served = self.run_queued(scheduler, [("low", 1.0)] * 4 + [("high", 2.0)] * 4)
+
+        self.assertEqual(served[:6].count("high"), 4)
+
+    def test_rate_limit_spaces_requests(self):
+        scheduler = RequestScheduler(max_in_flight=4, rate=50.0, burst=1)
+        started = time.perf_counter()
+        for _ in range(4):
+            with scheduler.slot(ENDPOINT):
+                pass
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        self.assertGreater(scheduler.stats()[SERVER]["rate_limit_wait"], 0.04)
+
+    def test_idle_requests_wait_for_foreground(self):
+        scheduler = RequestScheduler(max_in_flight=4)
+        order = []
+        release = threading.Event()
+
+        def foreground():
+            with scheduler.slot(ENDPOINT, "user"):
+                release.wait()
+                order.append("foreground")
+
+        def idle():
+            with scheduler.slot(ENDPOINT, "user", idle=True):
+                order.append("idle")
+
+        threads = [threading.Thread(target=foreground)]
+        threads[0].start()
+        while scheduler.stats().get(SERVER, {}).get("in_flight") != 1:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=idle))
+        threads[1].start()
+        while scheduler.stats()[SERVER]["idle_queued"] != 1:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ["foreground", "idle"])
+        with scheduler.slot(ENDPOINT, idle=True):
+            self.assertEqual(scheduler.stats()[SERVER]["in_flight"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
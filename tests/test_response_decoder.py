@@ -0,0 +1,145 @@
+import importlib.util
+import json
+import os
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import response_decoder
+from response_decoder import (
+    _decode_stdlib,
+    _make_msgspec_decoder,
+    _make_orjson_decoder,
+    decode_completion_body,
+    extract_completion,
+    parse_prompt_bundle,
+    strip_reasoning,
+)
+
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+HAS_MSGSPEC = importlib.util.find_spec("msgspec") is not None
+
+
+def completion_body(content, logprob_tokens=0):
+    """Build a chat completion body, optionally padded with logprobs/usage."""
+    choice = {"index": 0, "message": {"role": "assistant", "content": content}}
+    if logprob_tokens:
+        choice["logprobs"] = {
+            "content": [
+                {
+                    "token": f"tok{i}",
+                    "logprob": -0.5,
+                    "top_logprobs": [
+                        {"token": f"alt{j}", "logprob": -1.0} for j in range(5)
+                    ],
+                }
+                for i in range(logprob_tokens)
+            ]
+        }
+    body = {
+        "id": "chatcmpl-1",
+        "choices": [choice],
+        "usage": {"prompt_tokens": 10, "completion_tokens": logprob_tokens},
+    }
+    return json.dumps(body).encode("utf-8")
+
+
+class TestResponseDecoder(unittest.TestCase):
+
+    def test_strip_reasoning_blocks(self):
+        """<think> blocks are removed and the answer is stripped."""
+        text = "<think>\nplan the prompt\n</think>\n  a knight at dusk  "
+        self.assertEqual(strip_reasoning(text), "a knight at dusk")
+        self.assertEqual(strip_reasoning("no tags here "), "no tags here")
+
+    def test_decode_body_with_reasoning(self):
+        body = completion_body("<think>hmm</think>a dragon in the rain")
+        self.assertEqual(decode_completion_body(body), "a dragon in the rain")
+
+    def test_malformed_bodies_raise_expected_errors(self):
+        """Bad bodies raise the errors generate_prompt reports as format errors."""
+        for body in (b"not json", b"{}", b'{"choices": []}'):
+            with self.assertRaises((ValueError, KeyError, IndexError)):
+                decode_completion_body(body)
+        with self.assertRaises(ValueError):
+            decode_completion_body(completion_body(None))
+
+    def test_extract_completion_prefers_raw_body(self):
+        response = MagicMock()
+        response.content = completion_body(" prompt ")
+        self.assertEqual(extract_completion(response), "prompt")
+        response.json.assert_not_called()
+
+    def test_extract_completion_falls_back_to_json(self):
+        response = MagicMock()
+        response.json.return_value = {"choices": [{"message": {"content": " p "}}]}
+        self.assertEqual(extract_completion(response), "p")
+
+    def test_backends_agree(self):
+        body = completion_body("<think>x</think>same text", logprob_tokens=10)
+        decoders = [_decode_stdlib]
+        if HAS_ORJSON:
+            import orjson
+
+            decoders.append(_make_orjson_decoder(orjson))
+        if HAS_MSGSPEC:
+            import msgspec
+
+            decoders.append(_make_msgspec_decoder(msgspec))
+        results = {strip_reasoning(decode(body)) for decode in decoders}
+        self.assertEqual(results, {"same text"})
+
+    def test_large_response_benchmark(self):
+        """Decoding a ~1 MB response with logprobs is no slower than json.loads."""
+        body = completion_body("a knight " * 200, logprob_tokens=5000)
+        self.assertGreater(len(body), 1_000_000)
+        decode = response_decoder.get_decoder()
+
+        def best_of(fn, runs=5):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        fast = best_of(lambda: decode(body))
+        baseline = best_of(
+            lambda: json.loads(body)["choices"][0]["message"]["content"].strip()
+        )
+        self.assertLess(fast, baseline * 1.5, f"{fast:.4f}s vs {baseline:.4f}s")
+
+
+class TestPromptBundle(unittest.TestCase):
+
+    def test_parse_schema_object(self):
+        bundle = parse_prompt_bundle(
+            '{"positive": " a knight ", "negative": "blurry", "tags": ["knight", " dusk "]}'
+        )
+        self.assertEqual(
+            bundle,
+            {"positive": "a knight", "negative": "blurry", "tags": ["knight", "dusk"]},
+        )
+
+    def test_parse_object_wrapped_in_prose(self):
+        """Models ignoring the schema may wrap the JSON in text or code fences."""
+        text = 'Sure!\n```json\n{"positive": "a dragon", "tags": "red, fire"}\n```'
+        bundle = parse_prompt_bundle(text)
+        self.assertEqual(bundle["positive"], "a dragon")
+        self.assertEqual(bundle["negative"], "")
+        self.assertEqual(bundle["tags"], ["red", "fire"])
+
+    def test_plain_text_becomes_positive(self):
+        bundle = parse_prompt_bundle("a castle at night, {moody}")
+        self.assertEqual(
+            bundle,
+            {"positive": "a castle at night, {moody}", "negative": "", "tags": []},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
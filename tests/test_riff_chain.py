@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from riff_chain import riff_tree
+
+
+class TestRiffTree(unittest.TestCase):
+
+    def test_tree_shape_and_parents(self):
+        """Every node riffs on its parent and is numbered by tree position."""
+        nodes = list(
+            riff_tree(
+                lambda parent, i: (f"{parent}/{i}", None), "r", 2, 3, root_id="root"
+            )
+        )
+        self.assertEqual(sorted(node.index for node in nodes), list(range(1, 13)))
+        by_id = {node.id: node for node in nodes}
+        for node in nodes:
+            if node.depth == 1:
+                self.assertEqual(node.parent_id, "root")
+                self.assertEqual(node.prompt, f"r/{node.index}")
+            else:
+                parent = by_id[node.parent_id]
+                self.assertEqual((node.index - 1) // 3, parent.index)
+                self.assertEqual(node.prompt, f"{parent.prompt}/{node.index}")
+
+    def test_siblings_run_concurrently(self):
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def riff(parent, index):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return parent, None
+
+        list(riff_tree(riff, "r", 1, 3, max_workers=3))
+        self.assertEqual(active[1], 3)
+
+    def test_rejected_nodes_are_not_expanded(self):
+        nodes = list(
+            riff_tree(
+                lambda parent, i: (str(i), None),
+                "r",
+                3,
+                2,
+                accept=lambda node: node.index != 1,
+            )
+        )
+        self.assertEqual(
+            sorted(node.index for node in nodes), [2, 5, 6, 11, 12, 13, 14]
+        )
+
+    def test_error_propagates(self):
+        def riff(parent, index):
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            list(riff_tree(riff, "r", 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
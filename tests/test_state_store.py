@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from state_store import MemoryStateStore, SQLiteStateStore, create_state_store
+
+
+class TestMemoryStateStore(unittest.TestCase):
+
+    def test_namespaces_are_isolated(self):
+        """Writes to one namespace are not visible in another."""
+        store = MemoryStateStore()
+        store.set_last_prompt("wf1", "castle")
+        self.assertEqual(store.get_last_prompt("wf1"), "castle")
+        self.assertIsNone(store.get_last_prompt("wf2"))
+
+    def test_history_is_bounded(self):
+        """append_history keeps only the most recent entries."""
+        store = MemoryStateStore()
+        for idx in range(5):
+            store.append_history("wf", {"positive": f"p{idx}"}, limit=3)
+        history = store.get_history("wf")
+        self.assertEqual([entry["positive"] for entry in history], ["p2", "p3", "p4"])
+
+    def test_snapshots_are_immutable_views(self):
+        """A snapshot taken before a write is unaffected by the write."""
+        store = MemoryStateStore()
+        store.append_history("wf", {"positive": "p0"}, limit=10)
+        before = store.snapshot("wf")
+        store.append_history("wf", {"positive": "p1"}, limit=10)
+        self.assertEqual(len(before.history), 1)
+        self.assertEqual(len(store.get_history("wf")), 2)
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            create_state_store("redis")
+
+
+class TestSQLiteStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "state.sqlite3")
+
+    def test_state_is_shared_between_connections(self):
+        """A second store on the same file (another worker) sees flushed writes."""
+        writer = SQLiteStateStore(self.path)
+        reader = SQLiteStateStore(self.path, refresh_interval=0.0)
+        self.assertIsNone(reader.get_last_prompt("wf"))
+
+        writer.set_last_prompt("wf", "a knight")
+        writer.set_warnings("wf", ["blocked"])
+        writer.append_history("wf", {"positive": "a knight"}, limit=20)
+        writer.flush()
+
+        self.assertEqual(reader.get_last_prompt("wf"), "a knight")
+        self.assertEqual(reader.get_warnings("wf"), ("blocked",))
+        self.assertEqual(reader.get_history("wf")[0]["positive"], "a knight")
+        writer.close()
+        reader.close()
+
+    def test_writes_are_batched_until_flush(self):
+        """Writes are visible locally at once but only reach disk when flushed."""
+        store = SQLiteStateStore(self.path, flush_interval=60.0, batch_size=100)
+        store.set_last_prompt("wf", "pending")
+        self.assertEqual(store.get_last_prompt("wf"), "pending")
+
+        other = SQLiteStateStore(self.path)
+        self.assertIsNone(other.get_last_prompt("wf"))
+        other.close()
+
+        store.close()
+        reopened = SQLiteStateStore(self.path)
+        self.assertEqual(reopened.get_last_prompt("wf"), "pending")
+        reopened.close()
+
+    def test_history_limit_applies_on_disk(self):
+        """Persisted history is trimmed to the limit per namespace."""
+        store = SQLiteStateStore(self.path)
+        for idx in range(4):
+            store.append_history("wf", {"positive": f"p{idx}"}, limit=2)
+        store.close()
+
+        reopened = SQLiteStateStore(self.path)
+        history = reopened.get_history("wf")
+        self.assertEqual([entry["positive"] for entry in history], ["p2", "p3"])
+        reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the system path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from batch_runner import run_bounded
+from LMStudioThemeBlenderNode import (
+    BLEND_MODES,
+    LMStudioThemeBlenderNode,
+    parse_themes,
+    theme_combinations,
+)
+
+
+class TestRunBounded(unittest.TestCase):
+
+    def test_results_and_errors(self):
+        """Every item yields its result, or the exception it raised."""
+
+        def fn(x):
+            if x == 3:
+                raise ValueError("bad")
+            return x * 2
+
+        out = {
+            item: (result, error)
+            for item, result, error in run_bounded(fn, range(5), 2)
+        }
+        self.assertEqual(out[4], (8, None))
+        self.assertIsNone(out[3][0])
+        self.assertIsInstance(out[3][1], ValueError)
+
+    def test_in_flight_is_bounded(self):
+        """No more than max_workers calls run at once and input is pulled lazily."""
+        lock = threading.Lock()
+        active = [0, 0]
+        pulled = []
+
+        def items():
+            for i in range(12):
+                pulled.append(i)
+                yield i
+
+        def fn(x):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return x
+
+        runner = run_bounded(fn, items(), 3)
+        next(runner)
+        self.assertLessEqual(len(pulled), 4)
+        list(runner)
+        self.assertEqual(len(pulled), 12)
+        self.assertLessEqual(active[1], 3)
+
+
+class TestThemeCombinations(unittest.TestCase):
+
+    def test_parse_themes(self):
+        self.assertEqual(parse_themes(" a \n\nb\na\n"), ["a", "b"])
+
+    def test_full_pairwise_grid(self):
+        """20 themes give 190 pairs per blend mode."""
+        themes = [f"t{i}" for i in range(20)]
+        self.assertEqual(len(theme_combinations(themes, 2, ["Simple Mix"])), 190)
+        self.assertEqual(len(theme_combinations(themes, 2)), 190 * len(BLEND_MODES))
+
+    def test_triples_join_theme_b(self):
+        jobs = theme_combinations(["a", "b", "c"], 3, ["A vs. B"])
+        self.assertEqual(jobs, [(("a", "b", "c"), "A vs. B", "a", "b and c")])
+
+    def test_sampling_is_seeded_and_ordered(self):
+        themes = [f"t{i}" for i in range(10)]
+        full = theme_combinations(themes, 2)
+        sample = theme_combinations(themes, 2, max_combinations=7, seed=4)
+        self.assertEqual(len(sample), 7)
+        self.assertEqual(
+            sample, theme_combinations(themes, 2, max_combinations=7, seed=4)
+        )
+        self.assertEqual(sample, sorted(sample, key=full.index))
+
+
+class TestLMStudioThemeBlenderNode(unittest.TestCase):
+
+    @patch("requests.post")
+    def test_blend_themes_grid(self, mock_post):
+        """Each combination is generated once and returned in grid order."""
+
+        def respond(url, headers=None, json=None, timeout=None):
+            user = json["messages"][1]["content"]
+            response = MagicMock()
+            response.json.return_value = {"choices": [{"message": {"content": user}}]}
+            return response
+
+        mock_post.side_effect = respond
+        node = LMStudioThemeBlenderNode()
+        grid, prompts, warnings = node.blend_themes(
+            themes="a knight\na dragon\na lighthouse",
+            combination_size=2,
+            blend_mode="A vs. B",
+            max_combinations=0,
+            max_workers=2,
+            creativity=0.7,
+            seed=10,
+            lmstudio_endpoint="http://fake-endpoint",
+            model_identifier="fake-model",
+        )
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(len(prompts), 3)
+        self.assertIn("a knight", prompts[0])
+        self.assertIn("a dragon", prompts[0])
+        self.assertIn("a dragon", prompts[2])
+        self.assertIn("a lighthouse", prompts[2])
+        self.assertIn("[a knight + a dragon | A vs. B]", grid)
+        seeds = sorted(call.kwargs["json"]["seed"] for call in mock_post.call_args_list)
+        self.assertEqual(seeds, [10, 11, 12])
+        self.assertEqual(warnings, "")
+
+    @patch("requests.post")
+    def test_failed_cell_reports_error(self, mock_post):
+        import requests
+
+        mock_post.side_effect = requests.exceptions.RequestException("down")
+        node = LMStudioThemeBlenderNode()
+        grid, prompts, warnings = node.blend_themes(
+            "a\nb", 2, "Simple Mix", 0, 1, 0.7, 0, "http://fake-endpoint", "fake-model"
+        )
+        self.assertEqual(prompts, ["Error: down"])
+        self.assertIn("a + b (Simple Mix): down", warnings)
+
+    def test_too_few_themes(self):
+        node = LMStudioThemeBlenderNode()
+        grid, prompts, warnings = node.blend_themes(
+            "only one", 2, "All", 0, 1, 0.7, 0, "http://fake-endpoint", "fake-model"
+        )
+        self.assertEqual(prompts, [])
+        self.assertIn("at least 2 themes", warnings)
+
+
+if __name__ == "__main__":
+    unittest.main()